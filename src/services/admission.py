@@ -0,0 +1,190 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+import cv2
+
+# Working memory of a tracking worker per pixel of a frame: the decoded frame, its
+# gray/HSV copies, the detector masks and the motion history. Peak worker RSS measured
+# 16 MB at 360p, 33 MB at 720p, 64 MB at 1080p and 216 MB at 4K above the idle worker.
+MEMORY_PER_PIXEL = 28
+JOB_MEMORY_OVERHEAD = 16 * 1024 * 1024
+# Packed per-frame record plus its share of the rows buffered before packing
+MEMORY_PER_FRAME = 64
+# Single-worker throughput with every detector on; measured 50-85 million pixels/s
+# from 360p to 4K, so estimates err on the slow side
+PIXELS_PER_SECOND = 50e6
+# Assumed for containers that cannot be probed (e.g. an upload that is still arriving)
+DEFAULT_FRAME_SIZE = (1920, 1080)
+DEFAULT_FPS = 30.0
+# Compressed bytes per pixel per frame, to guess a frame count from the file size when the
+# container does not record one; lower than typical H.264 so the guess is on the high side
+BYTES_PER_PIXEL_FRAME = 0.02
+
+class AdmissionError(Exception):
+    """A job that cannot be taken now, with the HTTP status to report and seconds to wait before retrying"""
+
+    def __init__(self, message, status, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class JobCost:
+    """Estimated peak memory (bytes) and processing time (worker-seconds) of tracking one video"""
+
+    def __init__(self, width, height, frames, fps, params=None):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.fps = fps
+        pixels = width * height
+        memory = JOB_MEMORY_OVERHEAD + MEMORY_PER_PIXEL * pixels + MEMORY_PER_FRAME * frames
+        if params is not None and params.skip_idle:
+            # Decoded frames wait in the rally pre-roll
+            memory += 3 * pixels * params.idle_preroll_frames
+        self.memory_bytes = memory
+        self.cpu_seconds = pixels * frames / PIXELS_PER_SECOND
+
+    def describe(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'frames': self.frames,
+            'fps': self.fps,
+            'memory_mb': round(self.memory_bytes / (1024 * 1024), 1),
+            'cpu_seconds': round(self.cpu_seconds, 1)
+        }
+
+def estimate_job_cost(path, params=None, expected_size=None):
+    """Estimate a job's cost from the video's container metadata, without decoding it.
+
+    expected_size is the final size of a file still being uploaded. Missing metadata is
+    filled in with DEFAULT_FRAME_SIZE/DEFAULT_FPS and a frame count guessed from the size.
+    """
+    cap = cv2.VideoCapture(path)
+    width = height = frames = 0
+    fps = 0.0
+    if cap.isOpened():
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if width <= 0 or height <= 0:
+        width, height = DEFAULT_FRAME_SIZE
+    if not fps or fps <= 0:
+        fps = DEFAULT_FPS
+    if frames <= 0:
+        size = expected_size or os.path.getsize(path)
+        frames = max(1, int(size / (BYTES_PER_PIXEL_FRAME * width * height)))
+    return JobCost(width, height, frames, fps, params)
+
+def estimate_live_cost(width, height, fps, params=None):
+    """Cost of tracking a camera or stream: its memory, but no end to count CPU time towards"""
+    if width <= 0 or height <= 0:
+        width, height = DEFAULT_FRAME_SIZE
+    return JobCost(width, height, 0, fps or DEFAULT_FPS, params)
+
+class AdmissionController:
+    """Decides which tracking jobs to take and when each may start.
+
+    The CPU budget is the worker count plus max_wait: a job is refused (429) when the
+    queued and unfinished work ahead of it would keep it waiting longer than max_wait
+    seconds, with a Retry-After for when that backlog will have drained. The memory
+    budget bounds the estimated peak memory of the jobs running at once; a job that
+    would exceed it waits for running jobs to finish, and one that could never fit
+    is refused (413). Jobs start in the order they were added. Work that cannot wait,
+    such as a streamed request or a live session, is admitted as already running.
+    """
+
+    def __init__(self, workers, memory_budget, max_wait):
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.max_wait = max_wait
+        self._waiting = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _expected_wait(self, now):
+        remaining = sum(max(0.0, cost.cpu_seconds - (now - started))
+                        for cost, started in self._running.values())
+        remaining += sum(cost.cpu_seconds for cost in self._waiting.values())
+        return remaining / self.workers
+
+    def expected_wait(self):
+        """Seconds a job added now would wait before starting, by the estimates"""
+        with self._lock:
+            return self._expected_wait(time.time())
+
+    def _check(self, cost, now):
+        """Must hold self._lock"""
+        if cost is not None and cost.memory_bytes > self.memory_budget:
+            raise AdmissionError(
+                f"Video needs about {cost.memory_bytes // (1024 * 1024)} MB to track, more than the "
+                f"{self.memory_budget // (1024 * 1024)} MB memory budget", 413)
+        wait = self._expected_wait(now)
+        if wait > self.max_wait:
+            raise AdmissionError('Tracking service is at capacity, please retry later', 429,
+                                 max(1, math.ceil(wait - self.max_wait)))
+
+    def check(self, cost=None):
+        """Raise AdmissionError if a job of this cost (or any job, if None) would be refused now"""
+        with self._lock:
+            self._check(cost, time.time())
+
+    def admit(self, job_id, cost, running=False):
+        """Take a job or raise AdmissionError, deciding and registering it under one lock.
+
+        The job waits until next_jobs() returns it, or with running counts as started
+        now; either way release() must be called once it is done.
+        """
+        now = time.time()
+        with self._lock:
+            self._check(cost, now)
+            if running:
+                self._running[job_id] = (cost, now)
+            else:
+                self._waiting[job_id] = cost
+
+    def next_jobs(self):
+        """Move the waiting jobs that fit the budgets now to running, in order, and return their IDs"""
+        started = []
+        now = time.time()
+        with self._lock:
+            in_use = sum(cost.memory_bytes for cost, _ in self._running.values())
+            while self._waiting and len(self._running) < self.workers:
+                job_id, cost = next(iter(self._waiting.items()))
+                # With nothing running, a job over budget still starts rather than waiting forever
+                if self._running and in_use + cost.memory_bytes > self.memory_budget:
+                    break
+                del self._waiting[job_id]
+                self._running[job_id] = (cost, now)
+                in_use += cost.memory_bytes
+                started.append(job_id)
+        return started
+
+    def release(self, job_id):
+        with self._lock:
+            self._waiting.pop(job_id, None)
+            self._running.pop(job_id, None)
+
+    def load(self):
+        """Current use of the budgets"""
+        now = time.time()
+        with self._lock:
+            in_use = sum(cost.memory_bytes for cost, _ in self._running.values())
+            waiting_memory = sum(cost.memory_bytes for cost in self._waiting.values())
+            running, waiting = len(self._running), len(self._waiting)
+            wait = self._expected_wait(now)
+        return {
+            'workers': self.workers,
+            'running': running,
+            'waiting': waiting,
+            'memory_budget_mb': self.memory_budget // (1024 * 1024),
+            'memory_in_use_mb': round(in_use / (1024 * 1024), 1),
+            'memory_waiting_mb': round(waiting_memory / (1024 * 1024), 1),
+            'expected_wait_seconds': round(wait, 1),
+            'max_wait_seconds': self.max_wait,
+            'accepting': wait <= self.max_wait
+        }
@@ -4,92 +4,597 @@ import argparse
 import os
 import sys
 import json
+import queue
+import threading
+import time
 from collections import deque
+from dataclasses import dataclass, replace
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import base64
 from io import BytesIO
 from PIL import Image
+from motion_model import BallKalmanFilter, gravity_prior
+from stage_profiler import StageProfiler, NO_PROFILE
+from rally_segments import RallySegmenter, extend_segments, describe_segments
+from camera_calibration import CameraProfile, learn_profile
+from seek_index import build_keyframe_index
+
+# Bumped whenever a change to the tracker alters its output, invalidating cached results
+TRACKER_VERSION = '1.3.2'
+
+@dataclass
+class TrackerParams:
+    """Detection parameters shared by the tracker's detectors"""
+    min_area: float = 10
+    max_area: float = 500
+    white_lower_hsv: tuple = (0, 0, 200)
+    white_upper_hsv: tuple = (180, 30, 255)
+    bright_threshold: int = 220
+    kernel_size: int = 3
+    min_circularity: float = 0.3
+    motion_threshold: int = 15
+    blob_min_threshold: float = 200
+    blob_max_threshold: float = 255
+    blob_threshold_step: float = 10
+    blob_min_convexity: float = 0.5
+    blob_min_inertia_ratio: float = 0.3
+    roi_tracking: bool = False
+    roi_size: int = 160
+    detect_scale: float = 1.0
+    refine_size: int = 48
+    detect_stride: int = 1
+    local_min_score: float = 0.5  # white-detector score a hit between strided detections needs
+    kalman_gravity: float = None  # px/frame², downward; None derives it from the video's fps and frame height
+    kalman_process_noise: float = 1.0
+    kalman_measurement_noise: float = 2.0
+    kalman_gate_sigma: float = 4.0
+    kalman_min_gate: float = 20.0
+    kalman_max_coast: int = 10
+    kalman_gating: bool = True
+    background_model: str = 'frames'  # 'frames' (three-frame differencing), 'running_average' or 'mog2'
+    background_learning_rate: float = 0.05
+    background_history: int = 500
+    background_var_threshold: float = 16
+    detectors: tuple = ('white', 'motion', 'blob')
+    buffer_pool: bool = True
+    skip_idle: bool = False  # only track rallies found by a low-resolution activity pass
+    idle_width: int = 160
+    idle_diff_threshold: int = 25
+    idle_bright_threshold: int = 120
+    idle_min_active: int = 2
+    idle_preroll_frames: int = 10
+    idle_gap_frames: int = 45
+    camera_profile: str = None  # saved CameraProfile (.npz) masking static distractors and the area outside play
+    calibrate: bool = False  # learn a CameraProfile from the start of the video when none is given
+    calibration_seconds: float = 3.0
+
+    def __post_init__(self):
+        # Checked here so the CLI, batch runs and benchmarks all reject them, not just the API
+        if not 0.1 <= self.detect_scale <= 1.0:
+            raise ValueError(f"detect_scale must be between 0.1 and 1.0, got {self.detect_scale}")
+        if not 1 <= self.detect_stride <= 10:
+            raise ValueError(f"detect_stride must be between 1 and 10, got {self.detect_stride}")
+
+class FrameBuffers:
+    """Working images reused across frames, keyed by name.
+
+    get() returns a view of the requested shape into a buffer that only ever grows,
+    so ROI windows of varying size do not reallocate either.
+    """
+    
+    def __init__(self):
+        self._buffers = {}
+    
+    def get(self, name, shape, dtype=np.uint8):
+        buf = self._buffers.get(name)
+        if buf is None or buf.dtype != dtype or buf.ndim != len(shape):
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        elif any(have < want for have, want in zip(buf.shape, shape)):
+            buf = np.empty(tuple(max(have, want) for have, want in zip(buf.shape, shape)), dtype=dtype)
+            self._buffers[name] = buf
+        return buf[tuple(slice(0, size) for size in shape)]
+
+def progress_text(frames_done, total_frames):
+    """Percentage done, or the frame count when the container reports no frame total"""
+    if total_frames > 0:
+        return f"{(frames_done / total_frames) * 100:.1f}%"
+    return f"{frames_done} frames"
+
+class GrowingFileCapture:
+    """VideoCapture over a file that is still being written, such as an upload in progress.
+
+    Frames are read from the data written so far. At its end the capture waits for the
+    file to grow, reopens it and seeks back to where it stopped. The last frame before the
+    end of a partial file may be truncated, so it is held back and re-read after reopening.
+    Containers that cannot be opened from a prefix (e.g. MP4 with its index at the end)
+    start once the file is complete. Reading raises IOError if the file is removed or
+    stops growing for idle_timeout seconds, so a cut-off upload is not mistaken for a
+    short video; it should be as long as the uploader waits for a paused client.
+    """
+    
+    def __init__(self, path, expected_size, poll_interval=0.2, idle_timeout=3600, min_growth=1 << 20):
+        self.path = path
+        self.expected_size = expected_size
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.min_growth = min_growth
+        self.frames_read = 0
+        self.pending = None
+        self.cap = None
+        self.opened_size = 0
+        while not self._open() and not self.complete() and self._wait_for_data():
+            pass
+    
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return -1
+    
+    def complete(self):
+        """True if the capture was opened on the whole file"""
+        return self.opened_size >= self.expected_size
+    
+    def _open(self):
+        """(Re)open on the data written so far, positioned at the next unread frame"""
+        self.release()
+        self.opened_size = self._size()
+        if self.opened_size <= 0:
+            self.cap = None
+            return False
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        if self.frames_read:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frames_read)
+        return True
+    
+    def _wait_for_data(self):
+        """Block until the file is complete or has grown by min_growth; False on removal or timeout"""
+        last_size = self.opened_size
+        deadline = time.time() + self.idle_timeout
+        while True:
+            size = self._size()
+            if size < 0:
+                return False
+            if size >= self.expected_size or size - self.opened_size >= self.min_growth:
+                return True
+            if size > last_size:
+                last_size = size
+                deadline = time.time() + self.idle_timeout
+            elif time.time() > deadline:
+                return False
+            time.sleep(self.poll_interval)
+    
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+    
+    def get(self, prop):
+        return self.cap.get(prop)
+    
+    def read(self):
+        """Same contract as cv2.VideoCapture.read"""
+        while True:
+            ret, frame = self.cap.read() if self.isOpened() else (False, None)
+            if ret:
+                if self.complete():
+                    self.frames_read += 1
+                    return True, frame
+                held, self.pending = self.pending, frame
+                if held is not None:
+                    self.frames_read += 1
+                    return True, held
+                continue
+            if self.complete():
+                return False, None
+            # End of the data written so far: drop the possibly truncated frame and reopen later
+            self.pending = None
+            if not self._wait_for_data():
+                raise IOError(f"Input ended before reaching its expected size of {self.expected_size} bytes")
+            self._open()
+    
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+class FrameReader:
+    """Decode frames on a background thread into a bounded queue ahead of the tracker"""
+    
+    def __init__(self, cap, queue_size=32):
+        self.cap = cap
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                ret, frame = self.cap.read()
+                if not ret or not self._put(frame):
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(None)
+    
+    def read(self):
+        """Same contract as cv2.VideoCapture.read; errors from the decoding thread are re-raised"""
+        frame = self.frames.get()
+        if frame is None:
+            if self.error is not None:
+                raise self.error
+            return False, None
+        return True, frame
+    
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+class FrameWriter:
+    """Encode annotated frames on a background thread; write() blocks when the queue is full"""
+    
+    def __init__(self, out, queue_size=32):
+        self.out = out
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        # After a failure the queue is still drained, so a producer blocked in write() wakes up
+        # and sees the error instead of waiting on a queue nobody empties
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.error is None:
+                try:
+                    self.out.write(frame)
+                except Exception as e:
+                    self.error = e
+    
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.frames.put(frame)
+    
+    def close(self):
+        """Flush queued frames and stop the writer thread"""
+        self.frames.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
 
 class EnhancedPingPongTracker:
-    def __init__(self, input_path=None, output_path=None):
+    def __init__(self, input_path=None, output_path=None, params=None, expected_size=None,
+                 idle_timeout=None):
         self.input_path = input_path
         self.output_path = output_path
+        self.params = params or TrackerParams()
+        # Set while the input is still being written; reading then waits for it to reach this size,
+        # for up to idle_timeout seconds without growth (GrowingFileCapture's default if None)
+        self.expected_size = expected_size
+        self.idle_timeout = idle_timeout
         self.trajectory = deque(maxlen=30)
         self.prev_frames = deque(maxlen=3)
         self.last_positions = deque(maxlen=10)
         self.detection_history = deque(maxlen=20)
+        self.frame_index = 0
+        self.fps = None
+        self.history_slot = 0
+        self.gated_out = 0  # white candidates the gate ruled out on the current frame
+        self.summary = None
+        self.rally_segments = None
+        self.keyframes = None
+        # One filter predicts ahead of detection; the other fills gaps in the recorded trajectory
+        self.motion = self.make_motion_model()
+        self.gap_filter = self.make_motion_model()
+        self.foreground = None
+        self.buffers = FrameBuffers() if self.params.buffer_pool else None
+        self.profiler = None
+        self.frame_shape = None
+        self.camera_profile = None
+        self.build_detection_pipeline()
+        if self.params.camera_profile:
+            self.set_camera_profile(CameraProfile.load(self.params.camera_profile))
+    
+    def make_motion_model(self):
+        p = self.params
+        return BallKalmanFilter(p.kalman_gravity or 0.0, p.kalman_process_noise, p.kalman_measurement_noise,
+                                p.kalman_gate_sigma, p.kalman_min_gate)
+    
+    def set_frame_rate(self, fps):
+        """Frame rate of the video being tracked, which scales the derived gravity prior"""
+        self.fps = fps
+        if self.coarse_tracker is not None:
+            self.coarse_tracker.set_frame_rate(fps)
+    
+    def gravity(self, frame_height):
+        """Gravity prior for a filter starting on frames of this height, in pixels per frame²"""
+        if self.params.kalman_gravity is not None:
+            return self.params.kalman_gravity
+        return gravity_prior(self.fps, frame_height)
+    
+    def build_detection_pipeline(self):
+        """Create the blob detector, kernels and color bounds once instead of per frame"""
+        p = self.params
+        self.lower_white = np.array(p.white_lower_hsv, dtype=np.uint8)
+        self.upper_white = np.array(p.white_upper_hsv, dtype=np.uint8)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (p.kernel_size, p.kernel_size))
         
-    def preprocess_frame(self, frame):
-        """Apply various preprocessing to enhance ball visibility"""
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-        return gray, hsv, lab
+        blob_params = cv2.SimpleBlobDetector_Params()
+        blob_params.minThreshold = p.blob_min_threshold
+        blob_params.maxThreshold = p.blob_max_threshold
+        blob_params.thresholdStep = p.blob_threshold_step
+        blob_params.filterByArea = True
+        blob_params.minArea = p.min_area
+        blob_params.maxArea = p.max_area
+        blob_params.filterByCircularity = True
+        blob_params.minCircularity = p.min_circularity
+        blob_params.filterByConvexity = True
+        blob_params.minConvexity = p.blob_min_convexity
+        blob_params.filterByInertia = True
+        blob_params.minInertiaRatio = p.blob_min_inertia_ratio
+        blob_params.filterByColor = True
+        blob_params.blobColor = 255
+        try:
+            self.blob_detector = cv2.SimpleBlobDetector_create(blob_params)
+        except cv2.error:
+            self.blob_detector = None
+        
+        unknown = set(p.detectors) - {'white', 'motion', 'blob'}
+        if unknown:
+            raise ValueError(f"Unknown detectors: {', '.join(sorted(unknown))}")
+        if p.background_model not in ('frames', 'running_average', 'mog2'):
+            raise ValueError(f"Unknown background model: {p.background_model}")
+        self.background_subtractor = None
+        if p.background_model == 'mog2':
+            self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
+                p.background_history, p.background_var_threshold, False)
+        
+        # Downscaled detection runs a nested tracker whose size thresholds are in coarse pixels
+        self.coarse_tracker = None
+        if p.detect_scale < 1.0:
+            s = p.detect_scale
+            self.coarse_tracker = EnhancedPingPongTracker(params=replace(
+                p, detect_scale=1.0, detect_stride=1, camera_profile=None,
+                min_area=p.min_area * s * s, max_area=p.max_area * s * s,
+                roi_size=max(16, int(p.roi_size * s)),
+                kalman_gravity=p.kalman_gravity * s if p.kalman_gravity is not None else None,
+                kalman_measurement_noise=p.kalman_measurement_noise * s,
+                kalman_min_gate=p.kalman_min_gate * s))
+        
+    def set_workload(self, detectors, detect_stride):
+        """Change the enabled detectors and detection stride between frames, e.g. to keep up with a live feed"""
+        self.params = replace(self.params, detectors=tuple(detectors), detect_stride=detect_stride)
+        if self.coarse_tracker is not None:
+            self.coarse_tracker.set_workload(detectors, 1)
+        # Motion history from before the switch may be stale or incomplete
+        self.prev_frames.clear()
+    
+    def skip_frames(self, count):
+        """Advance the motion models over frames that were dropped without being tracked"""
+        for _ in range(count):
+            self.motion.predict()
+            self.gap_filter.predict()
+        if count and self.coarse_tracker is not None:
+            self.coarse_tracker.skip_frames(count)
+    
+    def set_camera_profile(self, profile):
+        """Restrict all detectors to the profile's allowed region (None to search whole frames)"""
+        self.camera_profile = profile
+        if self.coarse_tracker is not None:
+            self.coarse_tracker.set_camera_profile(profile)
+    
+    def calibrate(self):
+        """Learn a camera profile from the first calibration_seconds of the input if params ask for one"""
+        if not self.params.calibrate or self.camera_profile is not None:
+            return
+        cap, video_info = self.open_video()
+        if cap is None:
+            return
+        with self.stage('calibrate'):
+            profile = learn_profile(cap, self.params, max(2, int(video_info['fps'] * self.params.calibration_seconds)))
+        cap.release()
+        if profile is not None:
+            info = profile.describe()
+            print(f"Calibrated on {info['calibration_frames']} frames: play area {info['play_area']}, "
+                  f"{info['excluded_fraction'] * 100:.1f}% of the frame excluded")
+            self.set_camera_profile(profile)
+    
+    def allowed_mask(self, offset, shape):
+        """View of the camera profile's mask matching the image at offset, or None without a profile"""
+        if self.camera_profile is None:
+            return None
+        mask = self.camera_profile.mask_for(self.frame_shape)
+        ox, oy = offset
+        return mask[oy:oy + shape[0], ox:ox + shape[1]]
+    
+    def reset_tracking(self):
+        """Forget the ball's motion and recent frames, e.g. when tracking resumes after skipped idle time"""
+        self.motion.clear()
+        self.gap_filter.clear()
+        self.prev_frames.clear()
+        self.last_positions.clear()
+        self.detection_history.clear()
+        if self.coarse_tracker is not None:
+            self.coarse_tracker.reset_tracking()
+    
+    def enable_profiling(self, profiler=None):
+        """Record per-stage timings and candidate counts into a StageProfiler"""
+        self.profiler = profiler or StageProfiler()
+        if self.coarse_tracker is not None:
+            self.coarse_tracker.enable_profiling(self.profiler)
+        return self.profiler
+    
+    def stage(self, name):
+        return self.profiler.stage(name) if self.profiler else NO_PROFILE
+    
+    def count(self, name, value):
+        if self.profiler:
+            self.profiler.count(name, value)
     
-    def detect_white_ball_enhanced(self, frame, gray, hsv):
+    def buffer(self, name, shape, dtype=np.uint8):
+        """Pooled dst= image for an OpenCV call, or None to let OpenCV allocate when pooling is off"""
+        if self.buffers is None:
+            return None
+        return self.buffers.get(name, shape, dtype)
+    
+    def preprocess_frame(self, frame, name=''):
+        """Convert a frame (or window) to gray and, if the white detector needs it, HSV"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.buffer(name + 'gray', frame.shape[:2]))
+        hsv = None
+        if 'white' in self.params.detectors:
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self.buffer(name + 'hsv', frame.shape))
+        return gray, hsv
+    
+    def detect_white_ball_enhanced(self, frame, gray, hsv, offset=(0, 0)):
         """Enhanced white ball detection using multiple techniques"""
         candidates = []
-        lower_white = np.array([0, 0, 200])
-        upper_white = np.array([180, 30, 255])
-        white_mask = cv2.inRange(hsv, lower_white, upper_white)
-        _, bright_mask = cv2.threshold(gray, 220, 255, cv2.THRESH_BINARY)
-        adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                       cv2.THRESH_BINARY, 11, -5)
-        combined_mask = cv2.bitwise_or(white_mask, bright_mask)
-        kernel_small = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        cleaned = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel_small)
-        cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel_small)
+        p = self.params
+        shape = gray.shape
+        white_mask = cv2.inRange(hsv, self.lower_white, self.upper_white,
+                                 dst=self.buffer('white_mask', shape))
+        _, bright_mask = cv2.threshold(gray, p.bright_threshold, 255, cv2.THRESH_BINARY,
+                                       dst=self.buffer('bright_mask', shape))
+        cleaned = cv2.bitwise_or(white_mask, bright_mask, dst=white_mask if self.buffers else None)
+        cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, self.kernel, dst=self.buffer('cleaned', shape))
+        cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, self.kernel, dst=bright_mask if self.buffers else None)
+        allowed = self.allowed_mask(offset, shape)
+        if allowed is not None:
+            cv2.bitwise_and(cleaned, allowed, dst=cleaned)
         contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
+        gate = self.gate(offset)
+        kept = []
+        features = []
         for contour in contours:
             area = cv2.contourArea(contour)
-            if 10 <= area <= 500:
+            if p.min_area <= area <= p.max_area:
                 x, y, w, h = cv2.boundingRect(contour)
+                outside = gate and not self.in_gate(gate, x, y, w, h)
                 aspect_ratio = float(w) / h if h > 0 else 0
                 if 0.5 <= aspect_ratio <= 2.0:
                     perimeter = cv2.arcLength(contour, True)
                     if perimeter > 0:
                         circularity = 4 * np.pi * area / (perimeter * perimeter)
-                        if circularity > 0.3:
+                        if circularity > p.min_circularity:
                             M = cv2.moments(contour)
                             if M["m00"] != 0:
                                 cx = int(M["m10"] / M["m00"])
                                 cy = int(M["m01"] / M["m00"])
-                                mask = np.zeros(gray.shape, dtype=np.uint8)
-                                cv2.drawContours(mask, [contour], -1, 255, -1)
-                                mean_brightness = cv2.mean(gray, mask=mask)[0]
-                                score = circularity * (mean_brightness / 255.0)
-                                if self.last_positions:
-                                    min_dist = min([np.sqrt((cx - px)**2 + (cy - py)**2) 
-                                                  for px, py in self.last_positions])
-                                    if min_dist < 100:
-                                        score *= (2.0 - min_dist / 100)
-                                candidates.append({
-                                    'center': (cx, cy),
-                                    'area': area,
-                                    'score': score,
-                                    'circularity': circularity,
-                                    'brightness': mean_brightness,
-                                    'contour': contour
-                                })
+                                # Mean brightness inside the contour, measured on its bounding box only
+                                mask = np.zeros((h, w), dtype=np.uint8)
+                                cv2.drawContours(mask, [contour], -1, 255, -1, offset=(-x, -y))
+                                mean_brightness = cv2.mean(gray[y:y + h, x:x + w], mask=mask)[0]
+                                if outside:
+                                    # A ball-like candidate the gate rules out; see track_ball_full
+                                    self.gated_out += 1
+                                    continue
+                                kept.append(contour)
+                                features.append((cx + offset[0], cy + offset[1], area,
+                                                 circularity, mean_brightness))
+        if not features:
+            return candidates
+        
+        features = np.array(features, dtype=np.float64)
+        centers = features[:, :2]
+        scores = features[:, 3] * (features[:, 4] / 255.0)
+        scores *= self.proximity_weights(centers, 100)
+        for i, contour in enumerate(kept):
+            candidates.append({
+                'center': (int(centers[i, 0]), int(centers[i, 1])),
+                'area': features[i, 2],
+                'score': float(scores[i]),
+                'circularity': features[i, 3],
+                'brightness': features[i, 4],
+                'contour': contour
+            })
         return candidates
     
-    def detect_motion_enhanced(self, frame, gray):
+    def subtract_background(self, gray):
+        """Update the incremental background model with a full gray frame and compute its foreground mask.
+
+        All full-frame images live in buffers allocated on the first frame and are
+        written in place afterwards. A no-op for three-frame differencing.
+        """
+        p = self.params
+        if p.background_model == 'frames':
+            return
+        if self.foreground is None or self.foreground.shape != gray.shape:
+            self.foreground = np.zeros_like(gray)
+            self.background = gray.astype(np.float32)
+            self.background_u8 = gray.copy()
+        
+        if self.background_subtractor is not None:
+            self.background_subtractor.apply(gray, self.foreground, p.background_learning_rate)
+        else:
+            cv2.absdiff(gray, self.background_u8, dst=self.foreground)
+            cv2.threshold(self.foreground, p.motion_threshold, 255, cv2.THRESH_BINARY, dst=self.foreground)
+            cv2.accumulateWeighted(gray, self.background, p.background_learning_rate)
+            cv2.convertScaleAbs(self.background, dst=self.background_u8)
+    
+    def motion_mask(self, gray, offset):
+        """Thresholded motion mask for gray (a full frame or the window at offset), or None before warm-up"""
+        p = self.params
+        ox, oy = offset
+        h, w = gray.shape
+        if p.background_model != 'frames':
+            if self.foreground is None:
+                return None
+            # A view into the full-frame foreground buffer, cleaned up in place
+            mask = self.foreground[oy:oy + h, ox:ox + w]
+            cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=mask)
+            cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel, dst=mask)
+            return mask
+        
         if len(self.prev_frames) < 2:
+            return None
+        # prev_frames hold full frames; compare against the same window when searching an ROI
+        prev1 = self.prev_frames[-1][oy:oy + h, ox:ox + w]
+        prev2 = self.prev_frames[-2][oy:oy + h, ox:ox + w]
+        diff1 = cv2.absdiff(prev1, gray, dst=self.buffer('diff1', gray.shape))
+        diff2 = cv2.absdiff(prev2, gray, dst=self.buffer('diff2', gray.shape))
+        motion = cv2.bitwise_or(diff1, diff2, dst=diff1 if self.buffers else None)
+        _, mask = cv2.threshold(motion, p.motion_threshold, 255, cv2.THRESH_BINARY,
+                                dst=diff2 if self.buffers else None)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=diff1 if self.buffers else None)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel, dst=diff2 if self.buffers else None)
+        return mask
+    
+    def detect_motion_enhanced(self, frame, gray, offset=(0, 0)):
+        motion_mask = self.motion_mask(gray, offset)
+        if motion_mask is None:
             return []
+        allowed = self.allowed_mask(offset, gray.shape)
+        if allowed is not None:
+            cv2.bitwise_and(motion_mask, allowed, dst=motion_mask)
         candidates = []
-        diff1 = cv2.absdiff(self.prev_frames[-1], gray)
-        diff2 = cv2.absdiff(self.prev_frames[-2], gray) if len(self.prev_frames) > 1 else diff1
-        motion = cv2.bitwise_or(diff1, diff2)
-        _, motion_mask = cv2.threshold(motion, 15, 255, cv2.THRESH_BINARY)
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        motion_mask = cv2.morphologyEx(motion_mask, cv2.MORPH_OPEN, kernel)
-        motion_mask = cv2.morphologyEx(motion_mask, cv2.MORPH_CLOSE, kernel)
+        p = self.params
+        ox, oy = offset
         contours, _ = cv2.findContours(motion_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
+        gate = self.gate(offset)
+        kept = []
+        features = []
         for contour in contours:
             area = cv2.contourArea(contour)
-            if 10 <= area <= 500:
+            if p.min_area <= area <= p.max_area:
                 x, y, w, h = cv2.boundingRect(contour)
+                if gate and not self.in_gate(gate, x, y, w, h):
+                    continue
                 aspect_ratio = float(w) / h if h > 0 else 0
                 if 0.4 <= aspect_ratio <= 2.5:
                     M = cv2.moments(contour)
@@ -99,63 +604,85 @@ class EnhancedPingPongTracker:
                         roi = gray[max(0, cy-5):min(gray.shape[0], cy+5),
                                   max(0, cx-5):min(gray.shape[1], cx+5)]
                         if roi.size > 0:
-                            brightness = np.mean(roi)
-                            score = area * (brightness / 255.0)
-                            if self.last_positions:
-                                min_dist = min([np.sqrt((cx - px)**2 + (cy - py)**2) 
-                                              for px, py in self.last_positions])
-                                if min_dist < 150:
-                                    score *= (2.0 - min_dist / 150)
-                            candidates.append({
-                                'center': (cx, cy),
-                                'area': area,
-                                'score': score,
-                                'brightness': brightness,
-                                'contour': contour,
-                                'method': 'motion'
-                            })
-        return candidates
-    
-    def detect_blob_enhanced(self, gray):
-        params = cv2.SimpleBlobDetector_Params()
-        params.minThreshold = 200
-        params.maxThreshold = 255
-        params.thresholdStep = 10
-        params.filterByArea = True
-        params.minArea = 10
-        params.maxArea = 500
-        params.filterByCircularity = True
-        params.minCircularity = 0.3
-        params.filterByConvexity = True
-        params.minConvexity = 0.5
-        params.filterByInertia = True
-        params.minInertiaRatio = 0.3
-        params.filterByColor = True
-        params.blobColor = 255
-        try:
-            detector = cv2.SimpleBlobDetector_create(params)
-        except:
-            return []
-        keypoints = detector.detect(gray)
-        candidates = []
-        for kp in keypoints:
-            cx, cy = int(kp.pt[0]), int(kp.pt[1])
-            size = kp.size
-            score = kp.response * size
-            if self.last_positions:
-                min_dist = min([np.sqrt((cx - px)**2 + (cy - py)**2) 
-                              for px, py in self.last_positions])
-                if min_dist < 100:
-                    score *= (2.0 - min_dist / 100)
+                            kept.append(contour)
+                            features.append((cx + ox, cy + oy, area, np.mean(roi)))
+        if not features:
+            return candidates
+        
+        features = np.array(features, dtype=np.float64)
+        centers = features[:, :2]
+        scores = features[:, 2] * (features[:, 3] / 255.0)
+        scores *= self.proximity_weights(centers, 150)
+        for i, contour in enumerate(kept):
             candidates.append({
-                'center': (cx, cy),
-                'area': np.pi * (size/2)**2,
-                'score': score,
-                'size': size,
-                'method': 'blob'
+                'center': (int(centers[i, 0]), int(centers[i, 1])),
+                'area': features[i, 2],
+                'score': float(scores[i]),
+                'brightness': features[i, 3],
+                'contour': contour,
+                'method': 'motion'
             })
         return candidates
     
+    def detect_blob_enhanced(self, gray, offset=(0, 0)):
+        if self.blob_detector is None:
+            return []
+        allowed = self.allowed_mask(offset, gray.shape)
+        if allowed is not None:
+            # Blank the excluded regions; gray itself is still needed as motion history
+            gray = cv2.bitwise_and(gray, allowed, dst=self.buffer('blob_gray', gray.shape))
+        keypoints = self.blob_detector.detect(gray)
+        gate = self.gate(offset)
+        if gate:
+            keypoints = [kp for kp in keypoints if self.in_gate(gate, kp.pt[0], kp.pt[1], 0, 0)]
+        if not keypoints:
+            return []
+        
+        features = np.array([(int(kp.pt[0]) + offset[0], int(kp.pt[1]) + offset[1], kp.size, kp.response)
+                             for kp in keypoints], dtype=np.float64)
+        centers = features[:, :2]
+        sizes = features[:, 2]
+        scores = features[:, 3] * sizes
+        scores *= self.proximity_weights(centers, 100)
+        areas = np.pi * (sizes / 2) ** 2
+        return [{
+            'center': (int(centers[i, 0]), int(centers[i, 1])),
+            'area': areas[i],
+            'score': float(scores[i]),
+            'size': sizes[i],
+            'method': 'blob'
+        } for i in range(len(keypoints))]
+    
+    def gate(self, offset=(0, 0)):
+        """(cx, cy, radius) of the motion model's gate in offset-relative coordinates, or None.
+
+        Only a locked filter gates; after a miss detectors search their whole input again.
+        """
+        if not self.params.kalman_gating or not self.motion.locked:
+            return None
+        px, py = self.motion.position
+        return px - offset[0], py - offset[1], self.motion.gate_radius()
+    
+    def in_gate(self, gate, x, y, w, h):
+        """True if a box (or a point when w = h = 0) may overlap the gate"""
+        cx, cy, radius = gate
+        reach = radius + max(w, h) / 2
+        return (x + w / 2 - cx) ** 2 + (y + h / 2 - cy) ** 2 <= reach * reach
+    
+    def proximity_weights(self, centers, radius):
+        """Score multipliers for candidates near the predicted (or a recent) ball position"""
+        if self.motion.initialized:
+            radius = max(radius, self.motion.gate_radius())
+            offsets = centers - np.array(self.motion.position, dtype=np.float64)
+            dist = np.sqrt((offsets ** 2).sum(axis=1))
+            return np.where(dist < radius, 2.0 - dist / radius, 1.0)
+        if not self.last_positions:
+            return np.ones(len(centers))
+        last = np.array(self.last_positions, dtype=np.float64)
+        offsets = centers[:, np.newaxis, :] - last[np.newaxis, :, :]
+        min_dist = np.sqrt((offsets ** 2).sum(axis=2)).min(axis=1)
+        return np.where(min_dist < radius, 2.0 - min_dist / radius, 1.0)
+    
     def combine_detections(self, white_candidates, motion_candidates, blob_candidates):
         """Safely combine detections from different methods"""
         all_candidates = []
@@ -170,208 +697,363 @@ class EnhancedPingPongTracker:
             bc['combined_score'] = bc['score'] * 1.2
             all_candidates.append(bc)
         
+        if not all_candidates:
+            return []
+        
+        # Greedy clustering: each unclaimed candidate absorbs every later unclaimed one within 20px
+        centers = np.array([c['center'] for c in all_candidates], dtype=np.float64)
+        scores = np.array([c['combined_score'] for c in all_candidates], dtype=np.float64)
+        offsets = centers[:, np.newaxis, :] - centers[np.newaxis, :, :]
+        close = (offsets ** 2).sum(axis=2) < 20 ** 2
+        used = np.zeros(len(all_candidates), dtype=bool)
+        
         merged = []
-        used = set()
-        for i, c1 in enumerate(all_candidates):
-            if i in used:
+        for i in range(len(all_candidates)):
+            if used[i]:
                 continue
-            nearby = [c1]
-            for j, c2 in enumerate(all_candidates[i+1:], i+1):
-                if j in used:
-                    continue
-                dist = np.sqrt((c1['center'][0] - c2['center'][0])**2 + 
-                               (c1['center'][1] - c2['center'][1])**2)
-                if dist < 20:
-                    nearby.append(c2)
-                    used.add(j)
-            total_score = sum(c['combined_score'] for c in nearby)
+            members = np.flatnonzero(close[i, i+1:] & ~used[i+1:]) + i + 1
+            used[members] = True
+            group = np.concatenate(([i], members))
+            total_score = scores[group].sum()
             if total_score == 0 or not np.isfinite(total_score):
-                cx, cy = nearby[0]['center']
+                cx, cy = centers[i]
             else:
-                cx = sum(c['center'][0] * c['combined_score'] for c in nearby) / total_score
-                cy = sum(c['center'][1] * c['combined_score'] for c in nearby) / total_score
+                cx, cy = (centers[group] * scores[group, np.newaxis]).sum(axis=0) / total_score
                 if not np.isfinite(cx) or not np.isfinite(cy):
-                    cx, cy = nearby[0]['center']
-            merged_candidate = {
+                    cx, cy = centers[i]
+            merged.append({
                 'center': (int(cx), int(cy)),
-                'score': total_score,
-                'methods': list(set(c.get('method', 'unknown') for c in nearby)),
-                'confidence': len(nearby)
-            }
-            merged.append(merged_candidate)
+                'score': float(total_score),
+                'methods': list(set(all_candidates[j].get('method', 'unknown') for j in group)),
+                'confidence': len(group)
+            })
         return merged
     
+    def predicted_window(self, frame_shape, size, center=None):
+        """Window (x0, y0, x1, y1) of the given size around center (default: the predicted position)"""
+        if center is None and self.motion.initialized:
+            px, py = self.motion.position
+        elif center is None:
+            px, py = self.last_positions[-1]
+            if len(self.last_positions) >= 2:
+                px += px - self.last_positions[-2][0]
+                py += py - self.last_positions[-2][1]
+        else:
+            px, py = center
+        half = int(size) // 2
+        height, width = frame_shape[:2]
+        x0, y0 = max(0, px - half), max(0, py - half)
+        x1, y1 = min(width, px + half), min(height, py + half)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        return x0, y0, x1, y1
+    
+    def search_window(self, frame_shape):
+        """Window (x0, y0, x1, y1) around the predicted ball position, or None for a full-frame search.
+
+        Only a locked filter narrows the search: in clutter, a window following an unconfirmed
+        track chases distractors and never finds the ball again.
+        """
+        p = self.params
+        if not p.roi_tracking or not self.motion.locked:
+            return None
+        return self.predicted_window(frame_shape, self.window_size(p.roi_size))
+    
+    def window_size(self, size):
+        """Shrink a search window to the motion model's gate plus a ball radius when that is smaller"""
+        if not self.motion.initialized:
+            return size
+        ball_radius = np.sqrt(self.params.max_area / np.pi)
+        return min(size, 2 * (self.motion.gate_radius() + ball_radius))
+    
+    def accept_detection(self, center, methods, confidence, confirmed=True):
+        self.motion.update(center, confirmed)
+        self.last_positions.append(center)
+        self.detection_history.append(True)
+        return center, methods, confidence
+    
+    def reject_detection(self):
+        self.motion.miss()
+        self.detection_history.append(False)
+        return None, None, 0
+    
+    def white_candidates_in_window(self, frame, window):
+        """Run only the white-ball detector on a window of the full-resolution frame"""
+        x0, y0, x1, y1 = window
+        frame_roi = frame[y0:y1, x0:x1]
+        gray_roi = cv2.cvtColor(frame_roi, cv2.COLOR_BGR2GRAY, dst=self.buffer('gray_roi', frame_roi.shape[:2]))
+        hsv_roi = cv2.cvtColor(frame_roi, cv2.COLOR_BGR2HSV, dst=self.buffer('hsv_roi', frame_roi.shape))
+        return self.detect_white_ball_enhanced(frame_roi, gray_roi, hsv_roi, (x0, y0))
+    
     def track_ball(self, frame):
-        gray, hsv, lab = self.preprocess_frame(frame)
-        white_candidates = self.detect_white_ball_enhanced(frame, gray, hsv)
-        motion_candidates = self.detect_motion_enhanced(frame, gray)
-        blob_candidates = self.detect_blob_enhanced(gray)
-        combined = self.combine_detections(white_candidates, motion_candidates, blob_candidates)
-        self.prev_frames.append(gray.copy())
+        p = self.params
+        self.frame_index += 1
+        self.frame_shape = frame.shape[:2]
+        if self.motion.misses >= p.kalman_max_coast:
+            self.motion.clear()
+        if not self.motion.initialized:
+            self.motion.gravity = self.gravity(self.frame_shape[0])
+        self.motion.predict()
+        if p.detect_stride > 1 and self.last_positions and (self.frame_index - 1) % p.detect_stride:
+            return self.track_ball_local(frame)
+        if self.coarse_tracker is not None:
+            return self.track_ball_downscaled(frame)
+        return self.track_ball_full(frame)
+    
+    def track_ball_local(self, frame):
+        """Lightweight search between full detections: white detection near the predicted position.
+
+        Hits must lie in the motion model's gate and score at least local_min_score, and
+        are unconfirmed: they move the filter, but only a full detection keeps it locked,
+        so a distractor next to the prediction cannot hold the track.
+        """
+        p = self.params
+        with self.stage('local_search'):
+            if p.background_model == 'frames' and 'motion' in p.detectors:
+                # Keep the motion history one frame apart, or the next full detection differences
+                # frames detect_stride apart and finds the ball where it was, not where it is
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.buffer('gray', frame.shape[:2]))
+                self.remember_frame(gray)
+            window = self.predicted_window(frame.shape, self.window_size(p.roi_size))
+            candidates = self.white_candidates_in_window(frame, window) if window else []
+            if candidates and p.kalman_gating and self.motion.initialized:
+                # The window is the gate plus a ball radius each side; the gate is the circle within it
+                gate = (*self.motion.position, self.motion.gate_radius())
+                r = np.sqrt(p.max_area / np.pi)
+                candidates = [c for c in candidates
+                              if self.in_gate(gate, c['center'][0] - r, c['center'][1] - r, 2 * r, 2 * r)]
+            candidates = [c for c in candidates if c['score'] >= p.local_min_score]
+        if not candidates:
+            return self.reject_detection()
+        best = max(candidates, key=lambda c: c['score'])
+        return self.accept_detection(best['center'], ['white'], 1, confirmed=False)
+    
+    def track_ball_downscaled(self, frame):
+        """Detect on a downscaled copy, then refine the winner in a full-resolution crop"""
+        s = self.params.detect_scale
+        size = (int(round(frame.shape[1] * s)), int(round(frame.shape[0] * s)))
+        with self.stage('downscale'):
+            small = cv2.resize(frame, size, dst=self.buffer('small', (size[1], size[0], frame.shape[2])),
+                               interpolation=cv2.INTER_AREA)
+        center, methods, confidence = self.coarse_tracker.track_ball(small)
+        if center is None:
+            return self.reject_detection()
+        
+        with self.stage('refine'):
+            center = (int(center[0] / s), int(center[1] / s))
+            window = self.predicted_window(frame.shape, self.params.refine_size, center)
+            candidates = self.white_candidates_in_window(frame, window) if window else []
+            if candidates:
+                center = max(candidates, key=lambda c: c['score'])['center']
+        return self.accept_detection(center, methods, confidence)
+    
+    def track_ball_full(self, frame):
+        p = self.params
+        gated = self.gate() is not None
+        self.gated_out = 0
+        window = self.search_window(frame.shape)
+        with self.stage('preprocess'):
+            if window is None:
+                gray, hsv = self.preprocess_frame(frame)
+                offset = (0, 0)
+                frame_roi, gray_roi, hsv_roi = frame, gray, hsv
+            else:
+                # Only the full gray frame is kept for motion history; everything else runs on the window
+                x0, y0, x1, y1 = window
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.buffer('gray', frame.shape[:2]))
+                offset = (x0, y0)
+                frame_roi = frame[y0:y1, x0:x1]
+                gray_roi = gray[y0:y1, x0:x1]
+                hsv_roi = None
+                if 'white' in p.detectors:
+                    hsv_roi = cv2.cvtColor(frame_roi, cv2.COLOR_BGR2HSV,
+                                           dst=self.buffer('hsv', frame_roi.shape))
+            self.subtract_background(gray)
+        white_candidates = motion_candidates = blob_candidates = []
+        if 'white' in p.detectors:
+            with self.stage('white'):
+                white_candidates = self.detect_white_ball_enhanced(frame_roi, gray_roi, hsv_roi, offset)
+            self.count('white', len(white_candidates))
+        if 'motion' in p.detectors:
+            with self.stage('motion'):
+                motion_candidates = self.detect_motion_enhanced(frame_roi, gray_roi, offset)
+            self.count('motion', len(motion_candidates))
+        if 'blob' in p.detectors:
+            with self.stage('blob'):
+                blob_candidates = self.detect_blob_enhanced(gray_roi, offset)
+            self.count('blob', len(blob_candidates))
+        with self.stage('fusion'):
+            combined = self.combine_detections(white_candidates, motion_candidates, blob_candidates)
+        self.count('fused', len(combined))
+        self.remember_frame(gray)
         if combined:
             combined.sort(key=lambda x: x['score'] * x['confidence'], reverse=True)
             best = combined[0]
-            self.last_positions.append(best['center'])
-            self.detection_history.append(True)
-            return best['center'], best['methods'], best['confidence']
-        self.detection_history.append(False)
-        return None, None, 0
+            return self.accept_detection(best['center'], best['methods'], best['confidence'])
+        if gated and self.gated_out:
+            # Nothing in the gate but ball-like candidates outside it: the lock may have been built
+            # by a weaker search (strided local hits, a downscaled refine) following something else.
+            # Release it so the next frame searches everywhere without the old prediction's bias.
+            self.motion.clear()
+        return self.reject_detection()
     
-    def interpolate_missing_positions(self):
-        if len(self.trajectory) < 2:
-            return None
-        p1 = self.trajectory[-2]
-        p2 = self.trajectory[-1]
-        vx = p2[0] - p1[0]
-        vy = p2[1] - p1[1]
-        predicted = (p2[0] + vx, p2[1] + vy)
-        return predicted
-    
-    def process_video(self, show_preview=False, debug=False):
-        cap = cv2.VideoCapture(self.input_path)
-        if not cap.isOpened():
-            print(f"Error: Could not open video file {self.input_path}")
-            return False, None
-        
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        print(f"Video: {width}x{height}, {fps} FPS, {total_frames} frames")
-        
-        # Prepare output video writer if output path is provided
-        out = None
-        if self.output_path:
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            out = cv2.VideoWriter(self.output_path, fourcc, fps, (width, height))
-            if not out.isOpened():
-                print("Error: Could not open output video writer")
-                cap.release()
-                return False, None
+    def remember_frame(self, gray):
+        """Add a full gray frame to the history three-frame differencing compares against"""
+        p = self.params
+        if p.background_model != 'frames' or 'motion' not in p.detectors:
+            return
+        if self.buffers is not None:
+            # The pooled gray image is overwritten next frame; keep history in a ring of buffers
+            history = self.buffers.get(f'history{self.history_slot}', gray.shape)
+            self.history_slot = (self.history_slot + 1) % self.prev_frames.maxlen
+            np.copyto(history, gray)
+            gray = history
+        # Otherwise gray is freshly converted every frame, so it can be kept without a copy
+        self.prev_frames.append(gray)
+    
+    def record_frame(self, frame_count, fps, width, height, ball_center, methods, confidence):
+        """Fill gaps from the motion model, update the trajectory and build the per-frame record"""
+        gap_filter = self.gap_filter
+        if gap_filter.misses >= self.params.kalman_max_coast:
+            gap_filter.clear()
+        if not gap_filter.initialized:
+            gap_filter.gravity = self.gravity(height)
+        predicted = gap_filter.predict()
+        if ball_center is not None:
+            gap_filter.update(ball_center)
+        else:
+            gap_filter.miss()
+            if predicted is not None and gap_filter.updates >= 2:
+                if 0 <= predicted[0] < width and 0 <= predicted[1] < height:
+                    ball_center = predicted
+                    methods = ['interpolated']
+                    confidence = 0.5
         
-        frame_count = 0
-        detection_count = 0
-        interpolated_count = 0
-        tracking_data = []
+        if ball_center is not None:
+            self.trajectory.append(ball_center)
         
-        print("Processing with enhanced multi-method detection...")
+        return {
+            'frame': frame_count,
+            'timestamp': frame_count / fps,
+            'ball_center': ball_center,
+            'methods': methods,
+            'confidence': confidence,
+            'detected': ball_center is not None
+        }
+    
+    def skipped_record(self, frame_count, fps):
+        """Per-frame record for an idle frame that was not tracked"""
+        return {
+            'frame': frame_count,
+            'timestamp': frame_count / fps,
+            'ball_center': None,
+            'methods': ['skipped'],
+            'confidence': 0,
+            'detected': False
+        }
+    
+    def draw_overlay(self, frame, record, trajectory, total_frames, detection_count, interpolated_count):
+        """Draw the trajectory, ball marker and running statistics onto a frame"""
+        ball_center = record['ball_center']
+        methods = record['methods']
+        confidence = record['confidence']
+        frame_count = record['frame']
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            ball_center, methods, confidence = self.track_ball(frame)
-            
-            if ball_center is None and len(self.trajectory) >= 2:
-                predicted = self.interpolate_missing_positions()
-                if predicted is not None:
-                    if 0 <= predicted[0] < width and 0 <= predicted[1] < height:
-                        ball_center = predicted
-                        methods = ['interpolated']
-                        confidence = 0.5
-                        interpolated_count += 1
-            
-            # Store tracking data
-            tracking_data.append({
-                'frame': frame_count,
-                'timestamp': frame_count / fps,
-                'ball_center': ball_center,
-                'methods': methods,
-                'confidence': confidence,
-                'detected': ball_center is not None
-            })
-            
-            if ball_center is not None:
-                detection_count += 1
-                self.trajectory.append(ball_center)
-                
-                if out:  # Only draw if we're creating output video
-                    if len(self.trajectory) > 1:
-                        for i in range(1, len(self.trajectory)):
-                            alpha = i / len(self.trajectory)
-                            thickness = max(1, int(2 * alpha))
-                            color = (0, int(255 * alpha), 0)
-                            cv2.line(frame, self.trajectory[i-1], self.trajectory[i], 
-                                   color, thickness, cv2.LINE_AA)
-                    
-                    if 'interpolated' in methods:
-                        color = (128, 128, 255)
-                        radius = 6
-                    elif len(methods) > 1:
-                        color = (0, 255, 255)
-                        radius = 8
-                    elif 'white' in methods:
-                        color = (0, 255, 0)
-                        radius = 7
-                    elif 'motion' in methods:
-                        color = (255, 128, 0)
-                        radius = 6
-                    else:
-                        color = (255, 0, 255)
-                        radius = 6
-                    
-                    cv2.circle(frame, ball_center, radius, color, 2)
-                    cv2.circle(frame, ball_center, 2, color, -1)
-                    
-                    if confidence > 1:
-                        cv2.circle(frame, ball_center, radius + 4, color, 1)
-                    
-                    label = f"{','.join(methods[:2])} C:{confidence:.1f}"
-                    cv2.putText(frame, label, (ball_center[0] + 10, ball_center[1] - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+        if ball_center is not None:
+            if len(trajectory) > 1:
+                for i in range(1, len(trajectory)):
+                    alpha = i / len(trajectory)
+                    thickness = max(1, int(2 * alpha))
+                    color = (0, int(255 * alpha), 0)
+                    cv2.line(frame, trajectory[i-1], trajectory[i], 
+                           color, thickness, cv2.LINE_AA)
             
-            if out:  # Only add info text if creating output video
-                info = f"Frame: {frame_count}/{total_frames} | Detections: {detection_count} | Interpolated: {interpolated_count}"
-                cv2.putText(frame, info, (10, 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                if frame_count > 0:
-                    detection_rate = (detection_count / frame_count) * 100
-                    rate_text = f"Detection Rate: {detection_rate:.1f}%"
-                    cv2.putText(frame, rate_text, (10, 55),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+            if 'interpolated' in methods:
+                color = (128, 128, 255)
+                radius = 6
+            elif len(methods) > 1:
+                color = (0, 255, 255)
+                radius = 8
+            elif 'white' in methods:
+                color = (0, 255, 0)
+                radius = 7
+            elif 'motion' in methods:
+                color = (255, 128, 0)
+                radius = 6
+            else:
+                color = (255, 0, 255)
+                radius = 6
             
-            if out:
-                out.write(frame)
+            cv2.circle(frame, ball_center, radius, color, 2)
+            cv2.circle(frame, ball_center, 2, color, -1)
             
-            if show_preview:
-                cv2.imshow('Enhanced Ping Pong Tracking', frame)
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'):
-                    print("Interrupted by user")
-                    break
-                elif key == ord(' '):
-                    cv2.waitKey(0)
+            if confidence > 1:
+                cv2.circle(frame, ball_center, radius + 4, color, 1)
             
-            if frame_count % 30 == 0:
-                progress = (frame_count / total_frames) * 100
-                detection_rate = (detection_count / frame_count) * 100 if frame_count > 0 else 0
-                print(f"Progress: {progress:.1f}% | Detections: {detection_count} | Rate: {detection_rate:.1f}%")
+            label = f"{','.join(methods[:2])} C:{confidence:.1f}"
+            cv2.putText(frame, label, (ball_center[0] + 10, ball_center[1] - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
         
-        cap.release()
-        if out:
-            out.release()
-        cv2.destroyAllWindows()
+        info = f"Frame: {frame_count}/{total_frames} | Detections: {detection_count} | Interpolated: {interpolated_count}"
+        cv2.putText(frame, info, (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
-        # Prepare results
+        if frame_count > 0:
+            detection_rate = (detection_count / frame_count) * 100
+            rate_text = f"Detection Rate: {detection_rate:.1f}%"
+            cv2.putText(frame, rate_text, (10, 55),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+    
+    def open_video(self):
+        """Open the input video and read its properties"""
+        if self.expected_size:
+            options = {} if self.idle_timeout is None else {'idle_timeout': self.idle_timeout}
+            cap = GrowingFileCapture(self.input_path, self.expected_size, **options)
+        else:
+            cap = cv2.VideoCapture(self.input_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file {self.input_path}")
+            return None, None
+        
+        video_info = {
+            'fps': int(cap.get(cv2.CAP_PROP_FPS)),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'total_frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        }
+        return cap, video_info
+    
+    def open_writer(self, video_info):
+        """Open the annotated output video writer"""
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        out = cv2.VideoWriter(self.output_path, fourcc, video_info['fps'],
+                              (video_info['width'], video_info['height']))
+        if not out.isOpened():
+            print("Error: Could not open output video writer")
+            return None
+        return out
+    
+    def summarize(self, frame_count, detection_count, interpolated_count, video_info):
+        """Build the results dict without per-frame data and print the report"""
+        fps = video_info['fps']
         results = {
             'success': True,
             'total_frames': frame_count,
             'detection_count': detection_count,
             'interpolated_count': interpolated_count,
             'detection_rate': (detection_count/frame_count)*100 if frame_count > 0 else 0,
-            'tracking_data': tracking_data,
             'trajectory': list(self.trajectory),
             'video_info': {
-                'width': width,
-                'height': height,
+                'width': video_info['width'],
+                'height': video_info['height'],
                 'fps': fps,
                 'duration': frame_count / fps
             }
         }
+        if self.rally_segments is not None:
+            rally_frames = sum(end - start + 1 for start, end in self.rally_segments)
+            results['rally_segments'] = describe_segments(self.rally_segments, fps)
+            results['skipped_frames'] = frame_count - rally_frames
         
         print(f"\n{'='*50}")
         print(f"Processing Complete!")
@@ -380,35 +1062,451 @@ class EnhancedPingPongTracker:
         print(f"Total detections: {detection_count}")
         print(f"Interpolated frames: {interpolated_count}")
         print(f"Detection rate: {(detection_count/frame_count)*100:.1f}%")
+        if self.rally_segments is not None:
+            print(f"Rallies: {len(self.rally_segments)} | Skipped idle frames: {results['skipped_frames']}")
         if self.output_path:
             print(f"Output saved: {self.output_path}")
+        if self.profiler:
+            results['profile'] = self.profiler.summary()
+            self.profiler.report()
         
+        return results
+    
+    def build_results(self, tracking_data, video_info):
+        """Summarize per-frame records into the results dict"""
+        detection_count = sum(1 for record in tracking_data if record['detected'])
+        interpolated_count = sum(1 for record in tracking_data
+                                 if record['methods'] and 'interpolated' in record['methods'])
+        results = self.summarize(len(tracking_data), detection_count, interpolated_count, video_info)
+        results['tracking_data'] = tracking_data
+        return results
+    
+    def process_video(self, show_preview=False, debug=False, progress_callback=None, workers=1,
+                      stream=False, pipeline=False, profile=False):
+        """Track the whole video; with stream=True return a generator of per-frame records instead.
+        
+        With profile=True the results carry a 'profile' entry with per-stage timing percentiles.
+        """
+        if profile:
+            self.enable_profiling()
+        if stream:
+            return self.iter_video(show_preview=show_preview, progress_callback=progress_callback,
+                                   pipeline=pipeline)
+        if workers > 1:
+            return self.process_video_parallel(workers, progress_callback=progress_callback)
+        
+        tracking_data = list(self.iter_video(show_preview=show_preview,
+                                             progress_callback=progress_callback,
+                                             pipeline=pipeline))
+        if self.summary is None:
+            return False, None
+        
+        results = dict(self.summary)
+        results['tracking_data'] = tracking_data
         return True, results
+    
+    def read_frames(self, source, limit=None, rally_flags=None):
+        """Yield (frame, in_rally) for up to limit frames of a capture.
+        
+        Every frame is in a rally unless params.skip_idle is set, in which case a
+        RallySegmenter decides and frames come out up to idle_preroll_frames late, or
+        the frames' precomputed rally_flags are used.
+        """
+        def decoded():
+            count = 0
+            while limit is None or count < limit:
+                with self.stage('decode'):
+                    ret, frame = source.read()
+                if not ret:
+                    return
+                count += 1
+                yield frame
+        
+        if rally_flags is not None:
+            yield from zip(decoded(), rally_flags)
+            return
+        if not self.params.skip_idle:
+            for frame in decoded():
+                yield frame, True
+            return
+        yield from RallySegmenter(self.params).segment(decoded())
+    
+    def iter_video(self, show_preview=False, progress_callback=None, pipeline=False):
+        """Yield each frame's tracking record as soon as it is computed.
+        
+        Only the bounded trajectory is kept in memory. Once the generator is exhausted,
+        self.summary holds the results dict without tracking_data (None if the video
+        could not be opened). With pipeline=True, decoding and encoding run on their own
+        threads (OpenCV releases the GIL for both) so they overlap with detection. With
+        params.skip_idle, frames between rallies are not tracked and get 'skipped' records.
+        """
+        self.summary = None
+        self.rally_segments = [] if self.params.skip_idle else None
+        self.calibrate()
+        cap, video_info = self.open_video()
+        if cap is None:
+            return
+        
+        fps = video_info['fps']
+        width = video_info['width']
+        height = video_info['height']
+        total_frames = video_info['total_frames']
+        self.set_frame_rate(fps)
+        
+        print(f"Video: {width}x{height}, {fps} FPS, {total_frames} frames")
+        
+        # Prepare output video writer if output path is provided
+        out = None
+        if self.output_path:
+            out = self.open_writer(video_info)
+            if out is None:
+                cap.release()
+                return
+        
+        frame_count = 0
+        detection_count = 0
+        interpolated_count = 0
+        
+        print("Processing with enhanced multi-method detection...")
+        
+        reader = FrameReader(cap) if pipeline else None
+        writer = FrameWriter(out) if pipeline and out else None
+        source = reader or cap
+        sink = writer or out
+        
+        try:
+            for frame, in_rally in self.read_frames(source):
+                frame_count += 1
+                if not in_rally:
+                    record = self.skipped_record(frame_count, fps)
+                else:
+                    if self.rally_segments is not None and extend_segments(self.rally_segments, frame_count):
+                        self.reset_tracking()
+                    with self.stage('track'):
+                        ball_center, methods, confidence = self.track_ball(frame)
+                    with self.stage('interpolate'):
+                        record = self.record_frame(frame_count, fps, width, height,
+                                                   ball_center, methods, confidence)
+                
+                if record['detected']:
+                    detection_count += 1
+                    if 'interpolated' in record['methods']:
+                        interpolated_count += 1
+                
+                if out:  # Only draw if we're creating output video
+                    with self.stage('draw'):
+                        self.draw_overlay(frame, record, self.trajectory, total_frames,
+                                          detection_count, interpolated_count)
+                    with self.stage('encode'):
+                        sink.write(frame)
+                
+                if show_preview:
+                    cv2.imshow('Enhanced Ping Pong Tracking', frame)
+                    key = cv2.waitKey(1) & 0xFF
+                    if key == ord('q'):
+                        print("Interrupted by user")
+                        break
+                    elif key == ord(' '):
+                        cv2.waitKey(0)
+                
+                if frame_count % 30 == 0:
+                    detection_rate = (detection_count / frame_count) * 100 if frame_count > 0 else 0
+                    print(f"Progress: {progress_text(frame_count, total_frames)} | Detections: {detection_count} | "
+                          f"Rate: {detection_rate:.1f}%")
+                    if progress_callback:
+                        progress_callback(frame_count, total_frames)
+                
+                yield record
+        finally:
+            if reader:
+                reader.stop()
+            cap.release()
+            if writer:
+                writer.close()
+            if out:
+                out.release()
+            if show_preview:
+                cv2.destroyAllWindows()
+        
+        self.summary = self.summarize(frame_count, detection_count, interpolated_count, video_info)
+    
+    def index_keyframes(self):
+        """Record the input's key frames so single frames can be read back later without decoding from the start.
+
+        Called by whoever saves the results with them; a streamed or live run has no use
+        for the index and skips the extra pass over the file.
+        """
+        self.keyframes = build_keyframe_index(self.input_path)
+        return self.keyframes
+    
+    def process_video_parallel(self, workers=None, warmup_frames=15, progress_callback=None):
+        """Track frame-range chunks on separate processes and stitch them into one result"""
+        cap, video_info = self.open_video()
+        if cap is None:
+            return False, None
+        cap.release()
+        
+        fps = video_info['fps']
+        width = video_info['width']
+        height = video_info['height']
+        total_frames = video_info['total_frames']
+        workers = workers or os.cpu_count() or 1
+        self.set_frame_rate(fps)
+        
+        print(f"Video: {width}x{height}, {fps} FPS, {total_frames} frames")
+        print(f"Processing in parallel on {workers} workers...")
+        self.rally_segments = [] if self.params.skip_idle else None
+        self.calibrate()
+        
+        # The last chunk reads to the end of the file since CAP_PROP_FRAME_COUNT is only an estimate
+        chunk_size = max(1, -(-total_frames // workers))
+        starts = list(range(0, max(total_frames, 1), chunk_size))
+        ranges = [(start, start + chunk_size if i < len(starts) - 1 else None)
+                  for i, start in enumerate(starts)]
+        
+        chunk_detections = [None] * len(ranges)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rally_flags = None
+            if self.params.skip_idle:
+                # Rallies can span chunks, so they are found over the whole video as in a sequential run
+                print("Finding rallies...")
+                activity = []
+                for future in [executor.submit(_rally_activity, self.input_path, start, end, self.params)
+                               for start, end in ranges]:
+                    activity.extend(future.result())
+                rally_flags = RallySegmenter(self.params).rally_flags(activity)
+            futures = {}
+            for i, (start, end) in enumerate(ranges):
+                first = max(0, start - warmup_frames)
+                flags = rally_flags[first:end] if rally_flags is not None else None
+                futures[executor.submit(_track_frame_range, self.input_path, start, end, warmup_frames,
+                                        self.params, self.profiler is not None, self.camera_profile,
+                                        flags)] = i
+            frames_done = 0
+            for future in as_completed(futures):
+                detections, profiler = future.result()
+                chunk_detections[futures[future]] = detections
+                if profiler:
+                    self.profiler.merge(profiler)
+                frames_done += len(chunk_detections[futures[future]])
+                print(f"Progress: {progress_text(frames_done, total_frames)} | Chunks: "
+                      f"{sum(1 for c in chunk_detections if c is not None)}/{len(ranges)}")
+                if progress_callback:
+                    progress_callback(frames_done, total_frames)
+        
+        # Interpolation depends on the trajectory so far, so it runs sequentially over the stitched detections
+        tracking_data = []
+        frame_count = 0
+        for detections in chunk_detections:
+            for detection in detections:
+                frame_count += 1
+                if detection is None:
+                    tracking_data.append(self.skipped_record(frame_count, fps))
+                    continue
+                if self.rally_segments is not None and extend_segments(self.rally_segments, frame_count):
+                    self.gap_filter.clear()
+                ball_center, methods, confidence = detection
+                with self.stage('interpolate'):
+                    record = self.record_frame(frame_count, fps, width, height,
+                                               ball_center, methods, confidence)
+                tracking_data.append(record)
+        
+        if self.output_path and not self.render_tracked_video(tracking_data, video_info):
+            return False, None
+        
+        return True, self.build_results(tracking_data, video_info)
+    
+    def annotate_frames(self, tracking_data, frames, total_frames, trajectory=(), detection_count=0,
+                        interpolated_count=0):
+        """Draw the overlay onto decoded frames paired with their records and yield each frame.
+        
+        trajectory and the counts are the overlay state before the first record, for
+        annotating from the middle of a video (see tracking_format.overlay_state).
+        """
+        trajectory = deque(trajectory, maxlen=self.trajectory.maxlen)
+        for record, frame in zip(tracking_data, frames):
+            if record['detected']:
+                detection_count += 1
+                if 'interpolated' in record['methods']:
+                    interpolated_count += 1
+                trajectory.append(record['ball_center'])
+            with self.stage('draw'):
+                self.draw_overlay(frame, record, trajectory, total_frames,
+                                  detection_count, interpolated_count)
+            yield frame
+    
+    def render_tracked_video(self, tracking_data, video_info):
+        """Write the annotated output video from already computed tracking records"""
+        cap, _ = self.open_video()
+        if cap is None:
+            return False
+        out = self.open_writer(video_info)
+        if out is None:
+            cap.release()
+            return False
+        
+        def decoded():
+            while True:
+                with self.stage('decode'):
+                    ret, frame = cap.read()
+                if not ret:
+                    return
+                yield frame
+        
+        for frame in self.annotate_frames(tracking_data, decoded(), video_info['total_frames']):
+            with self.stage('encode'):
+                out.write(frame)
+        
+        cap.release()
+        out.release()
+        return True
+
+def _rally_activity(input_path, start, end, params):
+    """RallySegmenter activity flags of frames [start, end), reading the frame before start to compare against"""
+    segmenter = RallySegmenter(params)
+    cap = cv2.VideoCapture(input_path)
+    first = max(0, start - 1)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    activity = []
+    frame_index = first
+    while end is None or frame_index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        active = segmenter.is_active(frame)
+        if frame_index >= start:
+            activity.append(active)
+        frame_index += 1
+    cap.release()
+    return activity
 
-def process_video_file(input_path, output_path=None):
+def _track_frame_range(input_path, start, end, warmup_frames, params=None, profile=False,
+                       camera_profile=None, rally_flags=None):
+    """Run detection on frames [start, end), priming tracker state on the preceding warm-up frames.
+    
+    Returns (detections, profiler); the profiler is None unless profile is set. With
+    params.skip_idle, rally_flags are the in-rally flags of the frames from the first
+    warm-up frame on (found over the whole video), and frames outside rallies are None
+    in detections. camera_profile is the parent's, so a learned profile is not relearned
+    by every chunk.
+    """
+    tracker = EnhancedPingPongTracker(input_path, params=params)
+    if camera_profile is not None:
+        tracker.set_camera_profile(camera_profile)
+    if profile:
+        tracker.enable_profiling()
+    cap = cv2.VideoCapture(input_path)
+    tracker.set_frame_rate(int(cap.get(cv2.CAP_PROP_FPS)))
+    first = max(0, start - warmup_frames)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    
+    limit = end - first if end is not None else None
+    detections = []
+    frame_index = first
+    was_in_rally = False
+    for frame, in_rally in tracker.read_frames(cap, limit, rally_flags):
+        detection = None
+        if in_rally:
+            if not was_in_rally:
+                tracker.reset_tracking()
+            with tracker.stage('track'):
+                detection = tracker.track_ball(frame)
+        was_in_rally = in_rally
+        if frame_index >= start:
+            detections.append(detection)
+        frame_index += 1
+    
+    cap.release()
+    return detections, tracker.profiler
+
+def warm_up(frame_size=(360, 640), frames=5):
+    """Run the detectors on a few synthetic frames so OpenCV's lazy initialization happens
+    before the first real video; returns the process ID"""
+    height, width = frame_size
+    tracker = EnhancedPingPongTracker()
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame[:] = 40
+        cv2.circle(frame, (width // 4 + i * 8, height // 2), 5, (255, 255, 255), -1)
+        tracker.track_ball(frame)
+    return os.getpid()
+
+def process_video_file(input_path, output_path=None, progress_callback=None, workers=1):
     """Process a video file and return tracking results"""
     tracker = EnhancedPingPongTracker(input_path, output_path)
-    success, results = tracker.process_video()
+    success, results = tracker.process_video(progress_callback=progress_callback, workers=workers)
     return success, results
 
 def main():
     parser = argparse.ArgumentParser(description='Enhanced ping pong ball tracker with multiple detection methods')
-    parser.add_argument('input', help='Input video file')
-    parser.add_argument('-o', '--output', default=None, help='Output video file')
+    parser.add_argument('input', help='Input video file, or a directory / .txt manifest of videos for batch mode')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Output video file (batch mode: results directory, default <input>/tracked)')
     parser.add_argument('-p', '--preview', action='store_true', help='Show preview window')
     parser.add_argument('-d', '--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--roi', action='store_true',
+                        help='Search only a window around the predicted ball position once it is locked')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Detect on frames downscaled by this factor (0.1-1.0), refining hits at full resolution')
+    parser.add_argument('--stride', type=int, default=1,
+                        help='Run full detection every N frames (1-10) with a local search in between')
+    parser.add_argument('--gravity', type=float, default=None,
+                        help='Gravity prior of the motion model in pixels per frame squared '
+                             '(default: derived from the frame rate and height for a 2.5 m tall view)')
+    parser.add_argument('--background', choices=['frames', 'running_average', 'mog2'], default='frames',
+                        help='Motion detection model: three-frame differencing or an incremental background model')
+    parser.add_argument('--profile', action='store_true',
+                        help='Report per-stage timing percentiles and candidate counts')
+    parser.add_argument('--skip-idle', action='store_true',
+                        help='Find rallies with a cheap low-resolution pass and only track those')
+    parser.add_argument('--camera-profile', default=None,
+                        help='Camera profile from camera_calibration.py excluding static distractors')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='Learn static distractors and the play area from the first seconds of the video')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Decode and encode on background threads overlapping with detection')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Split the video into frame-range chunks tracked on this many processes '
+                             '(batch mode: files tracked at once, default: number of CPUs)')
+    parser.add_argument('--render', action='store_true',
+                        help='Batch mode: also write an annotated video per file')
+    parser.add_argument('--force', action='store_true',
+                        help='Batch mode: reprocess files that already have up-to-date results')
     args = parser.parse_args()
     
     if not os.path.exists(args.input):
         print(f"Error: Input file '{args.input}' not found!")
         return 1
     
+    try:
+        params = TrackerParams(roi_tracking=args.roi, detect_scale=args.scale, detect_stride=args.stride,
+                               kalman_gravity=args.gravity, background_model=args.background,
+                               skip_idle=args.skip_idle, camera_profile=args.camera_profile,
+                               calibrate=args.calibrate)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if os.path.isdir(args.input) or args.input.endswith('.txt'):
+        # Worker processes have no window to preview in
+        if args.preview or args.debug:
+            parser.error('--preview and --debug are not supported in batch mode')
+        from batch_tracking import run_batch
+        source_dir = args.input if os.path.isdir(args.input) else os.path.dirname(args.input)
+        output_dir = args.output or os.path.join(source_dir, 'tracked')
+        summary = run_batch(args.input, output_dir, params, jobs=args.workers, render=args.render,
+                            force=args.force, pipeline=args.pipeline, profile=args.profile)
+        return 0 if summary['failed'] == 0 and summary['missing'] == 0 else 1
+    
     if not args.output:
         base_name = os.path.splitext(args.input)[0]
         args.output = base_name + '_tracked.avi'
     
-    tracker = EnhancedPingPongTracker(args.input, args.output)
-    success, results = tracker.process_video(show_preview=args.preview, debug=args.debug)
+    tracker = EnhancedPingPongTracker(args.input, args.output, params)
+    success, results = tracker.process_video(show_preview=args.preview, debug=args.debug,
+                                             workers=args.workers or 1, pipeline=args.pipeline,
+                                             profile=args.profile)
     
     if success:
         print("\n✓ Tracking completed successfully!")
@@ -1,5 +1,8 @@
 // Ball tracking service for communicating with the Python tracking API
 const TRACKING_API_URL = 'http://localhost:5001';
+const POLL_INTERVAL_MS = 1000;
+const UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024;
+const UPLOAD_RETRIES = 3;
 
 class BallTrackingService {
   constructor() {
@@ -27,12 +30,26 @@ class BallTrackingService {
     }
   }
 
+  /**
+   * Add tracking options to an upload form
+   * @param {FormData} formData - The form being sent
+   * @param {Object} options - { scale, stride, roi, gravity, skip_idle, camera, calibrate }; omitted keys use the server defaults
+   */
+  appendTrackingOptions(formData, options) {
+    ['scale', 'stride', 'roi', 'gravity', 'skip_idle', 'camera', 'calibrate'].forEach((name) => {
+      if (options[name] !== undefined) {
+        formData.append(name, String(options[name]));
+      }
+    });
+  }
+
   /**
    * Process a video file for ball tracking
    * @param {File} videoFile - The video file to process
    * @param {Function} progressCallback - Optional callback for progress updates
+   * @param {Object} options - Optional speed/accuracy options ({ scale, stride, roi })
    */
-  async trackVideo(videoFile, progressCallback = null) {
+  async trackVideo(videoFile, progressCallback = null, options = {}) {
     try {
       // Check API health first
       const healthCheck = await this.checkHealth();
@@ -43,6 +60,7 @@ class BallTrackingService {
       // Create form data
       const formData = new FormData();
       formData.append('video', videoFile);
+      this.appendTrackingOptions(formData, options);
 
       // Show progress
       if (progressCallback) {
@@ -57,14 +75,13 @@ class BallTrackingService {
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
-        throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+        // 429: the service is at capacity and says when to retry
+        const retryHint = errorData.retry_after ? ` Retry in ${errorData.retry_after} s.` : '';
+        throw new Error((errorData.error || `HTTP error! status: ${response.status}`) + retryHint);
       }
 
-      if (progressCallback) {
-        progressCallback({ stage: 'processing', progress: 50, message: 'Processing video...' });
-      }
-
-      const result = await response.json();
+      const job = await response.json();
+      const result = await this.waitForTrackingResults(job.tracking_id, progressCallback);
 
       if (progressCallback) {
         progressCallback({ stage: 'complete', progress: 100, message: 'Tracking complete!' });
@@ -72,7 +89,7 @@ class BallTrackingService {
 
       return {
         success: true,
-        trackingId: result.tracking_id,
+        trackingId: job.tracking_id,
         results: result.results,
         outputVideoUrl: result.output_video_url
       };
@@ -93,13 +110,212 @@ class BallTrackingService {
     }
   }
 
+  /**
+   * Upload a video in resumable chunks and track it; tracking starts on the server
+   * while the rest of the file is still uploading
+   * @param {File} videoFile - The video file to process
+   * @param {Function} progressCallback - Optional callback for progress updates
+   * @param {Object} options - Optional speed/accuracy options ({ scale, stride, roi })
+   */
+  async trackVideoChunked(videoFile, progressCallback = null, options = {}) {
+    try {
+      const formData = new FormData();
+      formData.append('filename', videoFile.name);
+      formData.append('size', String(videoFile.size));
+      this.appendTrackingOptions(formData, options);
+
+      let response = await fetch(`${this.apiUrl}/uploads`, { method: 'POST', body: formData });
+      let upload = await response.json().catch(() => ({}));
+      if (!response.ok) {
+        throw new Error(upload.error || `HTTP error! status: ${response.status}`);
+      }
+
+      let failures = 0;
+      while (!upload.complete) {
+        const start = upload.received;
+        const end = Math.min(start + UPLOAD_CHUNK_BYTES, videoFile.size);
+        try {
+          response = await fetch(`${this.apiUrl}${upload.upload_url}`, {
+            method: 'PUT',
+            headers: { 'Content-Range': `bytes ${start}-${end - 1}/${videoFile.size}` },
+            body: videoFile.slice(start, end),
+          });
+          const data = await response.json().catch(() => ({}));
+          if (!response.ok && response.status !== 409 && response.status !== 429) {
+            throw new Error(data.error || `HTTP error! status: ${response.status}`);
+          }
+          // 409 means the server has a different byte count; continue from there.
+          // 429 on the last chunk means the upload is complete but tracking must wait.
+          upload = response.status === 409 ? { ...upload, received: data.received } : data;
+          failures = 0;
+        } catch (error) {
+          // Connection dropped: ask the server how much arrived and resume from there
+          if (++failures > UPLOAD_RETRIES) {
+            throw error;
+          }
+          const status = await fetch(`${this.apiUrl}${upload.upload_url}`);
+          if (status.ok) {
+            upload = await status.json();
+          }
+        }
+
+        if (progressCallback) {
+          progressCallback({
+            stage: 'uploading',
+            progress: (upload.received / videoFile.size) * 100,
+            message: upload.tracking_id ? 'Uploading video (tracking started)...' : 'Uploading video...'
+          });
+        }
+      }
+
+      // The server keeps a completed upload it had no capacity for; another PUT retries tracking it
+      while (!upload.tracking_id) {
+        if (progressCallback) {
+          progressCallback({ stage: 'waiting', progress: 100, message: 'Tracking service busy, waiting to start...' });
+        }
+        await new Promise((resolve) => setTimeout(resolve, (upload.retry_after || 1) * 1000));
+        response = await fetch(`${this.apiUrl}${upload.upload_url}`, { method: 'PUT', body: new Blob([]) });
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok && response.status !== 429) {
+          throw new Error(data.error || `HTTP error! status: ${response.status}`);
+        }
+        upload = data;
+      }
+
+      const result = await this.waitForTrackingResults(upload.tracking_id, progressCallback);
+      if (progressCallback) {
+        progressCallback({ stage: 'complete', progress: 100, message: 'Tracking complete!' });
+      }
+      return {
+        success: true,
+        trackingId: upload.tracking_id,
+        results: result.results,
+        outputVideoUrl: result.output_video_url
+      };
+    } catch (error) {
+      console.error('Chunked video tracking failed:', error);
+      if (progressCallback) {
+        progressCallback({ stage: 'error', progress: 0, message: `Error: ${error.message}` });
+      }
+      return {
+        success: false,
+        error: error.message
+      };
+    }
+  }
+
+  /**
+   * Track a video while streaming per-frame results back as they are computed
+   * @param {File} videoFile - The video file to process
+   * @param {Function} onFrame - Called with each frame record as it arrives
+   * @param {Object} options - Optional speed/accuracy options ({ scale, stride, roi })
+   */
+  async streamTrackVideo(videoFile, onFrame, options = {}) {
+    try {
+      const formData = new FormData();
+      formData.append('video', videoFile);
+      this.appendTrackingOptions(formData, options);
+
+      const response = await fetch(`${this.apiUrl}/track-video/stream`, {
+        method: 'POST',
+        body: formData,
+      });
+
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+      }
+
+      // The stream is newline-delimited JSON: a start line with the tracking ID,
+      // one line per frame, then the summary (or an error) as the last line
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let trackingId = null;
+      let summary = null;
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+          break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+          if (!line.trim()) {
+            continue;
+          }
+          const message = JSON.parse(line);
+          if ('frame' in message) {
+            onFrame(message);
+          } else if ('tracking_id' in message) {
+            trackingId = message.tracking_id;
+          } else if (message.success === false) {
+            throw new Error(message.error);
+          } else {
+            summary = message;
+          }
+        }
+      }
+
+      return { success: true, trackingId, results: summary };
+    } catch (error) {
+      console.error('Streaming video tracking failed:', error);
+      return {
+        success: false,
+        error: error.message
+      };
+    }
+  }
+
+  /**
+   * Poll a queued tracking job until it completes or fails
+   * @param {string} trackingId - The tracking ID returned by /track-video
+   * @param {Function} progressCallback - Optional callback for progress updates
+   */
+  async waitForTrackingResults(trackingId, progressCallback = null) {
+    while (true) {
+      const response = await fetch(`${this.apiUrl}/tracking-results/${trackingId}`);
+      const result = await response.json().catch(() => ({}));
+
+      if (!response.ok) {
+        throw new Error(result.error || `HTTP error! status: ${response.status}`);
+      }
+
+      if (result.status === 'completed') {
+        return result;
+      }
+      if (result.status === 'failed') {
+        throw new Error(result.error || 'Failed to process video');
+      }
+
+      if (progressCallback) {
+        progressCallback({
+          stage: 'processing',
+          progress: result.progress || 0,
+          message: result.status === 'queued' ? 'Waiting for a tracking worker...' : 'Processing video...'
+        });
+      }
+
+      await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+    }
+  }
+
   /**
    * Download the tracked video
    * @param {string} trackingId - The tracking ID
    */
   async downloadTrackedVideo(trackingId) {
     try {
-      const response = await fetch(`${this.apiUrl}/download-tracked-video/${trackingId}`);
+      let response = await fetch(`${this.apiUrl}/download-tracked-video/${trackingId}`);
+      // 202: the video is being rendered; ask again after the suggested delay
+      while (response.status === 202) {
+        const delay = Number(response.headers.get('Retry-After')) || 5;
+        await new Promise((resolve) => setTimeout(resolve, delay * 1000));
+        response = await fetch(`${this.apiUrl}/download-tracked-video/${trackingId}`);
+      }
       
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
@@ -160,6 +376,72 @@ class BallTrackingService {
     }
   }
 
+  /**
+   * Get the per-frame records of a completed job for a frame range
+   * @param {string} trackingId - The tracking ID
+   * @param {number} start - First frame (1-based, optional)
+   * @param {number} end - Last frame, inclusive (optional)
+   */
+  async getTrackingFrames(trackingId, start, end) {
+    try {
+      const params = new URLSearchParams();
+      if (start != null) params.append('start', start);
+      if (end != null) params.append('end', end);
+      const response = await fetch(`${this.apiUrl}/tracking-results/${trackingId}/frames?${params}`);
+      
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+      }
+
+      const result = await response.json();
+      return {
+        success: true,
+        data: result
+      };
+    } catch (error) {
+      console.error('Failed to get tracking frames:', error);
+      return {
+        success: false,
+        error: error.message
+      };
+    }
+  }
+
+  /**
+   * URL of one annotated frame as a JPEG, e.g. for an <img> while scrubbing through results
+   * @param {string} trackingId - The tracking ID
+   * @param {number} frame - Frame number (1-based, as in tracking_data)
+   * @param {Object} options - Optional { width, quality, annotate }
+   */
+  getFrameUrl(trackingId, frame, options = {}) {
+    const params = new URLSearchParams();
+    ['width', 'quality', 'annotate'].forEach((name) => {
+      if (options[name] !== undefined) {
+        params.append(name, String(options[name]));
+      }
+    });
+    const query = params.toString();
+    return `${this.apiUrl}/tracking-results/${trackingId}/frame/${frame}${query ? `?${query}` : ''}`;
+  }
+
+  /**
+   * URL of a short annotated clip (MJPEG .avi) of frames start..end
+   * @param {string} trackingId - The tracking ID
+   * @param {number} start - First frame (1-based)
+   * @param {number} end - Last frame, inclusive
+   * @param {Object} options - Optional { width, annotate }
+   */
+  getClipUrl(trackingId, start, end, options = {}) {
+    const params = new URLSearchParams({ start: String(start), end: String(end) });
+    ['width', 'annotate'].forEach((name) => {
+      if (options[name] !== undefined) {
+        params.append(name, String(options[name]));
+      }
+    });
+    return `${this.apiUrl}/tracking-results/${trackingId}/clip?${params}`;
+  }
+
   /**
    * Clean up temporary files for a tracking session
    * @param {string} trackingId - The tracking ID
@@ -189,6 +471,75 @@ class BallTrackingService {
     }
   }
 
+  /**
+   * Start tracking a table-side camera or stream in real time
+   * @param {string} source - Camera index on the tracking server or an rtsp/http stream URL
+   * @param {Object} options - Optional { budgetMs } plus speed/accuracy options ({ scale, stride, roi })
+   */
+  async startLiveSession(source, options = {}) {
+    try {
+      const formData = new FormData();
+      formData.append('source', String(source));
+      if (options.budgetMs !== undefined) {
+        formData.append('budget_ms', String(options.budgetMs));
+      }
+      this.appendTrackingOptions(formData, options);
+
+      const response = await fetch(`${this.apiUrl}/live`, { method: 'POST', body: formData });
+      const data = await response.json().catch(() => ({}));
+      if (!response.ok) {
+        throw new Error(data.error || `HTTP error! status: ${response.status}`);
+      }
+      return { success: true, sessionId: data.session_id, data };
+    } catch (error) {
+      console.error('Starting live session failed:', error);
+      return {
+        success: false,
+        error: error.message
+      };
+    }
+  }
+
+  /**
+   * Receive a live session's ball positions as they are tracked
+   * @param {string} sessionId - The session ID from startLiveSession
+   * @param {Function} onFrame - Called with each frame record
+   * @param {Function} onEnd - Optional callback with the final session statistics
+   * @returns {Function} Call to stop listening
+   */
+  watchLiveSession(sessionId, onFrame, onEnd = null) {
+    const events = new EventSource(`${this.apiUrl}/live/${sessionId}/events?format=sse`);
+    events.addEventListener('frame', (event) => onFrame(JSON.parse(event.data)));
+    events.addEventListener('end', (event) => {
+      events.close();
+      if (onEnd) {
+        onEnd(JSON.parse(event.data));
+      }
+    });
+    return () => events.close();
+  }
+
+  /**
+   * Stop a live session
+   * @param {string} sessionId - The session ID from startLiveSession
+   */
+  async stopLiveSession(sessionId) {
+    try {
+      const response = await fetch(`${this.apiUrl}/live/${sessionId}`, { method: 'DELETE' });
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+      }
+      return { success: true };
+    } catch (error) {
+      console.error('Stopping live session failed:', error);
+      return {
+        success: false,
+        error: error.message
+      };
+    }
+  }
+
   /**
    * Analyze tracking results and extract key statistics
    * @param {Object} results - The tracking results from the API
@@ -214,6 +565,10 @@ class BallTrackingService {
       videoFPS: results.video_info.fps,
       videoResolution: `${results.video_info.width}x${results.video_info.height}`,
       
+      // Rallies found when idle time was skipped (skip_idle option)
+      rallySegments: results.rally_segments || [],
+      skippedFrames: results.skipped_frames || 0,
+      
       // Trajectory analysis
       trajectoryLength: results.trajectory.length,
       hasTrajectory: results.trajectory.length > 0,
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import hashlib
+from dataclasses import asdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ballTracker import EnhancedPingPongTracker, TRACKER_VERSION
+from tracking_format import records_to_array, save_tracking_npz
+from camera_calibration import profile_fingerprint
+
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+SUMMARY_FILENAME = 'batch_summary.json'
+
+def collect_inputs(source, exclude_dir=None):
+    """Video paths from a directory (searched recursively) or a manifest listing one path per line.
+
+    Returns (root, paths); results are named after each path relative to root. exclude_dir
+    (the results directory, which may sit inside source) is not searched.
+    """
+    if os.path.isdir(source):
+        exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames[:] = sorted(d for d in dirnames
+                                 if os.path.abspath(os.path.join(dirpath, d)) != exclude_dir)
+            for filename in sorted(filenames):
+                if filename.rsplit('.', 1)[-1].lower() in VIDEO_EXTENSIONS:
+                    paths.append(os.path.join(dirpath, filename))
+        return source, paths
+
+    # Manifest: blank lines and '#' comments are ignored, relative paths are relative to the manifest
+    root = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                paths.append(line if os.path.isabs(line) else os.path.join(root, line))
+    return root, paths
+
+def result_name(root, input_path):
+    """Flat result name for an input, e.g. 'day1__match3.mp4-1b2c3d4e'.
+
+    Flattening alone is ambiguous ('a/b.mp4' and 'a__b.mp4' both give 'a__b.mp4'), so a
+    short hash of the relative path keeps names of different inputs apart.
+    """
+    relative = os.path.relpath(os.path.abspath(input_path), os.path.abspath(root))
+    digest = hashlib.sha256(relative.replace(os.sep, '/').encode()).hexdigest()[:8]
+    return f"{relative.replace(os.sep, '__').replace('..', '_')}-{digest}"
+
+def input_fingerprint(input_path, params, profile=False):
+    """Identifies the input file and everything else that changes its output"""
+    stat = os.stat(input_path)
+    params_json = json.dumps(asdict(params), sort_keys=True)
+    camera = profile_fingerprint(params.camera_profile) if params.camera_profile else ''
+    text = f"{os.path.abspath(input_path)}:{stat.st_size}:{stat.st_mtime_ns}:{TRACKER_VERSION}:{params_json}:{camera}"
+    if profile:
+        # A summary without stage timings does not satisfy a profiled run
+        text += ':profile'
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def _track_file(input_path, columnar_path, output_path, params, pipeline=False, profile=False):
+    """Worker process entry point: track one file into a .npz, written under a temporary name first"""
+    tracker = EnhancedPingPongTracker(input_path, output_path, params)
+    frames = records_to_array(tracker.process_video(stream=True, pipeline=pipeline, profile=profile))
+    if tracker.summary is None:
+        return None
+    tmp_path = columnar_path + '.part'
+    save_tracking_npz(tmp_path, tracker.summary, frames, tracker.index_keyframes())
+    os.replace(tmp_path, columnar_path)
+    return tracker.summary
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def run_batch(source, output_dir, params, jobs=None, render=False, force=False, pipeline=False,
+              profile=False):
+    """Track every video in a directory or manifest on a process pool.
+
+    Each finished file gets <name>.npz (columnar results) and <name>.json (its summary and
+    fingerprint); the .json is written last and marks the file done, so an interrupted
+    batch resumes where it stopped. Files whose fingerprint still matches are skipped
+    unless force is set. pipeline and profile are passed to each file's process_video,
+    so with profile the summaries carry per-stage timings. Returns the aggregate summary,
+    also saved as batch_summary.json.
+    """
+    root, inputs = collect_inputs(source, exclude_dir=output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+
+    pending = []
+    entries = {}
+    for input_path in inputs:
+        name = result_name(root, input_path)
+        if not os.path.exists(input_path):
+            entries[name] = {'input': input_path, 'status': 'missing'}
+            continue
+        fingerprint = input_fingerprint(input_path, params, profile)
+        marker_path = os.path.join(output_dir, name + '.json')
+        if not force and os.path.exists(marker_path):
+            with open(marker_path) as f:
+                entry = json.load(f)
+            if entry.get('fingerprint') == fingerprint:
+                entries[name] = dict(entry, status='skipped')
+                continue
+        pending.append((name, input_path, fingerprint))
+
+    print(f"Batch: {len(inputs)} files, {len(pending)} to process, "
+          f"{len(inputs) - len(pending)} skipped or missing, {jobs} workers")
+
+    started = time.time()
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        futures = {}
+        for name, input_path, fingerprint in pending:
+            columnar_path = os.path.join(output_dir, name + '.npz')
+            output_path = os.path.join(output_dir, name + '_tracked.avi') if render else None
+            future = executor.submit(_track_file, input_path, columnar_path, output_path, params,
+                                     pipeline, profile)
+            futures[future] = (name, input_path, fingerprint)
+
+        for done, future in enumerate(as_completed(futures), 1):
+            name, input_path, fingerprint = futures[future]
+            try:
+                summary = future.result()
+                error = None if summary else 'Failed to open video'
+            except Exception as e:
+                summary, error = None, str(e)
+
+            if error:
+                entries[name] = {'input': input_path, 'status': 'failed', 'error': error}
+                print(f"[{done}/{len(pending)}] {name}: failed ({error})")
+                continue
+            entry = {
+                'input': input_path,
+                'fingerprint': fingerprint,
+                'tracker_version': TRACKER_VERSION,
+                'finished_at': time.time(),
+                'summary': summary
+            }
+            _write_json(os.path.join(output_dir, name + '.json'), entry)
+            entries[name] = dict(entry, status='processed')
+            print(f"[{done}/{len(pending)}] {name}: {summary['detection_rate']:.1f}% detected "
+                  f"over {summary['total_frames']} frames")
+    except KeyboardInterrupt:
+        print("\nInterrupted; finished files are kept and will be skipped on the next run")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    aggregate = summarize_batch(entries, time.time() - started)
+    _write_json(os.path.join(output_dir, SUMMARY_FILENAME), aggregate)
+    print(f"\nProcessed {aggregate['processed']}, skipped {aggregate['skipped']}, "
+          f"failed {aggregate['failed']}, missing {aggregate['missing']}")
+    print(f"Overall detection rate: {aggregate['detection_rate']:.1f}% over {aggregate['total_frames']} frames")
+    print(f"Summary saved: {os.path.join(output_dir, SUMMARY_FILENAME)}")
+    return aggregate
+
+def summarize_batch(entries, elapsed):
+    """Totals over every file, including ones finished by earlier runs"""
+    counts = {'processed': 0, 'skipped': 0, 'failed': 0, 'missing': 0}
+    total_frames = detection_count = interpolated_count = 0
+    files = {}
+    for name, entry in sorted(entries.items()):
+        counts[entry['status']] += 1
+        summary = entry.get('summary')
+        if summary:
+            total_frames += summary['total_frames']
+            detection_count += summary['detection_count']
+            interpolated_count += summary['interpolated_count']
+        files[name] = {
+            'input': entry['input'],
+            'status': entry['status'],
+            'error': entry.get('error'),
+            'total_frames': summary['total_frames'] if summary else None,
+            'detection_rate': summary['detection_rate'] if summary else None
+        }
+    return dict(counts, **{
+        'tracker_version': TRACKER_VERSION,
+        'elapsed_seconds': round(elapsed, 1),
+        'total_frames': total_frames,
+        'detection_count': detection_count,
+        'interpolated_count': interpolated_count,
+        'detection_rate': (detection_count / total_frames) * 100 if total_frames else 0,
+        'files': files
+    })
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+import cv2
+import numpy as np
+
+# Fraction of calibration frames a pixel must be bright in to count as a static distractor
+STATIC_FRACTION = 0.9
+# Padding around the region where motion was seen, as a fraction of the frame size
+PLAY_AREA_MARGIN = 0.15
+# Calibration frames are shrunk to at most this width; the mask is rescaled when used
+CALIBRATION_WIDTH = 640
+
+class CameraProfile:
+    """Where a fixed camera's picture can contain the ball.
+
+    mask is 255 inside the play area and away from static bright regions (lights,
+    scoreboards, white walls) and 0 elsewhere; detectors ignore everything under a 0.
+    play_area is the (x0, y0, x1, y1) rectangle it was built from. Both are in mask
+    pixels (at most CALIBRATION_WIDTH across) and are rescaled to each video's size.
+    """
+
+    def __init__(self, mask, play_area, calibration_frames=0):
+        self.mask = mask
+        self.play_area = tuple(int(v) for v in play_area)
+        self.calibration_frames = calibration_frames
+        self._scaled = {mask.shape: mask}
+
+    def mask_for(self, shape):
+        """The mask resized to a frame of shape (height, width), cached per size"""
+        shape = tuple(shape[:2])
+        mask = self._scaled.get(shape)
+        if mask is None:
+            mask = cv2.resize(self.mask, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+            self._scaled[shape] = mask
+        return mask
+
+    def excluded_fraction(self):
+        return float(np.count_nonzero(self.mask == 0)) / self.mask.size
+
+    def describe(self):
+        height, width = self.mask.shape
+        return {
+            'width': width,
+            'height': height,
+            'play_area': list(self.play_area),
+            'excluded_fraction': round(self.excluded_fraction(), 4),
+            'calibration_frames': self.calibration_frames
+        }
+
+    def save(self, path):
+        """Write the profile atomically, so a reader never sees a partly replaced one"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, mask=self.mask, info=np.array(json.dumps(self.describe())))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            info = json.loads(str(data['info']))
+            mask = data['mask']
+        return cls(mask, info['play_area'], info.get('calibration_frames', 0))
+
+def profile_fingerprint(path):
+    """Content hash of a saved profile, so cached results follow changes to it"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def learn_profile(cap, params, frames):
+    """Learn a CameraProfile from the next frames of an opened capture, or None if it has none.
+
+    A pixel the white detector would see in nearly every frame is a static distractor;
+    it is excluded together with a ball-radius margin, since the edges of a light
+    flicker. The play area is the bounding box of everything that moved, padded by
+    PLAY_AREA_MARGIN, or the whole frame if hardly anything moved.
+    """
+    p = params
+    lower_white = np.array(p.white_lower_hsv, dtype=np.uint8)
+    upper_white = np.array(p.white_upper_hsv, dtype=np.uint8)
+    bright_count = motion_count = previous = None
+    scale = 1.0
+    count = 0
+    while count < frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if count == 0:
+            scale = min(1.0, CALIBRATION_WIDTH / frame.shape[1])
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        bright = cv2.inRange(hsv, lower_white, upper_white)
+        bright |= cv2.threshold(gray, p.bright_threshold, 255, cv2.THRESH_BINARY)[1]
+        if bright_count is None:
+            bright_count = np.zeros(gray.shape, dtype=np.uint16)
+            motion_count = np.zeros(gray.shape, dtype=np.uint16)
+        bright_count += bright > 0
+        if previous is not None:
+            motion_count += cv2.absdiff(gray, previous) > p.motion_threshold
+        previous = gray
+        count += 1
+    if count == 0:
+        return None
+
+    height, width = bright_count.shape
+    radius = max(1, int(np.sqrt(p.max_area / np.pi) * scale))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    static = ((bright_count >= STATIC_FRACTION * count) * 255).astype(np.uint8)
+    static = cv2.dilate(static, kernel)
+
+    # Moving in at least two frames, without single-pixel noise
+    moving = ((motion_count >= 2) * 255).astype(np.uint8)
+    moving = cv2.morphologyEx(moving, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    points = cv2.findNonZero(moving)
+    play_area = (0, 0, width, height)
+    if points is not None and len(points) >= 0.001 * width * height:
+        x, y, w, h = cv2.boundingRect(points)
+        mx, my = int(width * PLAY_AREA_MARGIN), int(height * PLAY_AREA_MARGIN)
+        play_area = (max(0, x - mx), max(0, y - my), min(width, x + w + mx), min(height, y + h + my))
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    x0, y0, x1, y1 = play_area
+    mask[y0:y1, x0:x1] = 255
+    mask[static > 0] = 0
+    return CameraProfile(mask, play_area, count)
+
+def draw_profile(frame, profile):
+    """Shade the excluded parts of a frame and outline the play area, for checking a profile"""
+    mask = profile.mask_for(frame.shape)
+    shaded = frame.copy()
+    shaded[mask == 0] = (0, 0, 160)
+    preview = cv2.addWeighted(frame, 0.5, shaded, 0.5, 0)
+    scale_x = frame.shape[1] / profile.mask.shape[1]
+    scale_y = frame.shape[0] / profile.mask.shape[0]
+    x0, y0, x1, y1 = profile.play_area
+    cv2.rectangle(preview, (int(x0 * scale_x), int(y0 * scale_y)),
+                  (int(x1 * scale_x) - 1, int(y1 * scale_y) - 1), (0, 255, 0), 2)
+    return preview
+
+def main():
+    from ballTracker import TrackerParams
+    parser = argparse.ArgumentParser(description='Learn a camera profile (static distractors and play area) from a video')
+    parser.add_argument('input', help='Video from the camera, ideally starting with play')
+    parser.add_argument('-o', '--output', default=None, help='Profile file (default: <input>.camera.npz)')
+    parser.add_argument('--seconds', type=float, default=TrackerParams.calibration_seconds,
+                        help='Length of the calibration window at the start of the video')
+    parser.add_argument('--preview', default=None, help='Also write an image showing the excluded regions')
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.input)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file {args.input}")
+        return 1
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    profile = learn_profile(cap, TrackerParams(), max(2, int(fps * args.seconds)))
+    cap.release()
+    if profile is None:
+        print(f"Error: No frames to calibrate from in {args.input}")
+        return 1
+
+    output = args.output or os.path.splitext(args.input)[0] + '.camera.npz'
+    profile.save(output)
+    info = profile.describe()
+    print(f"Calibrated on {info['calibration_frames']} frames: play area {info['play_area']}, "
+          f"{info['excluded_fraction'] * 100:.1f}% of the frame excluded")
+    print(f"Profile saved: {output}")
+
+    if args.preview:
+        cap = cv2.VideoCapture(args.input)
+        ret, frame = cap.read()
+        cap.release()
+        if ret:
+            cv2.imwrite(args.preview, draw_profile(frame, profile))
+            print(f"Preview saved: {args.preview}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
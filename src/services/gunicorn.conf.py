@@ -0,0 +1,35 @@
+# Production server: gunicorn -c src/services/gunicorn.conf.py tracking_api:app
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = os.environ.get('TRACKING_API_BIND', '0.0.0.0:5001')
+
+# Jobs, uploads and live sessions are held in memory, so a single worker process serves
+# every request on threads; CPU-bound tracking runs in its process pool
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('TRACKING_API_THREADS', 16))
+
+# Import cv2, numpy and the tracker once in the master before forking
+preload_app = True
+
+# Streaming responses stay open for minutes, but gthread workers keep heartbeating while
+# they run, so this only limits a stuck worker (and the warm-up below)
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+def on_starting(server):
+    """Clean up files from the previous run once, before any worker starts"""
+    import tracking_api
+    tracking_api.prepare_storage()
+
+def post_worker_init(worker):
+    """Start and warm up the tracking pool before the worker accepts requests"""
+    import tracking_api
+    tracking_api.warm_up()
+
+def worker_exit(server, worker):
+    import tracking_api
+    tracking_api.stop_workers()
@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from ballTracker import EnhancedPingPongTracker, TrackerParams
+
+logger = logging.getLogger(__name__)
+
+# Frames between workload changes, so one slow frame does not flip the detector set
+ADAPT_INTERVAL = 15
+# Restore a shed detector once smoothed tracking time is below this fraction of the budget
+RESTORE_HEADROOM = 0.5
+
+def workload_levels(params):
+    """(detectors, stride) from the configured workload down to the cheapest fallback"""
+    detectors = tuple(params.detectors)
+    levels = [(detectors, params.detect_stride)]
+    for dropped, stride in ((('blob',), 1), (('blob',), 2), (('blob', 'motion'), 3)):
+        reduced = tuple(d for d in detectors if d not in dropped) or detectors[:1]
+        level = (reduced, max(params.detect_stride, stride))
+        if level != levels[-1]:
+            levels.append(level)
+    return levels
+
+class LiveSource:
+    """Camera, network stream or replayed file that hands out only its newest frame.
+
+    A background thread reads frames as fast as the source produces them. A frame the
+    tracker has not picked up by the time the next one arrives is dropped, so latency
+    stays bounded instead of a backlog building up. A file is replayed at its own frame
+    rate so it can stand in for a camera.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.replay = os.path.isfile(str(source))
+        self.cap = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        # Cameras often report 0 or nonsense; assume a typical rate for the budget
+        self.fps = fps if 0 < fps <= 240 else 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frames_read = 0
+        self.dropped = 0
+        self.ended = False
+        self._latest = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.cap.isOpened():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def isOpened(self):
+        return self._thread is not None
+
+    def _run(self):
+        start = time.perf_counter()
+        skipped = False
+        try:
+            while not self._stopped.is_set():
+                if self.replay:
+                    delay = start + self.frames_read / self.fps - time.perf_counter()
+                    if delay > 0 and self._stopped.wait(delay):
+                        break
+                    if delay < -1.0 / self.fps and not skipped:
+                        # A camera would have moved on: skip the overdue frame. Never twice in a row,
+                        # so a replay that cannot even be decoded in real time still makes progress.
+                        if not self.cap.grab():
+                            break
+                        with self._condition:
+                            self.dropped += 1
+                            self.frames_read += 1
+                        skipped = True
+                        continue
+                    skipped = False
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                with self._condition:
+                    if self._latest is not None:
+                        self.dropped += 1
+                    self._latest = (self.frames_read, time.perf_counter(), frame)
+                    self.frames_read += 1
+                    self._condition.notify()
+        finally:
+            self.cap.release()
+            with self._condition:
+                self.ended = True
+                self._condition.notify_all()
+
+    def read(self):
+        """Wait for the newest untracked frame: (index, capture time, frame), or None once the source ends"""
+        with self._condition:
+            while self._latest is None and not self.ended:
+                self._condition.wait()
+            latest, self._latest = self._latest, None
+            return latest
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            # A camera read can block for a while; the reader thread is a daemon, so don't wait forever
+            self._thread.join(timeout=2)
+
+class LiveTracker:
+    """Track a live source within a per-frame latency budget.
+
+    The budget defaults to the source's frame interval. When the smoothed tracking time
+    exceeds it, detectors are shed and the stride raised one level at a time (see
+    workload_levels); they are restored once there is headroom again. Frames that arrive
+    while one is being tracked are dropped and the motion models are advanced over them.
+    """
+
+    def __init__(self, source, params=None, budget_ms=None):
+        self.source = source if isinstance(source, LiveSource) else LiveSource(source)
+        self.params = params or TrackerParams()
+        self.budget_ms = budget_ms or 1000.0 / self.source.fps
+        self.tracker = EnhancedPingPongTracker(params=self.params)
+        self.tracker.set_frame_rate(self.source.fps)
+        self.levels = workload_levels(self.params)
+        self.level = 0
+        self.frame_ms = None
+        self.frames_since_change = 0
+        self.processed = 0
+        self.latencies = deque(maxlen=300)
+        self._stopped = threading.Event()
+
+    def set_level(self, level):
+        detectors, stride = self.levels[level]
+        self.tracker.set_workload(detectors, stride)
+        self.level = level
+        self.frames_since_change = 0
+        logger.info(f"Live tracking workload level {level}: {', '.join(detectors)}, stride {stride}")
+
+    def adapt(self, elapsed_ms):
+        """Shed or restore one workload level based on smoothed tracking time"""
+        self.frame_ms = elapsed_ms if self.frame_ms is None else 0.8 * self.frame_ms + 0.2 * elapsed_ms
+        self.frames_since_change += 1
+        if self.frames_since_change < ADAPT_INTERVAL:
+            return
+        if self.frame_ms > self.budget_ms and self.level < len(self.levels) - 1:
+            self.set_level(self.level + 1)
+        elif self.frame_ms < self.budget_ms * RESTORE_HEADROOM and self.level > 0:
+            self.set_level(self.level - 1)
+
+    def run(self):
+        """Generator of per-frame records until the source ends or stop() is called"""
+        source = self.source
+        last_index = -1
+        try:
+            while not self._stopped.is_set():
+                latest = source.read()
+                if latest is None:
+                    break
+                index, captured_at, frame = latest
+                self.tracker.skip_frames(index - last_index - 1)
+                last_index = index
+
+                start = time.perf_counter()
+                ball_center, methods, confidence = self.tracker.track_ball(frame)
+                record = self.tracker.record_frame(index + 1, source.fps, frame.shape[1], frame.shape[0],
+                                                   ball_center, methods, confidence)
+                now = time.perf_counter()
+                self.adapt((now - start) * 1000)
+                record['latency_ms'] = round((now - captured_at) * 1000, 1)
+                record['workload_level'] = self.level
+                self.processed += 1
+                self.latencies.append(record['latency_ms'])
+                yield record
+        finally:
+            source.stop()
+
+    def stop(self):
+        self._stopped.set()
+        self.source.stop()
+
+    def stats(self):
+        """Throughput, drops, current workload and recent latency percentiles"""
+        detectors, stride = self.levels[self.level]
+        latency_p50 = latency_p95 = None
+        if self.latencies:
+            latency_p50, latency_p95 = (round(float(v), 1) for v in np.percentile(self.latencies, [50, 95]))
+        return {
+            'source_fps': self.source.fps,
+            'budget_ms': round(self.budget_ms, 1),
+            'frames_read': self.source.frames_read,
+            'frames_processed': self.processed,
+            'frames_dropped': self.source.dropped,
+            'workload_level': self.level,
+            'detectors': list(detectors),
+            'detect_stride': stride,
+            'tracking_ms': round(self.frame_ms, 2) if self.frame_ms is not None else None,
+            'latency_p50_ms': latency_p50,
+            'latency_p95_ms': latency_p95
+        }
+
+class LiveSession:
+    """Run a LiveTracker on a background thread and fan its records out to subscribers.
+
+    Each subscriber gets a bounded queue; a client that falls behind loses its oldest
+    positions rather than delaying the tracker or other clients. on_end is called on
+    the session's thread once it has ended, failed or been stopped.
+    """
+
+    def __init__(self, session_id, live_tracker, queue_size=64, on_end=None):
+        self.session_id = session_id
+        self.live = live_tracker
+        self.queue_size = queue_size
+        self.on_end = on_end
+        self.status = 'running'
+        self.error = None
+        self.last_record = None
+        self.started_at = time.time()
+        self.ended_at = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        status, error = 'ended', None
+        try:
+            for record in self.live.run():
+                self.last_record = record
+                self._publish('frame', record)
+        except Exception as e:
+            logger.error(f"Live session {self.session_id} failed: {str(e)}")
+            status, error = 'failed', str(e)
+        with self._lock:
+            self.status, self.error = status, error
+            self.ended_at = time.time()
+            self._publish_locked('end', self._stats())
+        if self.on_end is not None:
+            self.on_end()
+        logger.info(f"Live session {self.session_id} {status}")
+
+    def _publish(self, event, payload):
+        with self._lock:
+            self._publish_locked(event, payload)
+
+    def _publish_locked(self, event, payload):
+        for subscriber in self._subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait((event, payload))
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscribe(self):
+        """Queue receiving (event, payload) pairs, or None if the session has already ended"""
+        with self._lock:
+            if self.status != 'running':
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stop(self):
+        self.live.stop()
+        self._thread.join(timeout=5)
+
+    def _stats(self):
+        return dict(self.live.stats(), session_id=self.session_id, status=self.status, error=self.error,
+                    started_at=self.started_at, ended_at=self.ended_at, subscribers=len(self._subscribers),
+                    last_record=self.last_record)
+
+    def stats(self):
+        with self._lock:
+            return self._stats()
+
+def main():
+    parser = argparse.ArgumentParser(description='Track a live camera or stream in real time')
+    parser.add_argument('source', help='Camera index (e.g. 0), stream URL (rtsp://...) or a video file to replay in real time')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Per-frame tracking budget in milliseconds (default: the source frame interval)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Detection scale, as for ballTracker.py')
+    parser.add_argument('--roi', action='store_true', help='Search near the last position first')
+    parser.add_argument('-o', '--output', default=None, help='Write per-frame records to this file as JSON lines')
+    args = parser.parse_args()
+
+    try:
+        params = TrackerParams(roi_tracking=args.roi, detect_scale=args.scale)
+    except ValueError as e:
+        parser.error(str(e))
+
+    source = LiveSource(args.source)
+    if not source.isOpened():
+        print(f"Error: Could not open live source {args.source}")
+        return 1
+    live = LiveTracker(source, params, budget_ms=args.budget_ms)
+    print(f"Live source: {source.width}x{source.height} at {source.fps:.1f} FPS, "
+          f"budget {live.budget_ms:.1f} ms per frame")
+
+    output = open(args.output, 'w') if args.output else None
+    last_report = time.time()
+    try:
+        for record in live.run():
+            if output:
+                output.write(json.dumps(record) + '\n')
+            if time.time() - last_report >= 1.0:
+                last_report = time.time()
+                s = live.stats()
+                print(f"Frames: {s['frames_processed']} tracked, {s['frames_dropped']} dropped | "
+                      f"Level {s['workload_level']} | Latency p50 {s['latency_p50_ms']} ms, p95 {s['latency_p95_ms']} ms")
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        live.stop()
+        if output:
+            output.close()
+
+    s = live.stats()
+    print(f"\nTracked {s['frames_processed']} of {s['frames_read']} frames ({s['frames_dropped']} dropped), "
+          f"latency p50 {s['latency_p50_ms']} ms, p95 {s['latency_p95_ms']} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
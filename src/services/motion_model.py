@@ -0,0 +1,143 @@
+import numpy as np
+
+GRAVITY = 9.81  # m/s²
+# Height in metres of the scene a frame shows vertically: table, net and the ball's arcs
+# in a side-on table tennis shot
+SCENE_HEIGHT_METERS = 2.5
+# Assumed when a container does not report its frame rate
+DEFAULT_FPS = 30.0
+
+def gravity_prior(fps, frame_height, scene_height=SCENE_HEIGHT_METERS):
+    """Downward acceleration of a falling ball in pixels per frame²"""
+    fps = fps or DEFAULT_FPS
+    return GRAVITY * frame_height / scene_height / (fps * fps)
+
+class BallKalmanFilter:
+    """Constant-acceleration Kalman filter over the ball's image position.
+
+    State is (x, y, vx, vy, ax, ay) in pixels and frames. Vertical acceleration starts
+    at the gravity prior and is refined from measurements. A measurement far outside
+    the innovation gate re-seeds the filter; a bounce (measured rise while falling)
+    keeps the horizontal motion and restarts the vertical one. Unconfirmed measurements,
+    from a search that only looked near the prediction, move the filter but do not
+    count towards or keep its lock.
+    """
+
+    def __init__(self, gravity=0.0, process_noise=1.0, measurement_noise=2.0,
+                 gate_sigma=4.0, min_gate=20.0):
+        self.gravity = gravity
+        self.gate_sigma = gate_sigma
+        self.min_gate = min_gate
+
+        self.F = np.eye(6)
+        self.F[0, 2] = self.F[1, 3] = 1.0
+        self.F[0, 4] = self.F[1, 5] = 0.5
+        self.F[2, 4] = self.F[3, 5] = 1.0
+        self.H = np.zeros((2, 6))
+        self.H[0, 0] = self.H[1, 1] = 1.0
+        self.Q = process_noise * np.diag([0.25, 0.25, 1.0, 1.0, 0.1, 0.1])
+        self.R = (measurement_noise ** 2) * np.eye(2)
+
+        self.state = None
+        self.covariance = None
+        self.last_measurement = None
+        self.updates = 0
+        self.misses = 0
+        self.unconfirmed = 0
+
+    @property
+    def initialized(self):
+        return self.state is not None
+
+    @property
+    def locked(self):
+        """True once the filter has followed several consecutive measurements, the latest one confirmed"""
+        return self.state is not None and self.updates >= 3 and self.misses == 0 and self.unconfirmed == 0
+
+    @property
+    def position(self):
+        if self.state is None:
+            return None
+        return int(round(self.state[0])), int(round(self.state[1]))
+
+    def reset(self, position, velocity=(0.0, 0.0)):
+        """Start tracking from a single measurement"""
+        self.state = np.array([position[0], position[1], velocity[0], velocity[1],
+                               0.0, self.gravity], dtype=np.float64)
+        self.covariance = np.diag([self.R[0, 0], self.R[1, 1], 100.0, 100.0, 1.0, 1.0])
+        self.last_measurement = position
+        self.updates = 1
+        self.misses = 0
+        self.unconfirmed = 0
+
+    def clear(self):
+        self.state = None
+        self.covariance = None
+        self.last_measurement = None
+        self.updates = 0
+        self.misses = 0
+        self.unconfirmed = 0
+
+    def predict(self):
+        """Advance one frame and return the predicted position, or None before the first measurement"""
+        if self.state is None:
+            return None
+        self.state = self.F @ self.state
+        self.covariance = self.F @ self.covariance @ self.F.T + self.Q
+        return self.position
+
+    def innovation_covariance(self):
+        return self.H @ self.covariance @ self.H.T + self.R
+
+    def gate_radius(self):
+        """Search radius around the prediction covering gate_sigma standard deviations"""
+        if self.state is None:
+            return None
+        sigma = np.sqrt(np.linalg.eigvalsh(self.innovation_covariance()).max())
+        return max(self.min_gate, self.gate_sigma * sigma)
+
+    def update(self, measurement, confirmed=True):
+        """Correct the prediction with a detected position"""
+        if self.state is None:
+            self.reset(measurement)
+            self.unconfirmed = 0 if confirmed else 1
+            return
+
+        z = np.array(measurement, dtype=np.float64)
+        innovation = z - self.H @ self.state
+        S = self.innovation_covariance()
+        distance = float(innovation @ np.linalg.solve(S, innovation))
+        last = self.last_measurement
+
+        if distance > self.gate_sigma ** 2:
+            # Outside the gate: re-seed, keeping the velocity implied by the last two measurements
+            velocity = (z[0] - last[0], z[1] - last[1]) if self.misses == 0 else (0.0, 0.0)
+            self.reset(measurement, velocity)
+            self.unconfirmed = 0 if confirmed else 1
+            return
+
+        if self.state[3] > 0 and last is not None and z[1] < last[1] and innovation[1] < -np.sqrt(S[1, 1]):
+            # Bounce: restart the vertical motion from the observed rebound
+            self.state[1] = z[1]
+            self.state[3] = z[1] - last[1]
+            self.state[5] = self.gravity
+            self.covariance[3, 3] = 100.0
+            self.covariance[5, 5] = 1.0
+            innovation = z - self.H @ self.state
+            S = self.innovation_covariance()
+
+        gain = self.covariance @ self.H.T @ np.linalg.inv(S)
+        self.state = self.state + gain @ innovation
+        self.covariance = (np.eye(6) - gain @ self.H) @ self.covariance
+        self.last_measurement = measurement
+        self.misses = 0
+        if confirmed:
+            self.updates += 1
+            self.unconfirmed = 0
+        else:
+            self.unconfirmed += 1
+
+    def miss(self):
+        """Record a frame without a measurement"""
+        if self.state is not None:
+            self.misses += 1
@@ -0,0 +1,124 @@
+from collections import deque
+import cv2
+
+class RallySegmenter:
+    """Split a video into rallies and idle stretches from cheap low-resolution motion.
+
+    Each frame is shrunk to params.idle_width pixels across and differenced against the
+    previous one. A frame is active if something moved that is part of a small, isolated
+    bright region of the frame, i.e. a ball in flight. The edges of a player walking in a
+    light shirt also move, but belong to a large bright region and are ignored. A rally
+    starts once min_active of the buffered pre-roll frames are active and includes that
+    pre-roll; it ends after gap_frames frames without activity. Frames are released in
+    order with their rally flag, at most preroll frames late.
+
+    Activity depends only on a frame and the one before it, so it can be computed for
+    parts of a video separately; rally_flags() then runs the (sequential) rally logic
+    over the combined activity of the whole video.
+    """
+
+    def __init__(self, params):
+        self.params = params
+        self.size = None
+        self.diff_threshold = params.idle_diff_threshold
+        self.bright_threshold = params.idle_bright_threshold
+        self.min_active = params.idle_min_active
+        self.gap_frames = params.idle_gap_frames
+        self.preroll = deque(maxlen=params.idle_preroll_frames)
+        self.in_rally = False
+        self.since_active = 0
+        self.previous = None
+        self.diff = None
+        self.mask = None
+        self.bright = None
+
+    def configure(self, frame_shape):
+        """Derive the low-resolution size and ball-sized component limits from the first frame"""
+        p = self.params
+        height, width = frame_shape[:2]
+        scale = min(1.0, p.idle_width / width)
+        self.size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        self.max_area = max(2, int(2 * p.max_area * scale * scale))
+        self.max_extent = max(2, int(2 * p.max_area ** 0.5 * scale))
+
+    def is_active(self, frame):
+        """True if something ball-sized and bright moved since the previous frame"""
+        if self.size is None:
+            self.configure(frame.shape)
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        previous, self.previous = self.previous, gray
+        if previous is None:
+            return False
+        self.diff = cv2.absdiff(gray, previous, dst=self.diff)
+        _, self.mask = cv2.threshold(self.diff, self.diff_threshold, 255, cv2.THRESH_BINARY, dst=self.mask)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(self.mask, connectivity=8)
+        if count == 1:
+            return False
+        _, self.bright = cv2.threshold(gray, self.bright_threshold - 1, 255, cv2.THRESH_BINARY, dst=self.bright)
+        _, bright_labels, bright_stats, _ = cv2.connectedComponentsWithStats(self.bright, connectivity=8)
+        # The difference of a fast or blurred ball spans its whole path since the last frame
+        max_area, max_extent = 4 * self.max_area, 3 * self.max_extent
+        for x, y, w, h, area in stats[1:count]:
+            if area > max_area or w > max_extent or h > max_extent:
+                continue
+            moved = self.mask[y:y + h, x:x + w] > 0
+            regions = set(bright_labels[y:y + h, x:x + w][moved].tolist()) - {0}
+            if regions and all(bright_stats[r, cv2.CC_STAT_AREA] <= self.max_area
+                               and bright_stats[r, cv2.CC_STAT_WIDTH] <= self.max_extent
+                               and bright_stats[r, cv2.CC_STAT_HEIGHT] <= self.max_extent
+                               for r in regions):
+                return True
+        return False
+
+    def segment(self, frames):
+        """Yield (frame, in_rally) for each frame of an iterable, in order"""
+        return self._segment((frame, self.is_active(frame)) for frame in frames)
+
+    def rally_flags(self, activity):
+        """In-rally flag of each frame, given every frame's is_active() result from the start"""
+        return [in_rally for _, in_rally in self._segment((None, active) for active in activity)]
+
+    def _segment(self, frames):
+        for frame, active in frames:
+            if self.in_rally:
+                self.since_active = 0 if active else self.since_active + 1
+                if self.since_active > self.gap_frames:
+                    self.in_rally = False
+                else:
+                    yield frame, True
+                    continue
+
+            if self.preroll.maxlen == 0:
+                if active:
+                    self.in_rally, self.since_active = True, 0
+                yield frame, self.in_rally
+                continue
+            if len(self.preroll) == self.preroll.maxlen:
+                yield self.preroll[0][0], False
+            self.preroll.append((frame, active))
+            if sum(was_active for _, was_active in self.preroll) >= self.min_active:
+                self.in_rally, self.since_active = True, 0
+                while self.preroll:
+                    yield self.preroll.popleft()[0], True
+        # Frames still waiting in the pre-roll at the end were never part of a rally
+        while self.preroll:
+            yield self.preroll.popleft()[0], False
+
+def extend_segments(segments, frame):
+    """Add a rally frame to a list of [start, end] frame ranges; returns True if it starts a new rally"""
+    if segments and segments[-1][1] == frame - 1:
+        segments[-1][1] = frame
+        return False
+    segments.append([frame, frame])
+    return True
+
+def describe_segments(segments, fps):
+    """Rally ranges as result dicts with frame numbers and times in seconds"""
+    return [{
+        'start_frame': start,
+        'end_frame': end,
+        'start_time': round((start - 1) / fps, 3),
+        'end_time': round(end / fps, 3),
+        'frames': end - start + 1
+    } for start, end in segments]
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from dataclasses import asdict
+from camera_calibration import profile_fingerprint
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILENAME = 'summary.json'
+STAGING_PREFIX = 'staging-'
+
+def cache_key(content_hash, tracker_version, params):
+    """Combine the upload's content hash with everything else that changes the output"""
+    params_json = json.dumps(asdict(params), sort_keys=True)
+    # A camera profile is referenced by path; its contents change the output as well
+    profile = profile_fingerprint(params.camera_profile) if params.camera_profile else ''
+    return hashlib.sha256(f"{content_hash}:{tracker_version}:{params_json}:{profile}".encode()).hexdigest()
+
+class ResultCache:
+    """Size-bounded LRU cache of tracking outputs keyed by upload content.
+
+    Each entry is a directory named after its key holding the columnar results,
+    the rendered video (if any) and summary.json. summary.json is written last, so
+    an entry without it is still being produced; its mtime records the last use.
+    on_evict, if given, is called with the key of every entry evicted, so copies of
+    its data kept elsewhere are bounded by the cache too.
+    """
+
+    def __init__(self, root, max_bytes, on_evict=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def path(self, key, filename):
+        return os.path.join(self.entry_dir(key), filename)
+
+    def find(self, key, stem):
+        """Path of the entry file named stem with any extension, or None"""
+        entry_dir = self.entry_dir(key)
+        if os.path.isdir(entry_dir):
+            for filename in os.listdir(entry_dir):
+                if os.path.splitext(filename)[0] == stem:
+                    return os.path.join(entry_dir, filename)
+        return None
+
+    def reserve(self, key):
+        """Create the entry directory that a job will write its outputs into"""
+        os.makedirs(self.entry_dir(key), exist_ok=True)
+        return self.entry_dir(key)
+
+    def staging_dir(self, name):
+        """Create a directory for outputs whose key is not known yet, e.g. of an upload still arriving"""
+        path = os.path.join(self.root, STAGING_PREFIX + name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def adopt(self, staging_dir, key):
+        """Move a staging directory into the entry for key.
+
+        Returns (entry_dir, adopted). If a complete entry already exists it is kept and the
+        staged files are dropped (adopted is False); if another job is still producing the
+        entry, the staged files stay where they are and entry_dir is None.
+        """
+        entry_dir = self.entry_dir(key)
+        with self._lock:
+            if os.path.isfile(os.path.join(entry_dir, SUMMARY_FILENAME)):
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                return entry_dir, False
+            if os.path.isdir(entry_dir):
+                return None, False
+            os.replace(staging_dir, entry_dir)
+        return entry_dir, True
+
+    def lookup(self, key):
+        """Return the cached summary and mark the entry as recently used, or None on a miss"""
+        summary_path = self.path(key, SUMMARY_FILENAME)
+        try:
+            with open(summary_path) as f:
+                summary = json.load(f)
+            os.utime(summary_path)
+        except (OSError, ValueError):
+            return None
+        return summary
+
+    def store(self, key, summary):
+        """Mark an entry complete by writing its summary, then evict down to the size limit"""
+        summary_path = self.path(key, SUMMARY_FILENAME)
+        tmp_path = summary_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(summary, f)
+        os.replace(tmp_path, summary_path)
+        self.evict(keep=key)
+
+    def discard(self, key):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def _entries(self):
+        """(last_used, size, key) for every complete entry"""
+        entries = []
+        for key in os.listdir(self.root):
+            entry_dir = self.entry_dir(key)
+            summary_path = os.path.join(entry_dir, SUMMARY_FILENAME)
+            if not os.path.isfile(summary_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry_dir, name))
+                       for name in os.listdir(entry_dir))
+            entries.append((os.path.getmtime(summary_path), size, key))
+        return entries
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self.discard(key)
+                total -= size
+                if self.on_evict is not None:
+                    self.on_evict(key)
+                logger.info(f"Evicted cached results: {key}")
+
+    def remove_incomplete(self, older_than=0):
+        """Drop entries left behind by jobs that never finished"""
+        cutoff = time.time() - older_than
+        for key in os.listdir(self.root):
+            entry_dir = self.entry_dir(key)
+            if (os.path.isdir(entry_dir)
+                    and not os.path.isfile(os.path.join(entry_dir, SUMMARY_FILENAME))
+                    and os.path.getmtime(entry_dir) < cutoff):
+                self.discard(key)
+                logger.info(f"Removed incomplete cache entry: {key}")
@@ -0,0 +1,164 @@
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from tracking_format import TRACKING_DTYPE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    tracking_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    content_hash TEXT,
+    cache_key TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    summary TEXT,
+    error TEXT,
+    source_path TEXT,
+    output_path TEXT,
+    columnar_path TEXT
+);
+CREATE INDEX IF NOT EXISTS results_by_content_hash ON results (content_hash);
+CREATE INDEX IF NOT EXISTS results_by_created_at ON results (created_at);
+CREATE TABLE IF NOT EXISTS frames (
+    cache_key TEXT NOT NULL,
+    frame INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    methods INTEGER NOT NULL,
+    PRIMARY KEY (cache_key, frame)
+) WITHOUT ROWID;
+"""
+
+JOB_FIELDS = ('status', 'content_hash', 'cache_key', 'created_at', 'finished_at', 'error',
+              'source_path', 'output_path', 'columnar_path')
+
+class ResultsStore:
+    """Finished tracking jobs and their per-frame data in an SQLite database.
+
+    Jobs are looked up by tracking ID, upload content hash or creation time. Per-frame
+    rows mirror tracking_format.TRACKING_DTYPE and are clustered by (cache_key, frame),
+    so a frame range of a long video is read without touching the rest, and identical
+    uploads share one copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # One connection shared by the API's request threads, serialized by a lock. It is
+        # opened on first use, in the process that uses it: SQLite connections must not be
+        # carried across fork(), e.g. from a preloading gunicorn master into its worker.
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def _db(self):
+        """The connection of this process, opened if needed. Must hold self._lock"""
+        if self._conn is None or self._pid != os.getpid():
+            # A connection inherited from the parent is abandoned, not closed
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def has_frames(self, cache_key):
+        with self._lock:
+            row = self._db.execute('SELECT 1 FROM frames WHERE cache_key = ? LIMIT 1', (cache_key,)).fetchone()
+        return row is not None
+
+    def save(self, tracking_id, job, frames=None):
+        """Insert or replace a job record; frames (a TRACKING_DTYPE array) are stored under its cache key"""
+        summary = json.dumps(job['results']) if job.get('results') is not None else None
+        values = [tracking_id, summary] + [job.get(field) for field in JOB_FIELDS]
+        with self._lock, self._db as db:
+            db.execute(
+                f"INSERT OR REPLACE INTO results (tracking_id, summary, {', '.join(JOB_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(values))})", values)
+            if frames is not None and job.get('cache_key'):
+                key = job['cache_key']
+                db.executemany(
+                    'INSERT OR IGNORE INTO frames (cache_key, frame, x, y, confidence, methods) VALUES (?, ?, ?, ?, ?, ?)',
+                    ((key, frame, x, y, confidence, methods) for frame, x, y, confidence, methods in frames.tolist()))
+
+    def get(self, tracking_id):
+        """A stored job in the shape TrackingJobQueue uses, or None"""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT summary, {', '.join(JOB_FIELDS)} FROM results WHERE tracking_id = ?",
+                (tracking_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row[1:]), input_path=None, staging_dir=None)
+        job['results'] = json.loads(row[0]) if row[0] is not None else None
+        return job
+
+    def frames(self, cache_key, start=None, end=None):
+        """TRACKING_DTYPE array of the stored frames start..end (inclusive, 1-based), or None if none are stored"""
+        start = 1 if start is None else start
+        end = (1 << 31) - 1 if end is None else end
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT frame, x, y, confidence, methods FROM frames '
+                'WHERE cache_key = ? AND frame BETWEEN ? AND ? ORDER BY frame',
+                (cache_key, start, end)).fetchall()
+            if not rows and self._db.execute('SELECT 1 FROM frames WHERE cache_key = ? LIMIT 1',
+                                             (cache_key,)).fetchone() is None:
+                return None
+        return np.array(rows, dtype=TRACKING_DTYPE)
+
+    def find(self, content_hash=None, since=None, until=None, limit=50):
+        """Stored jobs, newest first, optionally for one upload hash and/or a created_at window"""
+        conditions, values = [], []
+        if content_hash:
+            conditions.append('content_hash = ?')
+            values.append(content_hash)
+        if since is not None:
+            conditions.append('created_at >= ?')
+            values.append(since)
+        if until is not None:
+            conditions.append('created_at < ?')
+            values.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT tracking_id, status, content_hash, created_at, finished_at, summary, error "
+                f"FROM results {where} ORDER BY created_at DESC LIMIT ?", values + [limit]).fetchall()
+        return [{
+            'tracking_id': tracking_id,
+            'status': status,
+            'content_hash': content_hash,
+            'created_at': created_at,
+            'finished_at': finished_at,
+            'results': json.loads(summary) if summary is not None else None,
+            'error': error
+        } for tracking_id, status, content_hash, created_at, finished_at, summary, error in rows]
+
+    def delete(self, tracking_id):
+        """Remove a job, and its frames unless another job shares them"""
+        with self._lock, self._db as db:
+            row = db.execute('SELECT cache_key FROM results WHERE tracking_id = ?', (tracking_id,)).fetchone()
+            if row is None:
+                return False
+            db.execute('DELETE FROM results WHERE tracking_id = ?', (tracking_id,))
+            if row[0] and db.execute('SELECT 1 FROM results WHERE cache_key = ? LIMIT 1',
+                                     (row[0],)).fetchone() is None:
+                db.execute('DELETE FROM frames WHERE cache_key = ?', (row[0],))
+        return True
+
+    def delete_frames(self, cache_key):
+        """Drop the per-frame rows stored under a cache key, e.g. once the result cache evicts it.
+
+        Job records are kept, so the history still lists them with their summaries.
+        """
+        with self._lock, self._db as db:
+            db.execute('DELETE FROM frames WHERE cache_key = ?', (cache_key,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
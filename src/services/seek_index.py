@@ -0,0 +1,133 @@
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+import cv2
+import numpy as np
+
+# OpenCV's FFmpeg seek to frame n lands on the last key frame at or before n - 16 and
+# decodes forward from there
+OPENCV_SEEK_BACKOFF = 16
+# Decode distance assumed for a seek when a video has no key frame index
+DEFAULT_SEEK_COST = 300
+
+def build_keyframe_index(path):
+    """Indices (0-based) of a video's key frames, or None if the container cannot be read raw.
+
+    Only demuxes: packets are read with CAP_PROP_FORMAT=-1 and never decoded, which takes
+    milliseconds even for long videos. Packets are in decode order, which matches display
+    order at key frames for the closed-GOP streams cameras produce.
+    """
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return None
+        keyframes = []
+        index = 0
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(index)
+            index += 1
+    finally:
+        cap.release()
+    return np.array(keyframes, dtype=np.uint32)
+
+class FrameSeeker:
+    """An open video that reads arbitrary frames, seeking only when that decodes less.
+
+    Reading frame n either continues forward from the current position or seeks, which
+    costs decoding from the key frame OpenCV lands on. The key frame index gives the
+    exact cost of the seek, so stepping through nearby frames never re-decodes a GOP
+    and jumping far away never decodes more than one.
+    """
+
+    def __init__(self, path, keyframes=None):
+        self.path = path
+        self.keyframes = keyframes
+        self.cap = None
+        self.position = 0
+        self.lock = threading.Lock()
+        # Holders and waiters, and whether the pool has dropped it; kept by SeekerPool under its lock
+        self.users = 0
+        self.retired = False
+
+    def seek_cost(self, index):
+        """Frames decoded to reach frame index by seeking"""
+        if self.keyframes is None or len(self.keyframes) == 0:
+            return DEFAULT_SEEK_COST
+        target = max(0, index - OPENCV_SEEK_BACKOFF)
+        i = bisect_right(self.keyframes, target) - 1
+        return index - (int(self.keyframes[i]) if i >= 0 else 0)
+
+    def read(self, index):
+        """Decode frame index (0-based); returns None past the end. Must hold self.lock"""
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(self.path)
+            self.position = 0
+        if index < self.position or index - self.position > self.seek_cost(index):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self.position = index
+        while self.position < index:
+            if not self.cap.grab():
+                return None
+            self.position += 1
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        self.position += 1
+        return frame
+
+    def close(self):
+        with self.lock:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+
+class SeekerPool:
+    """Recently used FrameSeekers by video path, so scrubbing through one video keeps its decoder.
+
+    A seeker dropped from the pool while a request is reading from it is closed by that
+    request when it is done, so opening another video never waits for a long clip.
+    """
+
+    def __init__(self, max_open=4):
+        self.max_open = max_open
+        self._seekers = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, path, keyframes=None):
+        """Hold the seeker for path exclusively"""
+        with self._lock:
+            seeker = self._seekers.pop(path, None) or FrameSeeker(path, keyframes)
+            self._seekers[path] = seeker
+            seeker.users += 1
+            idle = []
+            while len(self._seekers) > self.max_open:
+                old = self._seekers.popitem(last=False)[1]
+                if self._retire(old):
+                    idle.append(old)
+        for old in idle:
+            old.close()
+        try:
+            with seeker.lock:
+                yield seeker
+        finally:
+            with self._lock:
+                seeker.users -= 1
+                close = seeker.retired and seeker.users == 0
+            if close:
+                seeker.close()
+
+    def _retire(self, seeker):
+        """Mark a seeker dropped from the pool; True if nobody uses it and it can be closed now.
+        Otherwise its last user closes it. Must hold self._lock"""
+        seeker.retired = True
+        return seeker.users == 0
+
+    def discard(self, path):
+        with self._lock:
+            seeker = self._seekers.pop(path, None)
+            idle = seeker is not None and self._retire(seeker)
+        if idle:
+            seeker.close()
@@ -0,0 +1,74 @@
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import partial
+import numpy as np
+
+# Shared no-op context for code paths that are only timed when profiling is enabled
+NO_PROFILE = nullcontext()
+
+class StageProfiler:
+    """Per-frame wall-clock timings of named pipeline stages plus candidate counts.
+
+    Samples are kept in compact float arrays so profiling a long video costs a few
+    bytes per stage per frame.
+    """
+
+    def __init__(self):
+        # partial rather than a lambda so chunk workers can send profilers back by pickle
+        self.timings = defaultdict(partial(array, 'd'))
+        self.counts = defaultdict(partial(array, 'd'))
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name].append((time.perf_counter() - start) * 1000)
+
+    def count(self, name, value):
+        self.counts[name].append(value)
+
+    def merge(self, other):
+        """Add another profiler's samples, e.g. from a parallel chunk worker"""
+        for name, samples in other.timings.items():
+            self.timings[name].extend(samples)
+        for name, samples in other.counts.items():
+            self.counts[name].extend(samples)
+
+    def summary(self):
+        """Percentile summary: per-stage milliseconds and per-detector candidate counts"""
+        stages = {}
+        for name, samples in self.timings.items():
+            values = np.frombuffer(samples, dtype=np.float64)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            stages[name] = {
+                'calls': len(values),
+                'total_ms': round(float(values.sum()), 2),
+                'mean_ms': round(float(values.mean()), 3),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3)
+            }
+        candidates = {}
+        for name, samples in self.counts.items():
+            values = np.frombuffer(samples, dtype=np.float64)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            candidates[name] = {
+                'mean': round(float(values.mean()), 2),
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+                'max': float(values.max())
+            }
+        return {'stages': stages, 'candidates': candidates}
+
+    def report(self):
+        """Print the stage timing table"""
+        stages = self.summary()['stages']
+        print(f"\n{'Stage':<14}{'calls':>8}{'total ms':>12}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for name, s in sorted(stages.items(), key=lambda item: -item[1]['total_ms']):
+            print(f"{name:<14}{s['calls']:>8}{s['total_ms']:>12.1f}"
+                  f"{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
@@ -0,0 +1,46 @@
+import pytest
+from admission import AdmissionController, AdmissionError, JobCost
+
+MB = 1024 * 1024
+
+def cost(memory_mb, cpu_seconds=1.0):
+    """A JobCost with the given memory and CPU time, whatever the frame size"""
+    job_cost = JobCost(64, 64, 1, 30.0)
+    job_cost.memory_bytes = memory_mb * MB
+    job_cost.cpu_seconds = cpu_seconds
+    return job_cost
+
+def test_next_jobs_start_in_order_within_budgets():
+    admission = AdmissionController(workers=2, memory_budget=100 * MB, max_wait=600)
+    admission.admit('a', cost(60))
+    admission.admit('b', cost(50))
+    admission.admit('c', cost(10))
+    # b does not fit beside a, and c may not overtake it
+    assert admission.next_jobs() == ['a']
+    admission.release('a')
+    assert admission.next_jobs() == ['b', 'c']
+    admission.admit('d', cost(10))
+    # Both workers are busy
+    assert admission.next_jobs() == []
+    admission.release('c')
+    assert admission.next_jobs() == ['d']
+
+def test_running_work_holds_worker_and_memory():
+    admission = AdmissionController(workers=2, memory_budget=100 * MB, max_wait=600)
+    admission.admit('live', cost(80), running=True)
+    admission.admit('a', cost(40))
+    assert admission.next_jobs() == []
+    admission.release('live')
+    assert admission.next_jobs() == ['a']
+
+def test_admit_refuses_over_budgets():
+    admission = AdmissionController(workers=1, memory_budget=100 * MB, max_wait=10)
+    with pytest.raises(AdmissionError) as refused:
+        admission.admit('huge', cost(200))
+    assert refused.value.status == 413
+    admission.admit('a', cost(10, cpu_seconds=30))
+    with pytest.raises(AdmissionError) as refused:
+        admission.admit('b', cost(10))
+    assert refused.value.status == 429 and refused.value.retry_after >= 1
+    # Refused jobs were never registered
+    assert admission.next_jobs() == ['a']
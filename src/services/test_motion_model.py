@@ -0,0 +1,35 @@
+from motion_model import BallKalmanFilter
+
+def follow(kalman, positions, confirmed=True):
+    for position in positions:
+        kalman.predict()
+        kalman.update(position, confirmed)
+
+def test_locks_after_consecutive_measurements():
+    kalman = BallKalmanFilter()
+    follow(kalman, [(100, 100), (110, 102)])
+    assert not kalman.locked
+    follow(kalman, [(120, 104)])
+    assert kalman.locked
+    kalman.predict()
+    kalman.miss()
+    assert not kalman.locked and kalman.initialized
+
+def test_measurement_outside_gate_reseeds():
+    kalman = BallKalmanFilter()
+    follow(kalman, [(100, 100), (110, 102), (120, 104), (130, 106)])
+    prediction = kalman.predict()
+    assert abs(prediction[0] - 140) <= 2 and abs(prediction[1] - 108) <= 2
+    # A jump far past the gate radius starts over from the new position
+    assert kalman.gate_radius() < 200
+    kalman.update((400, 300))
+    assert kalman.position == (400, 300) and kalman.updates == 1 and not kalman.locked
+
+def test_unconfirmed_measurements_move_but_do_not_lock():
+    kalman = BallKalmanFilter()
+    follow(kalman, [(100, 100), (110, 102)])
+    follow(kalman, [(120, 104), (130, 106)], confirmed=False)
+    assert not kalman.locked and kalman.updates == 2
+    assert abs(kalman.position[0] - 130) <= 2
+    follow(kalman, [(140, 108)])
+    assert kalman.locked
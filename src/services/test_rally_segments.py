@@ -0,0 +1,26 @@
+import contextlib
+import io
+import pytest
+from ballTracker import EnhancedPingPongTracker, TrackerParams
+from benchmark_tracker import generate_scene
+
+@pytest.fixture(scope='module')
+def match_video(tmp_path_factory):
+    """Short match-like clip: rallies separated by breaks with players walking"""
+    path = str(tmp_path_factory.mktemp('rallies') / 'match.avi')
+    generate_scene(path, 320, 180, 600, rally_frames=90, pause_frames=150, players=2)
+    return path
+
+def rally_segments(path, workers):
+    tracker = EnhancedPingPongTracker(path, params=TrackerParams(skip_idle=True))
+    with contextlib.redirect_stdout(io.StringIO()):
+        success, results = tracker.process_video(workers=workers)
+    assert success
+    return results['rally_segments']
+
+@pytest.mark.parametrize('workers', [3, 4, 7])
+def test_parallel_rally_segments_match_sequential(match_video, workers):
+    # Chunk boundaries fall inside rallies; each rally must still span them unchanged
+    sequential = rally_segments(match_video, 1)
+    assert len(sequential) >= 2
+    assert rally_segments(match_video, workers) == sequential
@@ -0,0 +1,41 @@
+import os
+import time
+from result_cache import ResultCache
+
+def add_entry(cache, key, size, last_used):
+    cache.reserve(key)
+    with open(cache.path(key, 'tracking.npz'), 'wb') as f:
+        f.write(b'\0' * size)
+    cache.store(key, {'key': key})
+    os.utime(cache.path(key, 'summary.json'), (last_used, last_used))
+
+def test_evicts_least_recently_used(tmp_path):
+    evicted = []
+    cache = ResultCache(str(tmp_path), max_bytes=2500, on_evict=evicted.append)
+    now = time.time()
+    add_entry(cache, 'a', 1000, now - 300)
+    add_entry(cache, 'b', 1000, now - 200)
+    # Using a makes b the least recently used entry
+    assert cache.lookup('a') == {'key': 'a'}
+    add_entry(cache, 'c', 1000, now)
+    assert evicted == ['b']
+    assert cache.lookup('b') is None and not os.path.exists(cache.entry_dir('b'))
+    assert cache.lookup('a') is not None and cache.lookup('c') is not None
+
+def test_entry_being_stored_is_kept(tmp_path):
+    evicted = []
+    cache = ResultCache(str(tmp_path), max_bytes=500, on_evict=evicted.append)
+    add_entry(cache, 'a', 100, time.time() - 100)
+    # Larger than the whole cache: everything else goes, the new entry stays
+    add_entry(cache, 'big', 1000, time.time())
+    assert evicted == ['a']
+    assert cache.lookup('big') is not None
+
+def test_incomplete_entries_are_not_served_or_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=100)
+    cache.reserve('running')
+    with open(cache.path('running', 'tracking.npz'), 'wb') as f:
+        f.write(b'\0' * 1000)
+    assert cache.lookup('running') is None
+    cache.evict()
+    assert os.path.exists(cache.path('running', 'tracking.npz'))
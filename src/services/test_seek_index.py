@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+import pytest
+from seek_index import DEFAULT_SEEK_COST, FrameSeeker, SeekerPool, build_keyframe_index
+
+FRAMES = 60
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    """(path, decoded frames) of an MPEG-4 clip with key frames every 12 frames"""
+    path = str(tmp_path_factory.mktemp('seek') / 'clip.mp4')
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (160, 96))
+    if not out.isOpened():
+        pytest.skip('No MPEG-4 encoder available')
+    rng = np.random.default_rng(0)
+    for i in range(FRAMES):
+        frame = rng.integers(0, 64, (96, 160, 3), dtype=np.uint8)
+        cv2.putText(frame, str(i), (20, 70), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        out.write(frame)
+    out.release()
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    assert len(frames) == FRAMES
+    return path, frames
+
+def test_keyframe_index(video):
+    path, _ = video
+    keyframes = build_keyframe_index(path)
+    assert keyframes is not None and keyframes[0] == 0
+    assert 1 < len(keyframes) < FRAMES
+
+def test_seek_cost():
+    seeker = FrameSeeker('unused.mp4', np.array([0, 12, 24, 36], dtype=np.uint32))
+    # Seeking to 30 lands on the key frame at or before 30 - 16
+    assert seeker.seek_cost(30) == 18
+    assert seeker.seek_cost(10) == 10
+    assert FrameSeeker('unused.mp4').seek_cost(30) == DEFAULT_SEEK_COST
+
+def test_reads_match_sequential_decode(video):
+    path, frames = video
+    seeker = FrameSeeker(path, build_keyframe_index(path))
+    with seeker.lock:
+        for index in [5, 6, 40, 41, 12, 0, 59, 30, 29]:
+            assert np.array_equal(seeker.read(index), frames[index]), index
+        assert seeker.read(FRAMES) is None
+    seeker.close()
+
+def test_pool_closes_evicted_seeker_after_its_last_read(video):
+    path, frames = video
+    pool = SeekerPool(max_open=1)
+    with pool.open(path) as seeker:
+        assert np.array_equal(seeker.read(3), frames[3])
+        # Opening another video evicts this seeker while it is still being read
+        with pool.open(path + '.other'):
+            pass
+        assert seeker.retired and seeker.cap is not None
+        assert np.array_equal(seeker.read(4), frames[4])
+    assert seeker.cap is None
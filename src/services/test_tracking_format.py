@@ -0,0 +1,49 @@
+import numpy as np
+from tracking_format import (METHOD_BITS, decode_methods, encode_methods, load_keyframes,
+                             load_tracking_npz, records_to_array, save_tracking_npz)
+
+FPS = 30.0
+
+def record(frame, ball_center, methods, confidence):
+    return {
+        'frame': frame,
+        'timestamp': frame / FPS,
+        'ball_center': ball_center,
+        'methods': methods,
+        'confidence': confidence,
+        'detected': ball_center is not None
+    }
+
+def test_methods_bitmask_round_trip():
+    assert encode_methods(None) == 0
+    assert encode_methods(['white', 'motion']) == METHOD_BITS['white'] | METHOD_BITS['motion']
+    # Unknown names are dropped rather than set a bit
+    assert encode_methods(['blob', 'unknown']) == METHOD_BITS['blob']
+    for mask in range(1 << len(METHOD_BITS)):
+        assert encode_methods(decode_methods(mask)) == mask
+
+def test_npz_round_trip(tmp_path):
+    records = [
+        record(1, (120, 45), ['white', 'motion'], 3),
+        record(2, None, None, 0),
+        record(3, (130, 40), ['interpolated'], 0.5),
+        record(4, None, ['skipped'], 0),
+        record(5, (140, 38), ['blob'], 1)
+    ]
+    summary = {'video_info': {'fps': FPS, 'total_frames': 5}, 'tracking_data': records}
+    keyframes = np.array([0, 3], dtype=np.uint32)
+    path = str(tmp_path / 'tracking.npz')
+    # A small chunk size so the records are packed across several chunks
+    save_tracking_npz(path, summary, records_to_array(iter(records), chunk_size=2), keyframes)
+
+    loaded_summary, loaded = load_tracking_npz(path, as_records=True)
+    assert loaded_summary == {'video_info': {'fps': FPS, 'total_frames': 5}}
+    assert loaded == records
+    assert load_keyframes(path).tolist() == [0, 3]
+
+def test_npz_without_keyframes(tmp_path):
+    path = str(tmp_path / 'tracking.npz')
+    save_tracking_npz(path, {'video_info': {'fps': FPS}}, records_to_array([]))
+    summary, frames = load_tracking_npz(path)
+    assert len(frames) == 0 and summary['video_info']['fps'] == FPS
+    assert load_keyframes(path) is None
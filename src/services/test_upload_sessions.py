@@ -0,0 +1,101 @@
+import hashlib
+import io
+import os
+import time
+import pytest
+from benchmark_tracker import generate_scene
+from upload_sessions import UploadError, UploadSessions
+
+DATA = bytes(range(256)) * 40
+
+def write(uploads, upload, start, data, chunk_size=1000):
+    with uploads.session(upload['upload_id']) as held:
+        return uploads.write(held, start, io.BytesIO(data), chunk_size)
+
+@pytest.fixture
+def upload(tmp_path):
+    uploads = UploadSessions()
+    return uploads, uploads.create('u1', str(tmp_path / 'source.avi'), len(DATA))
+
+def test_ranges_resume_from_received_bytes(upload):
+    uploads, session = upload
+    assert not write(uploads, session, 0, DATA[:3000])
+    # A retry overlapping the received bytes only contributes the new ones
+    assert not write(uploads, session, 2000, DATA[2000:6000])
+    assert session['received'] == 6000
+    # A range past the received bytes is refused with the offset to resume from
+    with pytest.raises(UploadError) as refused:
+        write(uploads, session, 7000, DATA[7000:])
+    assert refused.value.status == 409 and refused.value.received == 6000
+    assert write(uploads, session, 6000, DATA[6000:])
+    with open(session['path'], 'rb') as f:
+        assert f.read() == DATA
+    assert session['content_hash'] == hashlib.sha256(DATA).hexdigest()
+    # Repeating the last chunk of a completed upload is harmless
+    assert not write(uploads, session, 6000, DATA[6000:])
+
+def test_chunk_past_declared_size_is_refused(upload):
+    uploads, session = upload
+    with pytest.raises(UploadError) as refused:
+        write(uploads, session, 0, DATA + b'extra')
+    assert refused.value.status == 400 and refused.value.received <= len(DATA)
+
+def test_idle_uploads_expire(tmp_path):
+    uploads = UploadSessions(idle_timeout=60)
+    stale = uploads.create('stale', str(tmp_path / 'stale.avi'), 10)
+    uploads.create('fresh', str(tmp_path / 'fresh.avi'), 10)
+    stale['updated_at'] -= 120
+    assert uploads.expire() == [stale]
+    assert uploads.get('stale') is None and uploads.get('fresh') is not None
+
+@pytest.fixture(scope='module')
+def api(tmp_path_factory):
+    """The tracking API with its results store, cache and camera profiles in a temporary directory"""
+    root = tmp_path_factory.mktemp('api')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('TRACKING_RESULTS_DB', str(root / 'tracking_results.db'))
+        patch.setenv('TRACKING_CAMERA_PROFILES', str(root / 'camera_profiles'))
+        import tracking_api
+        from result_cache import ResultCache
+        patch.setattr(tracking_api, 'result_cache',
+                      ResultCache(str(root / 'outputs'), tracking_api.CACHE_MAX_BYTES,
+                                  on_evict=tracking_api.results_store.delete_frames))
+        try:
+            yield tracking_api
+        finally:
+            tracking_api.stop_workers()
+
+def wait_for_status(client, tracking_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f'/tracking-results/{tracking_id}').get_json().get('status')
+        if status in statuses:
+            return status
+        time.sleep(0.2)
+    pytest.fail(f'{tracking_id} did not reach {statuses}')
+
+def test_upload_resumed_after_early_job_gave_up(api, tmp_path, monkeypatch):
+    # The client pauses for longer than the early-started job waits for more data
+    path = str(tmp_path / 'clip.avi')
+    generate_scene(path, 320, 180, 90)
+    with open(path, 'rb') as f:
+        data = f.read()
+    half = len(data) // 2
+    monkeypatch.setattr(api, 'EARLY_START_BYTES', half // 2)
+    monkeypatch.setattr(api, 'UPLOAD_IDLE_TIMEOUT', 1)
+    client = api.app.test_client()
+
+    created = client.post('/uploads', data={'filename': 'clip.avi', 'size': str(len(data))}).get_json()
+    upload_id = created['upload_id']
+    first = client.put(f'/uploads/{upload_id}', data=data[:half]).get_json()
+    assert first['tracking_id'] == upload_id
+    assert wait_for_status(client, upload_id, ('failed', 'completed')) == 'failed'
+    # The received part of the upload is kept for the rest to be appended to
+    assert os.path.getsize(api.upload_sessions.get(upload_id)['path']) == half
+
+    rest = client.put(f'/uploads/{upload_id}', data=data[half:],
+                      headers={'Content-Range': f'bytes {half}-{len(data) - 1}/{len(data)}'})
+    assert rest.status_code in (200, 202)
+    rest = rest.get_json()
+    assert rest['complete']
+    assert wait_for_status(client, rest['tracking_id'], ('failed', 'completed')) == 'completed'
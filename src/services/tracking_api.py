@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import tempfile
@@ -6,8 +6,25 @@ import uuid
 import json
 import sys
 import time
+import threading
+import hashlib
+import shutil
+import queue
+from contextlib import closing
+from urllib.parse import urlsplit
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import cv2
 from werkzeug.utils import secure_filename
-from ballTracker import process_video_file
+from ballTracker import EnhancedPingPongTracker, TrackerParams, TRACKER_VERSION, warm_up as warm_up_tracker
+from tracking_jobs import TrackingJobQueue
+from tracking_format import load_tracking_npz, load_keyframes, array_to_records, overlay_state
+from result_cache import ResultCache, cache_key
+from upload_sessions import UploadSessions, UploadError
+from live_tracking import LiveSource, LiveTracker, LiveSession
+from camera_calibration import CameraProfile
+from results_store import ResultsStore
+from admission import AdmissionController, AdmissionError, estimate_job_cost, estimate_live_cost
+from seek_index import SeekerPool
 import logging
 
 # Configure logging
@@ -20,114 +37,956 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp_uploads')
 OUTPUT_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp_outputs')
+CAMERA_PROFILE_FOLDER = os.environ.get('TRACKING_CAMERA_PROFILES') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'camera_profiles')
+RESULTS_DB = os.environ.get('TRACKING_RESULTS_DB') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tracking_results.db')
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+TRACKING_WORKERS = int(os.environ.get('TRACKING_WORKERS', 0)) or None
+# Admission budgets: estimated peak memory of the jobs running at once, and how long a
+# new job may be expected to wait for a worker before requests are refused with 429
+MEMORY_BUDGET_BYTES = int(os.environ.get('TRACKING_MEMORY_BUDGET_MB', 2048)) * 1024 * 1024
+MAX_WAIT_SECONDS = float(os.environ.get('TRACKING_MAX_WAIT_SECONDS', 600))
+CACHE_MAX_BYTES = int(os.environ.get('TRACKING_CACHE_MAX_MB', 5120)) * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get('TRACKING_MAX_UPLOAD_MB', 2048)) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# A chunked upload starts tracking once this much has arrived, unless the client opts out
+EARLY_START_BYTES = 2 * 1024 * 1024
+UPLOAD_IDLE_TIMEOUT = 3600
+LIVE_MAX_SESSIONS = int(os.environ.get('TRACKING_LIVE_MAX_SESSIONS', 2))
+LIVE_STREAM_SCHEMES = {'rtsp', 'rtsps', 'rtmp', 'http', 'https'}
+# Stream servers a live session may connect to, as comma-separated scheme://host[:port]
+# origins; none by default, so clients cannot make the server open arbitrary URLs
+LIVE_ALLOWED_STREAMS = [urlsplit(origin.strip()) for origin in
+                        os.environ.get('TRACKING_LIVE_ALLOWED_STREAMS', '').split(',') if origin.strip()]
+LIVE_ALLOW_FILES = os.environ.get('TRACKING_LIVE_ALLOW_FILES', 'false').lower() == 'true'
+# Ended or failed live sessions stay readable this long, then are forgotten
+LIVE_FINISHED_TTL = 300
+LIVE_KEEPALIVE_SECONDS = 15
+# Most stored jobs listed by one GET /tracking-results
+RESULTS_LIST_MAX = 500
+# /ready reports unavailable once this many jobs per worker are waiting
+READY_MAX_QUEUED_PER_WORKER = int(os.environ.get('TRACKING_READY_MAX_QUEUED_PER_WORKER', 4))
+API_DEBUG = os.environ.get('TRACKING_API_DEBUG', 'false').lower() == 'true'
+# Review clips are short MJPEG videos: every frame is a key frame, so players scrub them freely
+CLIP_DEFAULT_FRAMES = 90
+CLIP_MAX_FRAMES = int(os.environ.get('TRACKING_CLIP_MAX_FRAMES', 300))
+JPEG_QUALITY = 85
+# A download waits this long for a render before answering 202 and letting the client poll
+RENDER_WAIT_SECONDS = 2
+RENDER_RETRY_SECONDS = 5
+TRACKED_VIDEO_FILENAME = 'tracked.avi'
+COLUMNAR_FILENAME = 'tracking.npz'
+SOURCE_STEM = 'source'
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 # Create directories if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+os.makedirs(CAMERA_PROFILE_FOLDER, exist_ok=True)
+
+# Finished jobs and their per-frame data outlive the worker pool and API restarts
+results_store = ResultsStore(RESULTS_DB)
+# Tracking outputs live in a content-addressed cache so repeated uploads are not reprocessed;
+# the per-frame rows of evicted entries are dropped from the store with them
+result_cache = ResultCache(OUTPUT_FOLDER, CACHE_MAX_BYTES, on_evict=results_store.delete_frames)
+admission = AdmissionController(TRACKING_WORKERS or os.cpu_count() or 1, MEMORY_BUDGET_BYTES,
+                                MAX_WAIT_SECONDS)
+# Open decoders for reading single frames and clips back from recently reviewed videos
+seeker_pool = SeekerPool()
+upload_sessions = UploadSessions(idle_timeout=UPLOAD_IDLE_TIMEOUT)
+live_sessions = {}
+live_sessions_lock = threading.Lock()
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+start_tracking_lock = threading.Lock()
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def get_job_queue():
+    """Create the tracking worker pool on first use, warming up its workers in the background"""
+    # Created lazily so spawned worker processes importing this module don't start pools of their own
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = TrackingJobQueue(max_workers=admission.workers, cache=result_cache,
+                                          store=results_store, admission=admission)
+            # Under servers without the gunicorn hook (flask run, other WSGI servers) this is
+            # what eventually makes /ready succeed
+            _job_queue.start_warm_up()
+            logger.info(f"Started tracking worker pool with {_job_queue.max_workers} workers")
+        return _job_queue
+
+def warm_up():
+    """Initialize the tracker in this process (streaming and live tracking run here) and in every pool worker"""
+    warm_up_tracker()
+    get_job_queue().warm_up()
+
+def release_admission(job_id):
+    """Release streaming or live work admitted as running, letting queued jobs take its place"""
+    with _job_queue_lock:
+        job_queue = _job_queue
+    if job_queue is not None:
+        job_queue.release(job_id)
+    else:
+        admission.release(job_id)
+
+def stop_workers():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is not None:
+            _job_queue.shutdown()
+            _job_queue = None
+
+def prepare_storage():
+    """Remove uploads and unfinished cache entries left on disk by jobs from a previous run"""
+    for filename in os.listdir(UPLOAD_FOLDER):
+        file_path = os.path.join(UPLOAD_FOLDER, filename)
+        try:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                logger.info(f"Cleaned up old upload: {file_path}")
+        except Exception as e:
+            logger.warning(f"Could not clean up file {file_path}: {str(e)}")
+    result_cache.remove_incomplete()
+    result_cache.evict()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    response_data = {
         'status': 'healthy',
         'message': 'Ball tracking API is running',
         'version': '1.0.0'
-    })
+    }
+    # Reported without starting the pool, so a liveness probe stays cheap
+    if _job_queue is not None:
+        response_data['workers'] = _job_queue.capacity()
+    return jsonify(response_data)
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 200 once the tracking workers are warmed up and the backlog is bounded, else 503"""
+    # Starts the pool if nothing has yet, so readiness does not depend on the entry point
+    job_queue = get_job_queue()
+    if not job_queue.warmed:
+        return jsonify({
+            'ready': False,
+            'reason': 'Tracking workers are starting'
+        }), 503
+    
+    capacity = job_queue.capacity()
+    max_queued = READY_MAX_QUEUED_PER_WORKER * capacity['workers']
+    accepting = admission.load()['accepting']
+    ready = capacity['queued'] < max_queued and accepting
+    response_data = dict(capacity, ready=ready, max_queued=max_queued)
+    if not ready:
+        response_data['reason'] = 'Tracking queue is full' if accepting else 'Tracking backlog exceeds the wait budget'
+    return jsonify(response_data), 200 if ready else 503
+
+@app.route('/load', methods=['GET'])
+def load_report():
+    """Current use of the admission budgets: running and waiting jobs, memory, expected wait"""
+    response_data = dict(admission.load(), success=True)
+    if _job_queue is not None:
+        response_data['jobs'] = _job_queue.stats()
+    return jsonify(response_data)
+
+def validate_video_upload():
+    """Return an error response if the request carries no usable video file, else None"""
+    # Check if video file is present
+    if 'video' not in request.files:
+        return jsonify({
+            'success': False,
+            'error': 'No video file provided'
+        }), 400
+    
+    file = request.files['video']
+    if file.filename == '':
+        return jsonify({
+            'success': False,
+            'error': 'No video file selected'
+        }), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({
+            'success': False,
+            'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400
+    
+    return None
+
+def parse_tracking_params():
+    """Build TrackerParams from the request's speed/accuracy options.
+
+    Returns (params, None), or (None, error_response) if an option is invalid.
+    """
+    try:
+        scale = float(request.values.get('scale', 1.0))
+        stride = int(request.values.get('stride', 1))
+    except ValueError:
+        scale, stride = None, None
+    if scale is None or not 0.1 <= scale <= 1.0 or stride is None or not 1 <= stride <= 10:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Invalid tracking options: scale must be between 0.1 and 1.0, stride between 1 and 10'
+        }), 400)
+    # Pixels per frame squared; omitted, the tracker derives it from the video's frame rate and height
+    gravity = request.values.get('gravity') or None
+    if gravity is not None:
+        try:
+            gravity = float(gravity)
+        except ValueError:
+            gravity = None
+        if gravity is None or not 0.0 <= gravity <= 100.0:
+            return None, (jsonify({
+                'success': False,
+                'error': 'Invalid tracking options: gravity must be between 0 and 100 pixels per frame squared'
+            }), 400)
+    roi = request.values.get('roi', 'false').lower() == 'true'
+    skip_idle = request.values.get('skip_idle', 'false').lower() == 'true'
+    calibrate = request.values.get('calibrate', 'false').lower() == 'true'
+    camera_profile = None
+    camera = request.values.get('camera')
+    if camera:
+        camera_profile = camera_profile_path(camera)
+        if not os.path.isfile(camera_profile):
+            return None, (jsonify({
+                'success': False,
+                'error': f'Unknown camera profile: {camera}'
+            }), 400)
+    return TrackerParams(roi_tracking=roi, detect_scale=scale, detect_stride=stride, kalman_gravity=gravity,
+                         skip_idle=skip_idle, calibrate=calibrate, camera_profile=camera_profile), None
+
+def camera_profile_path(name):
+    return os.path.join(CAMERA_PROFILE_FOLDER, f"{secure_filename(name)}.npz")
+
+def save_video_upload():
+    """Save the uploaded video under a fresh tracking ID, hashing its contents on the way"""
+    file = request.files['video']
+    unique_id = str(uuid.uuid4())
+    original_filename = secure_filename(file.filename)
+    input_filename = f"{unique_id}_{original_filename}"
+    input_path = os.path.join(UPLOAD_FOLDER, input_filename)
+    
+    hasher = hashlib.sha256()
+    with open(input_path, 'wb') as f:
+        for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            f.write(chunk)
+    logger.info(f"Saved uploaded file to: {input_path}")
+    return unique_id, input_path, hasher.hexdigest()
+
+def refused_response_data(error, **extra):
+    """Response data for a job the admission controller refused"""
+    response_data = dict(extra, success=False, error=str(error))
+    if error.retry_after:
+        response_data['retry_after'] = error.retry_after
+    return response_data
+
+def tracking_response(response_data, status):
+    """JSON response, with a Retry-After header if the job was refused for now"""
+    response = jsonify(response_data)
+    if response_data.get('retry_after'):
+        response.headers['Retry-After'] = str(response_data['retry_after'])
+    return response, status
+
+def start_tracking(unique_id, input_path, content_hash, params, render=False, profile=False):
+    """Answer a fully received upload from the cache, an identical running job, or a new job.
+    
+    The input file is moved into the cache or removed, unless admission control refuses
+    the job; it is then left in place. Returns (response_data, status).
+    """
+    input_filename = os.path.basename(input_path)
+    key = cache_key(content_hash, TRACKER_VERSION, params)
+    output_path = result_cache.path(key, TRACKED_VIDEO_FILENAME)
+    columnar_path = result_cache.path(key, COLUMNAR_FILENAME)
+    job_queue = get_job_queue()
+    # Probing the container is slow enough that other uploads should not wait behind it
+    cost = estimate_job_cost(input_path, params)
+    
+    # Finding an existing result or job and registering a new one happen under one lock,
+    # so identical uploads arriving together share a job instead of both writing the entry
+    with start_tracking_lock:
+        # Same content already tracked: answer from the cache without reprocessing
+        summary = result_cache.lookup(key)
+        if summary is not None:
+            os.remove(input_path)
+            job_queue.add_completed(unique_id, summary, output_path, columnar_path, key,
+                                    source_path=result_cache.find(key, SOURCE_STEM), content_hash=content_hash)
+            logger.info(f"Served ball tracking for {input_filename} from cache")
+            return {
+                'success': True,
+                'tracking_id': unique_id,
+                'status': 'completed',
+                'cached': True,
+                'status_url': f'/tracking-results/{unique_id}'
+            }, 200
+    
+        # Same content currently being tracked: point the client at that job
+        active_id = job_queue.find_active(key)
+        if active_id is not None:
+            os.remove(input_path)
+            return {
+                'success': True,
+                'tracking_id': active_id,
+                'status': 'queued',
+                'status_url': f'/tracking-results/{active_id}'
+            }, 202
+    
+        # Queue video for processing. The source is kept in the cache entry so the annotated
+        # video can be rendered on first download instead of encoding it for every upload.
+        result_cache.reserve(key)
+        source_path = result_cache.path(key, SOURCE_STEM + os.path.splitext(input_path)[1])
+        os.replace(input_path, source_path)
+        try:
+            # New work: admitted only if its estimated cost fits the budgets
+            job_queue.submit(unique_id, source_path, output_path, columnar_path, key, render=render,
+                             params=params, profile=profile, content_hash=content_hash, cost=cost)
+        except AdmissionError as e:
+            os.replace(source_path, input_path)
+            result_cache.discard(key)
+            logger.info(f"Refused ball tracking for {input_filename}: {str(e)}")
+            return refused_response_data(e, estimate=cost.describe()), e.status
+        logger.info(f"Queued ball tracking for: {input_filename}")
+    
+    return {
+        'success': True,
+        'tracking_id': unique_id,
+        'status': 'queued',
+        'status_url': f'/tracking-results/{unique_id}'
+    }, 202
 
 @app.route('/track-video', methods=['POST'])
 def track_video():
     """Process video file for ball tracking"""
     try:
-        # Check if video file is present
-        if 'video' not in request.files:
+        error_response = validate_video_upload()
+        if error_response:
+            return error_response
+        params, error_response = parse_tracking_params()
+        if error_response:
+            return error_response
+        
+        unique_id, input_path, content_hash = save_video_upload()
+        render = request.form.get('render', 'false').lower() == 'true'
+        profile = request.form.get('profile', 'false').lower() == 'true'
+        response_data, status = start_tracking(unique_id, input_path, content_hash, params,
+                                               render, profile)
+        if not response_data['success']:
+            os.remove(input_path)
+        return tracking_response(response_data, status)
+        
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+def wants_event_stream():
+    """True if the client asked for Server-Sent Events rather than NDJSON"""
+    return (request.args.get('format') == 'sse' or
+            'text/event-stream' in request.headers.get('Accept', ''))
+
+def encode_stream_message(payload, event, use_sse):
+    """One message of a streamed response, as an SSE event or an NDJSON line"""
+    data = json.dumps(payload)
+    if use_sse:
+        return f"event: {event}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.route('/track-video/stream', methods=['POST'])
+def track_video_stream():
+    """Track a video in this request and stream per-frame records as they are computed"""
+    try:
+        error_response = validate_video_upload()
+        if error_response:
+            return error_response
+        params, error_response = parse_tracking_params()
+        if error_response:
+            return error_response
+        
+        unique_id, input_path, _ = save_video_upload()
+        # Tracked in this request rather than on the worker pool, but counted as a running job
+        # so pool jobs make room for it, and refused likewise when busy
+        cost = estimate_job_cost(input_path, params)
+        try:
+            admission.admit(unique_id, cost, running=True)
+        except AdmissionError as e:
+            os.remove(input_path)
+            return tracking_response(refused_response_data(e, estimate=cost.describe()), e.status)
+        profile = request.values.get('profile', 'false').lower() == 'true'
+        use_sse = wants_event_stream()
+        
+        def encode(payload, event='frame'):
+            return encode_stream_message(payload, event, use_sse)
+        
+        def generate():
+            tracker = EnhancedPingPongTracker(input_path, params=params)
+            try:
+                yield encode({'tracking_id': unique_id}, 'start')
+                for record in tracker.process_video(stream=True, profile=profile):
+                    yield encode(record)
+                if tracker.summary is None:
+                    yield encode({'success': False, 'error': 'Failed to process video'}, 'error')
+                else:
+                    yield encode(tracker.summary, 'summary')
+            except Exception as e:
+                # Tell the client the stream ended because tracking failed, not because the connection dropped
+                logger.error(f"Error streaming video tracking for {unique_id}: {str(e)}")
+                yield encode({'success': False, 'error': f'Internal server error: {str(e)}'}, 'error')
+            finally:
+                if os.path.exists(input_path):
+                    os.remove(input_path)
+                logger.info(f"Finished streaming ball tracking for: {unique_id}")
+        
+        mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+        response = Response(generate(), mimetype=mimetype, headers={'X-Accel-Buffering': 'no'})
+        # Called however the response ends, even if the client leaves before the first frame
+        response.call_on_close(lambda: release_admission(unique_id))
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error streaming video tracking: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+def allowed_stream(url):
+    """True if url is on a stream server listed in LIVE_ALLOWED_STREAMS"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return False
+    if parts.scheme.lower() not in LIVE_STREAM_SCHEMES or not parts.hostname:
+        return False
+    return any(parts.scheme.lower() == origin.scheme.lower() and parts.hostname == origin.hostname
+               and origin.port in (None, port) for origin in LIVE_ALLOWED_STREAMS)
+
+def parse_live_source(source):
+    """Camera index or stream URL for a live session, or None if it is not allowed"""
+    source = source.strip()
+    if source.isdigit():
+        return source
+    if '://' in source:
+        return source if allowed_stream(source) else None
+    # Replaying a server-side file stands in for a camera in testing; off by default
+    if LIVE_ALLOW_FILES and allowed_file(source) and os.path.isfile(source):
+        return source
+    return None
+
+def get_live_session(session_id):
+    with live_sessions_lock:
+        return live_sessions.get(session_id)
+
+def reap_live_sessions():
+    """Forget sessions that ended more than LIVE_FINISHED_TTL ago. Must hold live_sessions_lock"""
+    cutoff = time.time() - LIVE_FINISHED_TTL
+    for session_id, session in list(live_sessions.items()):
+        if session.ended_at is not None and session.ended_at < cutoff:
+            del live_sessions[session_id]
+
+@app.route('/live', methods=['POST'])
+def start_live_session():
+    """Start tracking a camera or stream in real time"""
+    try:
+        source = parse_live_source(request.values.get('source', ''))
+        if source is None:
             return jsonify({
                 'success': False,
-                'error': 'No video file provided'
+                'error': 'Invalid live source: expected a camera index or a URL on an allowed stream server'
             }), 400
-        
-        file = request.files['video']
-        if file.filename == '':
+        try:
+            budget_ms = float(request.values['budget_ms']) if 'budget_ms' in request.values else None
+        except ValueError:
+            budget_ms = 0
+        if budget_ms is not None and not 1 <= budget_ms <= 1000:
             return jsonify({
                 'success': False,
-                'error': 'No video file selected'
+                'error': 'Invalid budget_ms: must be between 1 and 1000'
             }), 400
+        params, error_response = parse_tracking_params()
+        if error_response:
+            return error_response
         
-        if not allowed_file(file.filename):
+        live_source = LiveSource(source)
+        if not live_source.isOpened():
             return jsonify({
                 'success': False,
-                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+                'error': 'Could not open live source'
             }), 400
         
-        # Generate unique filenames
-        unique_id = str(uuid.uuid4())
-        original_filename = secure_filename(file.filename)
-        input_filename = f"{unique_id}_{original_filename}"
-        output_filename = f"{unique_id}_tracked.avi"
-        
-        input_path = os.path.join(UPLOAD_FOLDER, input_filename)
-        output_path = os.path.join(OUTPUT_FOLDER, output_filename)
-        
-        # Save uploaded file
-        file.save(input_path)
-        logger.info(f"Saved uploaded file to: {input_path}")
+        session_id = str(uuid.uuid4())
+        # Counted and registered under one lock so concurrent requests cannot exceed the limit.
+        # A session holds admission as a running job until it ends, however it ends.
+        cost = estimate_live_cost(live_source.width, live_source.height, live_source.fps, params)
+        refused = None
+        with live_sessions_lock:
+            reap_live_sessions()
+            running = sum(session.status == 'running' for session in live_sessions.values())
+            if running < LIVE_MAX_SESSIONS:
+                try:
+                    admission.admit(session_id, cost, running=True)
+                except AdmissionError as e:
+                    refused = e
+                else:
+                    try:
+                        session = LiveSession(session_id, LiveTracker(live_source, params, budget_ms),
+                                              on_end=lambda: release_admission(session_id))
+                    except Exception:
+                        # No session will end and release the slot it was admitted with
+                        release_admission(session_id)
+                        live_source.stop()
+                        raise
+                    live_sessions[session_id] = session
+        if running >= LIVE_MAX_SESSIONS:
+            live_source.stop()
+            return jsonify({
+                'success': False,
+                'error': f'Too many live sessions running (limit {LIVE_MAX_SESSIONS})'
+            }), 429
+        if refused is not None:
+            live_source.stop()
+            return tracking_response(refused_response_data(refused, estimate=cost.describe()), refused.status)
+        logger.info(f"Started live session {session_id} for {source}")
         
-        # Process video
-        logger.info(f"Starting ball tracking for: {input_filename}")
-        success, results = process_video_file(input_path, output_path)
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'status_url': f'/live/{session_id}',
+            'events_url': f'/live/{session_id}/events',
+            'source_fps': live_source.fps,
+            'budget_ms': session.live.budget_ms
+        }), 201
         
-        if not success:
-            # Clean up input file
-            if os.path.exists(input_path):
-                os.remove(input_path)
+    except Exception as e:
+        logger.error(f"Error starting live session: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+@app.route('/camera-profiles/<name>', methods=['POST'])
+def create_camera_profile(name):
+    """Learn a camera's static distractors and play area from a sample video and save them under name"""
+    try:
+        if not secure_filename(name):
             return jsonify({
                 'success': False,
-                'error': 'Failed to process video'
-            }), 500
+                'error': 'Invalid camera profile name'
+            }), 400
+        error_response = validate_video_upload()
+        if error_response:
+            return error_response
+        try:
+            seconds = float(request.values.get('seconds', TrackerParams.calibration_seconds))
+        except ValueError:
+            seconds = 0
+        if not 0 < seconds <= 60:
+            return jsonify({
+                'success': False,
+                'error': 'seconds must be between 0 and 60'
+            }), 400
         
-        # Clean up input file
-        if os.path.exists(input_path):
+        unique_id, input_path, _ = save_video_upload()
+        try:
+            # Decoding up to a minute of video is CPU work for the pool, not a request thread
+            description = get_job_queue().calibrate(input_path, camera_profile_path(name), seconds).result()
+        except AdmissionError as e:
+            return tracking_response(refused_response_data(e), e.status)
+        finally:
             os.remove(input_path)
+        if description is None:
+            return jsonify({
+                'success': False,
+                'error': 'Could not read any frames from the video'
+            }), 400
         
-        # Prepare response
-        response_data = {
+        logger.info(f"Saved camera profile {secure_filename(name)}")
+        return jsonify(dict(description, success=True, name=secure_filename(name))), 201
+        
+    except Exception as e:
+        logger.error(f"Error creating camera profile: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+@app.route('/camera-profiles', methods=['GET'])
+def list_camera_profiles():
+    """Saved camera profiles, usable as the camera field of tracking requests"""
+    profiles = []
+    for filename in sorted(os.listdir(CAMERA_PROFILE_FOLDER)):
+        if filename.endswith('.npz'):
+            profile = CameraProfile.load(os.path.join(CAMERA_PROFILE_FOLDER, filename))
+            profiles.append(dict(profile.describe(), name=filename[:-len('.npz')]))
+    return jsonify({
+        'success': True,
+        'profiles': profiles
+    })
+
+@app.route('/live', methods=['GET'])
+def list_live_sessions():
+    """Statistics for every live session"""
+    with live_sessions_lock:
+        reap_live_sessions()
+        sessions = list(live_sessions.values())
+    return jsonify({
+        'success': True,
+        'sessions': [session.stats() for session in sessions]
+    })
+
+@app.route('/live/<session_id>', methods=['GET'])
+def get_live_session_status(session_id):
+    """Throughput, dropped frames, workload level, latency and the latest position of a live session"""
+    session = get_live_session(session_id)
+    if session is None:
+        return jsonify({
+            'success': False,
+            'error': 'Live session not found'
+        }), 404
+    return jsonify(dict(session.stats(), success=True))
+
+@app.route('/live/<session_id>/events', methods=['GET'])
+def stream_live_session(session_id):
+    """Stream a live session's positions as NDJSON, or Server-Sent Events with ?format=sse"""
+    session = get_live_session(session_id)
+    if session is None:
+        return jsonify({
+            'success': False,
+            'error': 'Live session not found'
+        }), 404
+    use_sse = wants_event_stream()
+    
+    def generate():
+        subscriber = session.subscribe()
+        try:
+            yield encode_stream_message({'session_id': session_id}, 'start', use_sse)
+            if subscriber is None:
+                yield encode_stream_message(session.stats(), 'end', use_sse)
+                return
+            while True:
+                try:
+                    event, payload = subscriber.get(timeout=LIVE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Keeps proxies from closing an idle connection while the ball is out of play
+                    yield ": keep-alive\n\n" if use_sse else "\n"
+                    continue
+                yield encode_stream_message(payload, event, use_sse)
+                if event == 'end':
+                    break
+        finally:
+            if subscriber is not None:
+                session.unsubscribe(subscriber)
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype, headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/live/<session_id>', methods=['DELETE'])
+def stop_live_session(session_id):
+    """Stop a live session and forget it"""
+    try:
+        with live_sessions_lock:
+            session = live_sessions.pop(session_id, None)
+        if session is None:
+            return jsonify({
+                'success': False,
+                'error': 'Live session not found'
+            }), 404
+        session.stop()
+        logger.info(f"Stopped live session {session_id}")
+        
+        return jsonify({
             'success': True,
-            'tracking_id': unique_id,
-            'results': results
-        }
+            'message': 'Live session stopped'
+        })
+        
+    except Exception as e:
+        logger.error(f"Error stopping live session: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+def parse_content_range(header, total_size):
+    """Start offset from a 'bytes <start>-<end>/<total>' Content-Range header, or None if it is invalid"""
+    try:
+        unit, _, byte_range = header.partition(' ')
+        span, _, total = byte_range.partition('/')
+        start, _, end = span.partition('-')
+        start, end, total = int(start), int(end), int(total)
+    except ValueError:
+        return None
+    if unit != 'bytes' or total != total_size or not 0 <= start <= end < total:
+        return None
+    return start
+
+def upload_status(upload):
+    """Response data describing how far a chunked upload has got"""
+    response_data = {
+        'success': True,
+        'upload_id': upload['upload_id'],
+        'upload_url': f"/uploads/{upload['upload_id']}",
+        'received': upload['received'],
+        'total_size': upload['total_size'],
+        'complete': upload['received'] == upload['total_size']
+    }
+    if upload['tracking_id']:
+        response_data['tracking_id'] = upload['tracking_id']
+        response_data['status_url'] = f"/tracking-results/{upload['tracking_id']}"
+    return response_data
+
+def discard_upload(upload):
+    """Remove an unfinished or untracked upload's staged files; a job reading them fails and cleans up after itself"""
+    if upload['content_hash'] is None or upload['tracking_id'] is None:
+        shutil.rmtree(upload['staging_dir'], ignore_errors=True)
+        logger.info(f"Discarded unfinished upload: {upload['upload_id']}")
+
+def start_early_tracking(upload):
+    """Start tracking an upload that is still arriving; its outputs are staged until the cache key is known"""
+    cost = estimate_job_cost(upload['path'], upload['params'], expected_size=upload['total_size'])
+    staging_dir = upload['staging_dir']
+    try:
+        get_job_queue().submit(upload['upload_id'], upload['path'],
+                               os.path.join(staging_dir, TRACKED_VIDEO_FILENAME),
+                               os.path.join(staging_dir, COLUMNAR_FILENAME),
+                               render=upload['render'], params=upload['params'], profile=upload['profile'],
+                               expected_size=upload['total_size'], staging_dir=staging_dir, cost=cost,
+                               idle_timeout=UPLOAD_IDLE_TIMEOUT)
+    except AdmissionError as e:
+        # Decided again once the upload is complete
+        upload['early_start'] = False
+        logger.info(f"Not starting ball tracking early for upload {upload['upload_id']}: {str(e)}")
+        return
+    upload['tracking_id'] = upload['upload_id']
+    logger.info(f"Started ball tracking for upload {upload['upload_id']} at "
+                f"{upload['received']} of {upload['total_size']} bytes")
+
+def forget_failed_early_job(upload):
+    """Drop an early-started job that failed while its upload was arriving, e.g. because the
+    client paused for longer than the job waited, so the completed upload is tracked afresh"""
+    if upload['tracking_id'] is None:
+        return
+    job_queue = get_job_queue()
+    job = job_queue.get(upload['tracking_id'])
+    if job is not None and job['status'] != 'failed':
+        return
+    logger.info(f"Early ball tracking for upload {upload['upload_id']} failed; tracking it once complete")
+    job_queue.remove(upload['tracking_id'])
+    upload['tracking_id'] = None
+
+def finish_upload(upload):
+    """Hand a completed upload to its early-started job, or track it like a regular upload"""
+    job_queue = get_job_queue()
+    if upload['tracking_id']:
+        key = cache_key(upload['content_hash'], TRACKER_VERSION, upload['params'])
+        job_queue.set_cache_key(upload['tracking_id'], key, upload['content_hash'])
+        response_data = upload_status(upload)
+        response_data['status'] = job_queue.get(upload['tracking_id'])['status']
+        return jsonify(response_data), 202
+    
+    tracking_data, status = start_tracking(upload['upload_id'], upload['path'], upload['content_hash'],
+                                           upload['params'], upload['render'], upload['profile'])
+    if not tracking_data['success']:
+        if status == 429:
+            # The completed upload is kept; any later PUT to it retries tracking
+            return tracking_response(dict(upload_status(upload), **tracking_data), status)
+        upload_sessions.remove(upload['upload_id'])
+        discard_upload(upload)
+        return tracking_response(tracking_data, status)
+    shutil.rmtree(upload['staging_dir'], ignore_errors=True)
+    upload['tracking_id'] = tracking_data['tracking_id']
+    return jsonify(dict(upload_status(upload), **tracking_data)), status
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload of a video of the given size"""
+    try:
+        filename = request.values.get('filename', '')
+        if not allowed_file(filename):
+            return jsonify({
+                'success': False,
+                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+            }), 400
+        try:
+            total_size = int(request.values.get('size', ''))
+        except ValueError:
+            total_size = 0
+        if total_size <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'Upload size must be a positive number of bytes'
+            }), 400
+        if total_size > MAX_UPLOAD_BYTES:
+            return jsonify({
+                'success': False,
+                'error': f'File too large. The limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.'
+            }), 413
+        params, error_response = parse_tracking_params()
+        if error_response:
+            return error_response
+        # Refuse before the client sends the whole video if it would only be refused at the end
+        try:
+            admission.check()
+        except AdmissionError as e:
+            return tracking_response(refused_response_data(e), e.status)
         
-        # If output video was created, include download URL
-        if os.path.exists(output_path):
-            response_data['output_video_url'] = f'/download-tracked-video/{unique_id}'
+        for upload in upload_sessions.expire():
+            discard_upload(upload)
         
-        logger.info(f"Ball tracking completed successfully for: {unique_id}")
-        return jsonify(response_data)
+        upload_id = str(uuid.uuid4())
+        staging_dir = result_cache.staging_dir(upload_id)
+        extension = filename.rsplit('.', 1)[1].lower()
+        upload = upload_sessions.create(
+            upload_id, os.path.join(staging_dir, f"{SOURCE_STEM}.{extension}"), total_size,
+            staging_dir=staging_dir, params=params,
+            render=request.values.get('render', 'false').lower() == 'true',
+            profile=request.values.get('profile', 'false').lower() == 'true',
+            early_start=request.values.get('early_start', 'true').lower() == 'true')
+        logger.info(f"Created chunked upload {upload_id} for {secure_filename(filename)} ({total_size} bytes)")
+        return jsonify(upload_status(upload)), 201
         
     except Exception as e:
-        logger.error(f"Error processing video: {str(e)}")
+        logger.error(f"Error creating upload: {str(e)}")
         return jsonify({
             'success': False,
             'error': f'Internal server error: {str(e)}'
         }), 500
 
-@app.route('/download-tracked-video/<tracking_id>', methods=['GET'])
-def download_tracked_video(tracking_id):
-    """Download the tracked video"""
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Receive one byte range of a chunked upload; tracking can start before the last one arrives"""
     try:
-        output_filename = f"{tracking_id}_tracked.avi"
-        output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+        with upload_sessions.session(upload_id) as upload:
+            if upload is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Upload not found'
+                }), 404
+            
+            # Without Content-Range the body continues from the bytes received so far
+            content_range = request.headers.get('Content-Range')
+            start = upload['received']
+            if content_range:
+                start = parse_content_range(content_range, upload['total_size'])
+                if start is None:
+                    return jsonify({
+                        'success': False,
+                        'error': 'Invalid Content-Range; expected bytes <start>-<end>/<total size>',
+                        'received': upload['received']
+                    }), 400
+            
+            try:
+                completed = upload_sessions.write(upload, start, request.stream, UPLOAD_CHUNK_SIZE)
+            except UploadError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e),
+                    'received': e.received
+                }), e.status
+            
+            if completed or upload['content_hash'] is None:
+                forget_failed_early_job(upload)
+            # A completed upload refused for lack of capacity is retried by any further PUT
+            if completed or (upload['content_hash'] and upload['tracking_id'] is None):
+                return finish_upload(upload)
+            if (upload['early_start'] and upload['tracking_id'] is None
+                    and upload['received'] >= EARLY_START_BYTES):
+                start_early_tracking(upload)
+            return jsonify(upload_status(upload))
         
+    except Exception as e:
+        logger.error(f"Error receiving upload chunk: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Upload error: {str(e)}'
+        }), 500
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Report how many bytes of a chunked upload have arrived, so an interrupted client can resume"""
+    upload = upload_sessions.get(upload_id)
+    if upload is None:
+        return jsonify({
+            'success': False,
+            'error': 'Upload not found'
+        }), 404
+    return jsonify(upload_status(upload))
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abandon a chunked upload, stopping any tracking job already reading it"""
+    try:
+        with upload_sessions.session(upload_id) as upload:
+            if upload is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Upload not found'
+                }), 404
+            upload_sessions.remove(upload_id)
+            discard_upload(upload)
         
-        if not os.path.exists(output_path):
+        return jsonify({
+            'success': True,
+            'message': 'Upload cancelled'
+        })
+        
+    except Exception as e:
+        logger.error(f"Error cancelling upload: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Cleanup error: {str(e)}'
+        }), 500
+
+@app.route('/download-tracked-video/<tracking_id>', methods=['GET'])
+def download_tracked_video(tracking_id):
+    """Download the tracked video, rendering it from the stored tracking data on first request.
+    
+    A render that takes longer than RENDER_WAIT_SECONDS is answered with 202 and a
+    Retry-After; requesting the same URL again returns the video once it is ready.
+    """
+    try:
+        job_queue = get_job_queue()
+        job = job_queue.get(tracking_id)
+        if job is None or job['status'] != 'completed':
             return jsonify({
                 'success': False,
                 'error': 'Tracked video not found'
             }), 404
         
+        output_path = job['output_path']
+        if not os.path.exists(output_path):
+            if not job['source_path'] or not os.path.exists(job['source_path']):
+                return jsonify({
+                    'success': False,
+                    'error': 'Tracked video not found'
+                }), 404
+            try:
+                rendered = job_queue.render(tracking_id).result(timeout=RENDER_WAIT_SECONDS)
+            except AdmissionError as e:
+                return tracking_response(refused_response_data(e), e.status)
+            except FutureTimeoutError:
+                response = jsonify({
+                    'success': True,
+                    'status': 'rendering',
+                    'download_url': f'/download-tracked-video/{tracking_id}'
+                })
+                response.headers['Retry-After'] = str(RENDER_RETRY_SECONDS)
+                return response, 202
+            if not rendered:
+                return jsonify({
+                    'success': False,
+                    'error': 'Failed to render tracked video'
+                }), 500
+            result_cache.evict(keep=job['cache_key'])
+        
         return send_file(output_path, as_attachment=True, download_name=f"tracked_{tracking_id}.avi")
         
     except Exception as e:
@@ -137,20 +996,345 @@ def download_tracked_video(tracking_id):
             'error': f'Download error: {str(e)}'
         }), 500
 
+def query_arg(name, convert, default=None):
+    """Query argument name passed through convert, or default if it is missing; raises ValueError.
+
+    Unlike request.args.get(name, type=...), which silently returns the default for a value
+    it cannot convert, a malformed argument is an error.
+    """
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    return convert(value)
+
+def parse_frame_range():
+    """The optional 1-based, inclusive start/end frame query arguments; raises ValueError"""
+    error = 'start and end must be frame numbers from 1 with start <= end'
+    try:
+        start = query_arg('start', int)
+        end = query_arg('end', int)
+    except ValueError:
+        raise ValueError(error) from None
+    if (start is not None and start < 1) or (end is not None and end < (start or 1)):
+        raise ValueError(error)
+    return start, end
+
+def load_tracking_frames(job, start=None, end=None):
+    """Per-frame records of a completed job between start and end, from the results store if it
+    has them; None once the result cache has evicted them"""
+    frames = results_store.frames(job['cache_key'], start, end) if job['cache_key'] else None
+    if frames is None:
+        # Not persisted yet, e.g. an early-started job whose upload has not been finalized
+        if not os.path.exists(job['columnar_path']):
+            return None
+        _, frames = load_tracking_npz(job['columnar_path'])
+        if start is not None or end is not None:
+            frame = frames['frame']
+            frames = frames[(frame >= (start or 1)) & (frame <= (end or frame.max(initial=0)))]
+    return array_to_records(frames, job['results']['video_info']['fps'])
+
+def frames_evicted_response():
+    return jsonify({
+        'success': False,
+        'error': 'Per-frame tracking data is no longer available; submit the video again to recompute it'
+    }), 404
+
+@app.route('/tracking-results', methods=['GET'])
+def list_tracking_results():
+    """List stored tracking jobs, newest first, by upload content hash and/or creation time"""
+    try:
+        try:
+            since = query_arg('since', float)
+            until = query_arg('until', float)
+            limit = min(max(1, query_arg('limit', int, 50)), RESULTS_LIST_MAX)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'since and until must be Unix timestamps and limit a number'
+            }), 400
+        
+        jobs = results_store.find(request.args.get('content_hash'), since, until, limit)
+        for job in jobs:
+            job['status_url'] = f"/tracking-results/{job['tracking_id']}"
+        return jsonify({
+            'success': True,
+            'results': jobs
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing results: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Error retrieving results: {str(e)}'
+        }), 500
+
 @app.route('/tracking-results/<tracking_id>', methods=['GET'])
 def get_tracking_results(tracking_id):
-    """Get tracking results for a specific tracking ID"""
+    """Get tracking results for a specific tracking ID.
+    
+    include_frames=false leaves out the per-frame records, which long videos are better
+    off paging through /tracking-results/<tracking_id>/frames.
+    """
     try:
-        # This would typically be stored in a database
-        # For now, we'll return a placeholder
+        job = get_job_queue().get(tracking_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Tracking job not found'
+            }), 404
+        
+        response_data = {
+            'success': True,
+            'tracking_id': tracking_id,
+            'status': job['status'],
+            'progress': job['progress']
+        }
+        
+        if job['status'] == 'completed':
+            # Per-frame records are stored columnar and expanded to dicts only when requested here
+            results = dict(job['results'])
+            if request.args.get('include_frames', 'true').lower() != 'false':
+                tracking_data = load_tracking_frames(job)
+                if tracking_data is None:
+                    return frames_evicted_response()
+                results['tracking_data'] = tracking_data
+            response_data['results'] = results
+            response_data['frames_url'] = f'/tracking-results/{tracking_id}/frames'
+            response_data['columnar_url'] = f'/tracking-results/{tracking_id}/columnar'
+            if os.path.exists(job['output_path']) or job['source_path']:
+                response_data['output_video_url'] = f'/download-tracked-video/{tracking_id}'
+        elif job['status'] == 'failed':
+            response_data['error'] = job['error']
+        
+        return jsonify(response_data)
+        
+    except Exception as e:
+        logger.error(f"Error getting results: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Error retrieving results: {str(e)}'
+        }), 500
+
+@app.route('/tracking-results/<tracking_id>/frames', methods=['GET'])
+def get_tracking_frames(tracking_id):
+    """Per-frame records of a completed job for the frame range start..end (both inclusive, optional)"""
+    try:
+        try:
+            start, end = parse_frame_range()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        job = get_job_queue().get(tracking_id)
+        if job is None or job['status'] != 'completed':
+            return jsonify({
+                'success': False,
+                'error': 'Tracking results not found'
+            }), 404
+        tracking_data = load_tracking_frames(job, start, end)
+        if tracking_data is None:
+            return frames_evicted_response()
+        
         return jsonify({
             'success': True,
             'tracking_id': tracking_id,
-            'message': 'Results endpoint - implement database storage for persistence'
+            'start': start or 1,
+            'end': end or job['results']['total_frames'],
+            'total_frames': job['results']['total_frames'],
+            'tracking_data': tracking_data
         })
         
     except Exception as e:
-        logger.error(f"Error getting results: {str(e)}")
+        logger.error(f"Error getting frames: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Error retrieving results: {str(e)}'
+        }), 500
+
+def get_review_job(tracking_id):
+    """A completed job whose source video is still available, or (None, error response)"""
+    job = get_job_queue().get(tracking_id)
+    if job is None or job['status'] != 'completed' or not os.path.exists(job['columnar_path']):
+        return None, (jsonify({
+            'success': False,
+            'error': 'Tracking results not found'
+        }), 404)
+    if not job['source_path'] or not os.path.exists(job['source_path']):
+        return None, (jsonify({
+            'success': False,
+            'error': 'Source video is no longer available'
+        }), 404)
+    return job, None
+
+def parse_review_options():
+    """Optional output width and JPEG quality query arguments; raises ValueError"""
+    error = 'width must be at least 16 pixels and quality between 1 and 100'
+    try:
+        width = query_arg('width', int)
+        quality = query_arg('quality', int, JPEG_QUALITY)
+    except ValueError:
+        raise ValueError(error) from None
+    if (width is not None and width < 16) or not 1 <= quality <= 100:
+        raise ValueError(error)
+    return width, quality
+
+def resize_to_width(image, width):
+    if width is None or width >= image.shape[1]:
+        return image
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+def review_frames(job, start, end, annotate=True):
+    """Yield frames start..end (1-based, inclusive) of a job's source video, annotated like the tracked video.
+    
+    Frames are decoded from the nearest key frame, not from the start of the video, and
+    the overlay state before start is rebuilt from the stored tracking data.
+    """
+    summary, frames = load_tracking_npz(job['columnar_path'])
+    records = array_to_records(frames[(frames['frame'] >= start) & (frames['frame'] <= end)],
+                               summary['video_info']['fps'])
+    with seeker_pool.open(job['source_path'], load_keyframes(job['columnar_path'])) as seeker:
+        def decoded():
+            for record in records:
+                image = seeker.read(record['frame'] - 1)
+                if image is None:
+                    return
+                yield image
+        
+        if not annotate:
+            yield from decoded()
+            return
+        tracker = EnhancedPingPongTracker()
+        trajectory, detection_count, interpolated_count = overlay_state(frames, start, tracker.trajectory.maxlen)
+        yield from tracker.annotate_frames(records, decoded(), summary['total_frames'], trajectory,
+                                           detection_count, interpolated_count)
+
+@app.route('/tracking-results/<tracking_id>/frame/<int:frame>', methods=['GET'])
+def get_review_frame(tracking_id, frame):
+    """One frame of the source video as a JPEG, with the tracking overlay unless annotate=false"""
+    try:
+        try:
+            width, quality = parse_review_options()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        job, error_response = get_review_job(tracking_id)
+        if error_response:
+            return error_response
+        if not 1 <= frame <= job['results']['total_frames']:
+            return jsonify({
+                'success': False,
+                'error': f"Frame must be between 1 and {job['results']['total_frames']}"
+            }), 400
+        
+        annotate = request.args.get('annotate', 'true').lower() != 'false'
+        with closing(review_frames(job, frame, frame, annotate)) as frames:
+            image = next(frames, None)
+        if image is None:
+            return jsonify({
+                'success': False,
+                'error': 'Could not decode the frame'
+            }), 500
+        ok, jpeg = cv2.imencode('.jpg', resize_to_width(image, width), [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            return jsonify({
+                'success': False,
+                'error': 'Could not encode the frame'
+            }), 500
+        return Response(jpeg.tobytes(), mimetype='image/jpeg')
+        
+    except Exception as e:
+        logger.error(f"Error getting frame: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Error retrieving frame: {str(e)}'
+        }), 500
+
+@app.route('/tracking-results/<tracking_id>/clip', methods=['GET'])
+def get_review_clip(tracking_id):
+    """Frames start..end of the source video as a short annotated MJPEG .avi"""
+    try:
+        try:
+            start, end = parse_frame_range()
+            width, _ = parse_review_options()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        job, error_response = get_review_job(tracking_id)
+        if error_response:
+            return error_response
+        
+        total_frames = job['results']['total_frames']
+        start = start or 1
+        end = min(end or start + CLIP_DEFAULT_FRAMES - 1, total_frames)
+        if start > total_frames or end - start + 1 > CLIP_MAX_FRAMES:
+            return jsonify({
+                'success': False,
+                'error': f'Clips are at most {CLIP_MAX_FRAMES} frames within the video\'s {total_frames}'
+            }), 400
+        
+        fd, clip_path = tempfile.mkstemp(suffix='.avi')
+        os.close(fd)
+        writer = None
+        annotate = request.args.get('annotate', 'true').lower() != 'false'
+        try:
+            for image in review_frames(job, start, end, annotate):
+                image = resize_to_width(image, width)
+                if writer is None:
+                    writer = cv2.VideoWriter(clip_path, cv2.VideoWriter_fourcc(*'MJPG'),
+                                             job['results']['video_info']['fps'],
+                                             (image.shape[1], image.shape[0]))
+                writer.write(image)
+        except Exception:
+            os.remove(clip_path)
+            raise
+        finally:
+            if writer is not None:
+                writer.release()
+        if writer is None:
+            os.remove(clip_path)
+            return jsonify({
+                'success': False,
+                'error': 'Could not decode the clip'
+            }), 500
+        
+        # Unlinked right away; the open file is removed once the response has been sent
+        clip_file = open(clip_path, 'rb')
+        os.remove(clip_path)
+        return send_file(clip_file, mimetype='video/x-msvideo', as_attachment=True,
+                         download_name=f"clip_{tracking_id}_{start}-{end}.avi")
+        
+    except Exception as e:
+        logger.error(f"Error getting clip: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Error retrieving clip: {str(e)}'
+        }), 500
+
+@app.route('/tracking-results/<tracking_id>/columnar', methods=['GET'])
+def get_tracking_results_columnar(tracking_id):
+    """Download tracking results as a compact .npz of per-frame structured arrays"""
+    try:
+        job = get_job_queue().get(tracking_id)
+        columnar_path = job['columnar_path'] if job else None
+        
+        if not columnar_path or not os.path.exists(columnar_path):
+            return jsonify({
+                'success': False,
+                'error': 'Tracking results not found'
+            }), 404
+        
+        return send_file(columnar_path, mimetype='application/octet-stream',
+                         as_attachment=True, download_name=f"tracking_{tracking_id}.npz")
+        
+    except Exception as e:
+        logger.error(f"Error getting columnar results: {str(e)}")
         return jsonify({
             'success': False,
             'error': f'Error retrieving results: {str(e)}'
@@ -160,12 +1344,10 @@ def get_tracking_results(tracking_id):
 def cleanup_files(tracking_id):
     """Clean up temporary files for a tracking session"""
     try:
-        output_filename = f"{tracking_id}_tracked.avi"
-        output_path = os.path.join(OUTPUT_FOLDER, output_filename)
-        
-        if os.path.exists(output_path):
-            os.remove(output_path)
-            logger.info(f"Cleaned up file: {output_path}")
+        # Outputs are shared through the result cache and evicted by its size limit,
+        # so cleaning up a session only forgets the tracking ID and its stored results
+        if get_job_queue().remove(tracking_id):
+            logger.info(f"Cleaned up tracking session: {tracking_id}")
         
         return jsonify({
             'success': True,
@@ -204,18 +1386,8 @@ def internal_error(e):
     }), 500
 
 if __name__ == '__main__':
-    # Clean up old temporary files on startup
-    for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
-        for filename in os.listdir(folder):
-            file_path = os.path.join(folder, filename)
-            try:
-                if os.path.isfile(file_path):
-                    # Remove files older than 1 hour
-                    if os.path.getctime(file_path) < (time.time() - 3600):
-                        os.remove(file_path)
-                        logger.info(f"Cleaned up old file: {file_path}")
-            except Exception as e:
-                logger.warning(f"Could not clean up file {file_path}: {str(e)}")
-    
-    # Run the Flask app
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # Development server; production runs under gunicorn with gunicorn.conf.py
+    prepare_storage()
+    warm_up()
+    # The reloader would restart the process and lose the warmed-up worker pool
+    app.run(debug=API_DEBUG, use_reloader=False, host='0.0.0.0', port=5001, threaded=True)
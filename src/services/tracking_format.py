@@ -0,0 +1,102 @@
+import json
+import numpy as np
+
+# Detection methods packed into the per-frame bitmask
+METHOD_BITS = {
+    'white': 1,
+    'motion': 2,
+    'blob': 4,
+    'interpolated': 8,
+    'skipped': 16  # idle frame between rallies that was not tracked
+}
+
+TRACKING_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('x', '<i4'),
+    ('y', '<i4'),
+    ('confidence', '<f4'),
+    ('methods', 'u1')
+])
+
+NO_POSITION = -1
+
+def encode_methods(methods):
+    """Pack a list of method names into a bitmask"""
+    mask = 0
+    for method in methods or ():
+        mask |= METHOD_BITS.get(method, 0)
+    return mask
+
+def decode_methods(mask):
+    """Unpack a bitmask into the list of method names"""
+    return [method for method, bit in METHOD_BITS.items() if mask & bit]
+
+def records_to_array(records, chunk_size=4096):
+    """Pack per-frame tracking records (any iterable, e.g. a streaming generator) into a structured array"""
+    chunks = []
+    rows = []
+    for record in records:
+        x, y = record['ball_center'] if record['ball_center'] is not None else (NO_POSITION, NO_POSITION)
+        rows.append((record['frame'], x, y, record['confidence'], encode_methods(record['methods'])))
+        if len(rows) == chunk_size:
+            chunks.append(np.array(rows, dtype=TRACKING_DTYPE))
+            rows = []
+    chunks.append(np.array(rows, dtype=TRACKING_DTYPE))
+    return np.concatenate(chunks)
+
+def array_to_records(array, fps):
+    """Rebuild the per-frame dict view produced by process_video"""
+    methods_by_mask = {mask: decode_methods(mask) for mask in range(1 << len(METHOD_BITS))}
+    interpolated = METHOD_BITS['interpolated']
+    skipped = METHOD_BITS['skipped']
+    records = []
+    for frame, x, y, confidence, mask in array.tolist():
+        if not mask:
+            ball_center, methods, confidence = None, None, 0
+        elif mask == skipped:
+            ball_center, methods, confidence = None, ['skipped'], 0
+        else:
+            ball_center = (x, y)
+            methods = list(methods_by_mask[mask])
+            if not mask & interpolated:
+                confidence = int(confidence)
+        records.append({
+            'frame': frame,
+            'timestamp': frame / fps,
+            'ball_center': ball_center,
+            'methods': methods,
+            'confidence': confidence,
+            'detected': ball_center is not None
+        })
+    return records
+
+def overlay_state(array, frame, trajectory_length):
+    """Overlay state of the annotated video just before frame: (trajectory, detection_count, interpolated_count)"""
+    before = array[array['frame'] < frame]
+    detected = before[before['x'] != NO_POSITION]
+    interpolated = int(np.count_nonzero(detected['methods'] & METHOD_BITS['interpolated']))
+    trajectory = [(x, y) for x, y in detected[['x', 'y']][-trajectory_length:].tolist()]
+    return trajectory, len(detected), interpolated
+
+def save_tracking_npz(path, summary, frames, keyframes=None):
+    """Write the results summary, the per-frame array and the source's key frame index to a compressed .npz file"""
+    summary = {key: value for key, value in summary.items() if key != 'tracking_data'}
+    arrays = {'frames': frames, 'summary': np.array(json.dumps(summary))}
+    if keyframes is not None:
+        arrays['keyframes'] = keyframes
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+
+def load_tracking_npz(path, as_records=False):
+    """Load (summary, frames) from a .npz file; frames are dict records if as_records is set"""
+    with np.load(path) as data:
+        summary = json.loads(str(data['summary']))
+        frames = data['frames']
+    if as_records:
+        frames = array_to_records(frames, summary['video_info']['fps'])
+    return summary, frames
+
+def load_keyframes(path):
+    """The key frame index stored in a .npz file, or None if it has none"""
+    with np.load(path) as data:
+        return data['keyframes'] if 'keyframes' in data.files else None
@@ -0,0 +1,484 @@
+import os
+import time
+import shutil
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+import cv2
+from admission import JobCost, estimate_job_cost
+from ballTracker import EnhancedPingPongTracker, TrackerParams, warm_up
+from tracking_format import records_to_array, save_tracking_npz, load_tracking_npz
+from camera_calibration import learn_profile
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs stay in memory this long after they were last looked up; the results
+# store keeps them after that
+FINISHED_JOB_TTL = 3600
+EXPIRY_INTERVAL = 60
+
+def _run_tracking_job(job_id, input_path, output_path, columnar_path, progress, params=None,
+                      profile=False, expected_size=None, idle_timeout=None):
+    """Worker process entry point: track one video and report progress.
+
+    Per-frame records are packed straight into the columnar .npz file; only the
+    summary travels back to the API process. With expected_size the input is still
+    being uploaded and is read as it grows, waiting up to idle_timeout seconds for
+    each new chunk.
+    """
+    progress[job_id] = 0.0
+
+    def report_progress(frame_count, total_frames):
+        if total_frames > 0:
+            progress[job_id] = min(100.0, (frame_count / total_frames) * 100)
+
+    tracker = EnhancedPingPongTracker(input_path, output_path, params, expected_size=expected_size,
+                                      idle_timeout=idle_timeout)
+    records = tracker.process_video(stream=True, progress_callback=report_progress, profile=profile)
+    frames = records_to_array(records)
+    if tracker.summary is None:
+        return False, None
+    save_tracking_npz(columnar_path, tracker.summary, frames, tracker.index_keyframes())
+    return True, tracker.summary
+
+def _render_tracked_video(source_path, output_path, columnar_path):
+    """Worker process entry point: draw stored tracking data onto the source video"""
+    summary, tracking_data = load_tracking_npz(columnar_path, as_records=True)
+    video_info = dict(summary['video_info'], total_frames=summary['total_frames'])
+    # Render to a temporary name so a half-written video is never served
+    tmp_path = output_path + '.part.avi'
+    tracker = EnhancedPingPongTracker(source_path, tmp_path)
+    rendered = False
+    try:
+        rendered = tracker.render_tracked_video(tracking_data, video_info)
+    finally:
+        if not rendered and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if not rendered:
+        return False
+    os.replace(tmp_path, output_path)
+    return True
+
+def _learn_camera_profile(input_path, profile_path, seconds):
+    """Worker process entry point: learn a CameraProfile from the first seconds of a video and
+    save it; returns its description, or None if no frames could be read"""
+    cap = cv2.VideoCapture(input_path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        profile = learn_profile(cap, TrackerParams(), max(2, int(fps * seconds)))
+    finally:
+        cap.release()
+    if profile is None:
+        return None
+    profile.save(profile_path)
+    return profile.describe()
+
+class TrackingJobQueue:
+    """Bounded pool of worker processes running tracking jobs in the background.
+
+    With a results store, finished jobs are persisted there and looked up again by
+    get() after a restart, so they are dropped from memory finished_ttl seconds after
+    their last lookup. With an admission controller, jobs, renders and calibrations
+    wait in the queue until it lets them start, so the work running on the pool stays
+    within its memory budget.
+    """
+
+    def __init__(self, max_workers=None, cache=None, store=None, admission=None,
+                 finished_ttl=FINISHED_JOB_TTL):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache
+        self.store = store
+        self.admission = admission
+        self.finished_ttl = finished_ttl
+        self._next_expiry = 0.0
+        self._waiting = {}
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._jobs = {}
+        self._renders = {}
+        self._lock = threading.Lock()
+        self._warm_up_futures = None
+        self.warmed = False
+
+    def start_warm_up(self):
+        """Start the worker processes and run the tracker once in each, so the first job
+        does not pay for process start-up and OpenCV initialization. Returns at once;
+        warmed is set when every worker has finished. Later calls return the same futures."""
+        with self._lock:
+            if self._warm_up_futures is not None:
+                return self._warm_up_futures
+            futures = self._warm_up_futures = [self._executor.submit(warm_up) for _ in range(self.max_workers)]
+        for future in futures:
+            future.add_done_callback(self._warm_up_done)
+        return futures
+
+    def _warm_up_done(self, future):
+        if future.exception() is not None:
+            logger.error(f"Warming up a tracking worker failed: {future.exception()}")
+            return
+        with self._lock:
+            futures = self._warm_up_futures
+            if self.warmed or not all(f.done() and f.exception() is None for f in futures):
+                return
+            self.warmed = True
+        logger.info(f"Warmed up {len({f.result() for f in futures})} tracking workers")
+
+    def warm_up(self):
+        """start_warm_up(), blocking until every worker is warmed up"""
+        for future in self.start_warm_up():
+            future.result()
+
+    def submit(self, job_id, input_path, output_path, columnar_path, cache_key=None, render=False,
+               params=None, profile=False, expected_size=None, staging_dir=None, content_hash=None,
+               cost=None, idle_timeout=None):
+        """Queue a video for tracking and return immediately.
+
+        The annotated video is only encoded during tracking when render is set;
+        otherwise it can be produced later from the stored results with render().
+        A job started while its upload is still arriving passes expected_size, and
+        idle_timeout for how long it waits on a paused upload, and writes into
+        staging_dir, which joins the result cache once set_cache_key() supplies the
+        key of the completed upload. If it fails before then, only its outputs are
+        removed: the upload is still writing its source into staging_dir. cost is the job's admission.JobCost,
+        required with an admission controller, which admits the job or raises
+        admission.AdmissionError before anything is queued.
+        """
+        with self._lock:
+            if self.admission is not None:
+                self.admission.admit(job_id, cost)
+            self._jobs[job_id] = {
+                'status': 'queued',
+                'created_at': time.time(),
+                'finished_at': None,
+                'input_path': input_path,
+                'source_path': input_path if cache_key or staging_dir else None,
+                'output_path': output_path,
+                'columnar_path': columnar_path,
+                'cache_key': cache_key,
+                'content_hash': content_hash,
+                'staging_dir': staging_dir,
+                'results': None,
+                'error': None
+            }
+            self._waiting[job_id] = (_run_tracking_job,
+                                     (job_id, input_path, output_path if render else None, columnar_path,
+                                      self._progress, params, profile, expected_size, idle_timeout),
+                                     lambda f: self._finish(job_id, f))
+        self._start_admitted(job_id)
+        return job_id
+
+    def _start_admitted(self, task_id):
+        """Start a task just added to _waiting, or whatever admission lets through instead"""
+        if self.admission is not None:
+            self._dispatch()
+        else:
+            self._start(task_id)
+
+    def _start(self, task_id):
+        with self._lock:
+            function, args, on_done = self._waiting.pop(task_id)
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(on_done)
+
+    def _dispatch(self):
+        """Start the waiting tasks the admission controller lets through"""
+        for task_id in self.admission.next_jobs():
+            self._start(task_id)
+
+    def release(self, task_id):
+        """Release work admitted as running outside the pool, e.g. a streamed request,
+        and start the waiting tasks it made room for"""
+        self.admission.release(task_id)
+        self._dispatch()
+
+    def _queue_task(self, task_id, cost, function, *args):
+        """Add a task returning function(*args) to _waiting and return a future of its result.
+        Must hold self._lock; raises admission.AdmissionError if the task is refused"""
+        if self.admission is not None:
+            self.admission.admit(task_id, cost)
+        future = Future()
+        self._waiting[task_id] = (function, args, lambda f: self._task_finished(task_id, future, f))
+        return future
+
+    def _task_finished(self, task_id, future, pool_future):
+        if self.admission is not None:
+            self.admission.release(task_id)
+            self._dispatch()
+        if pool_future.exception() is not None:
+            future.set_exception(pool_future.exception())
+        else:
+            future.set_result(pool_future.result())
+
+    def add_completed(self, job_id, results, output_path, columnar_path, cache_key=None,
+                      source_path=None, content_hash=None):
+        """Register a job whose results were already available, e.g. from the result cache"""
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                'status': 'completed',
+                'created_at': now,
+                'finished_at': now,
+                'input_path': None,
+                'source_path': source_path,
+                'output_path': output_path,
+                'columnar_path': columnar_path,
+                'cache_key': cache_key,
+                'content_hash': content_hash,
+                'staging_dir': None,
+                'results': results,
+                'error': None
+            }
+        self._persist(job_id)
+        return job_id
+
+    def set_cache_key(self, job_id, cache_key, content_hash=None):
+        """Give a staged job its cache key once the upload it is reading has completed"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job['cache_key'] = cache_key
+            job['content_hash'] = content_hash
+            finished = job['status'] == 'completed'
+        if finished:
+            self._adopt(job_id)
+
+    def _adopt(self, job_id):
+        """Move a finished staged job's files into the result cache and point the job at them"""
+        with self._lock:
+            job = self._jobs[job_id]
+            staging_dir, key, results = job['staging_dir'], job['cache_key'], job['results']
+            job['staging_dir'] = None
+        if staging_dir is None:
+            return
+        source_stem = os.path.splitext(os.path.basename(job['source_path']))[0]
+        entry_dir, adopted = self.cache.adopt(staging_dir, key)
+        if entry_dir is not None:
+            with self._lock:
+                for field in ('output_path', 'columnar_path'):
+                    job[field] = os.path.join(entry_dir, os.path.basename(job[field]))
+                # If an identical upload finished first, its source may have another extension
+                job['input_path'] = job['source_path'] = self.cache.find(key, source_stem)
+            if adopted:
+                self.cache.store(key, results)
+        self._persist(job_id)
+
+    def _persist(self, job_id):
+        """Save a finished job, and its per-frame data unless the store already has it"""
+        if self.store is None:
+            return
+        with self._lock:
+            job = dict(self._jobs[job_id])
+        frames = None
+        key = job['cache_key']
+        try:
+            if job['status'] == 'completed' and key and not self.store.has_frames(key):
+                _, frames = load_tracking_npz(job['columnar_path'])
+            self.store.save(job_id, job, frames)
+        except Exception as e:
+            logger.error(f"Could not persist tracking job {job_id}: {str(e)}")
+
+    def find_active(self, cache_key):
+        """Return the ID of a queued or running job producing cache_key, if any"""
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                if job['cache_key'] == cache_key and job['status'] == 'queued':
+                    return job_id
+        return None
+
+    def render(self, job_id):
+        """Render a completed job's annotated video on the worker pool.
+
+        Returns a future resolving to True on success; concurrent requests for the
+        same video share one render. A failed render is returned once more, so a
+        client polling for it sees the failure, and is retried on the call after.
+        A new render is admitted like a job and raises admission.AdmissionError
+        if it is refused.
+        """
+        job = self.get(job_id)
+        output_path = job['output_path']
+        with self._lock:
+            future = self._renders.get(output_path)
+            if future is not None:
+                if future.done():
+                    del self._renders[output_path]
+                return future
+        # Decoding and encoding the source costs about what tracking it did
+        cost = estimate_job_cost(job['source_path']) if self.admission is not None else None
+        task_id = f'render:{output_path}'
+        with self._lock:
+            future = self._renders.get(output_path)
+            if future is not None:
+                return future
+            future = self._queue_task(task_id, cost, _render_tracked_video, job['source_path'],
+                                      output_path, job['columnar_path'])
+            self._renders[output_path] = future
+        logger.info(f"Rendering tracked video for {job_id}")
+        future.add_done_callback(lambda f: self._render_finished(output_path, f))
+        self._start_admitted(task_id)
+        return future
+
+    def calibrate(self, input_path, profile_path, seconds):
+        """Learn and save a camera profile on the worker pool; returns a future resolving to
+        the profile's description, or None if the video had no readable frames. Admitted
+        like a job; raises admission.AdmissionError if it is refused."""
+        cost = None
+        if self.admission is not None:
+            full = estimate_job_cost(input_path)
+            cost = JobCost(full.width, full.height, min(full.frames, max(2, int(full.fps * seconds))), full.fps)
+        task_id = f'calibrate:{input_path}'
+        with self._lock:
+            future = self._queue_task(task_id, cost, _learn_camera_profile, input_path, profile_path, seconds)
+        self._start_admitted(task_id)
+        return future
+
+    def _render_finished(self, output_path, future):
+        if future.exception() is None and future.result():
+            with self._lock:
+                self._renders.pop(output_path, None)
+
+    def remove(self, job_id):
+        """Forget a finished job, also in the results store; returns False if it is unknown or still running"""
+        if self.get(job_id) is None:
+            return False
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] == 'queued':
+                return False
+            del self._jobs[job_id]
+        if self.store is not None:
+            self.store.delete(job_id)
+        return True
+
+    def _finish(self, job_id, future):
+        """Record the outcome of a job and release its uploaded input"""
+        try:
+            success, results = future.result()
+            error = None if success else 'Failed to process video'
+        except Exception as e:
+            logger.error(f"Tracking job {job_id} crashed: {str(e)}")
+            success, results, error = False, None, f'Internal server error: {str(e)}'
+
+        with self._lock:
+            job = self._jobs[job_id]
+            key, staged = job['cache_key'], job['staging_dir'] is not None
+        # Results reach the cache before the job stops counting as active, so an identical
+        # upload arriving meanwhile finds one or the other
+        if self.cache and key and not staged:
+            if success:
+                self.cache.store(key, results)
+            else:
+                self.cache.discard(key)
+
+        with self._lock:
+            job['status'] = 'completed' if success else 'failed'
+            job['results'] = results if success else None
+            job['error'] = error
+            job['finished_at'] = time.time()
+            input_path = job['input_path']
+            key = job['cache_key']
+            staging_dir = job['staging_dir']
+        self._progress.pop(job_id, None)
+        if self.admission is not None:
+            self.admission.release(job_id)
+            self._dispatch()
+
+        if staging_dir:
+            # Outputs stay staged until the upload completes and provides the key
+            if not success:
+                with self._lock:
+                    job['staging_dir'] = None
+                    output_path, columnar_path = job['output_path'], job['columnar_path']
+                if key:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                else:
+                    # The upload is still arriving into the staging directory and is tracked
+                    # afresh once complete
+                    for path in (output_path, columnar_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                self._persist(job_id)
+            elif key:
+                self._adopt(job_id)
+        else:
+            self._persist(job_id)
+
+        # Sources kept in the result cache stay available for rendering later
+        if not key and not staging_dir and os.path.exists(input_path):
+            os.remove(input_path)
+        logger.info(f"Tracking job {job_id} {job['status']}")
+
+    def _expire(self):
+        """Drop finished jobs not looked up for finished_ttl seconds; they remain in the results store"""
+        now = time.time()
+        if self.store is None or now < self._next_expiry:
+            return
+        cutoff = now - self.finished_ttl
+        with self._lock:
+            self._next_expiry = now + EXPIRY_INTERVAL
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['status'] != 'queued' and job['staging_dir'] is None
+                       and job.get('accessed_at', job['created_at']) < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.info(f"Dropped {len(expired)} finished tracking jobs from memory")
+
+    def get(self, job_id):
+        """Return a snapshot of a job's status, progress and results, or None"""
+        self._expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            # Finished before a restart or expired: take it back in so render() and remove() work
+            job = self.store.get(job_id)
+            if job is None:
+                return None
+            with self._lock:
+                job = self._jobs.setdefault(job_id, job)
+        if job is None:
+            return None
+        with self._lock:
+            job['accessed_at'] = time.time()
+            job = dict(job)
+
+        if job['status'] == 'completed':
+            job['progress'] = 100.0
+        elif job['status'] == 'queued' and job_id in self._progress:
+            job['status'] = 'processing'
+            job['progress'] = round(self._progress.get(job_id, 0.0), 1)
+        else:
+            job['progress'] = 0.0
+        return job
+
+    def stats(self):
+        """Count jobs by status"""
+        self._expire()
+        counts = {'queued': 0, 'processing': 0, 'completed': 0, 'failed': 0}
+        started = set(self._progress.keys())
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                status = job['status']
+                counts['processing' if status == 'queued' and job_id in started else status] += 1
+        return counts
+
+    def capacity(self):
+        """Worker slots in use and jobs waiting for one"""
+        counts = self.stats()
+        with self._lock:
+            rendering = sum(1 for output_path, future in self._renders.items()
+                            if not future.done() and f'render:{output_path}' not in self._waiting)
+        busy = min(self.max_workers, counts['processing'] + rendering)
+        return {
+            'workers': self.max_workers,
+            'busy': busy,
+            'idle': self.max_workers - busy,
+            'queued': counts['queued'],
+            'warmed': self.warmed
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
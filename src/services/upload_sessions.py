@@ -0,0 +1,99 @@
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+class UploadError(Exception):
+    """A chunk that cannot be accepted, with the HTTP status to report and the bytes received so far"""
+
+    def __init__(self, message, status, received):
+        super().__init__(message)
+        self.status = status
+        self.received = received
+
+class UploadSessions:
+    """Resumable uploads that arrive as byte ranges and are written straight to their final path.
+
+    Ranges must continue from the bytes already received. A range overlapping them (a
+    retry after a lost response) only contributes its new bytes, and one starting past
+    them is refused so the client resumes from the reported offset. The content hash is
+    computed as the data arrives. Sessions live in memory, so uploads resume across
+    dropped connections but not across server restarts.
+    """
+
+    def __init__(self, idle_timeout=3600):
+        self.idle_timeout = idle_timeout
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def create(self, upload_id, path, total_size, **options):
+        """Register an upload and create its empty destination file; options are kept with it"""
+        open(path, 'wb').close()
+        now = time.time()
+        upload = dict(options, upload_id=upload_id, path=path, total_size=total_size, received=0,
+                      content_hash=None, tracking_id=None, created_at=now, updated_at=now,
+                      hasher=hashlib.sha256(), lock=threading.Lock())
+        with self._lock:
+            self._uploads[upload_id] = upload
+        return upload
+
+    def get(self, upload_id):
+        with self._lock:
+            return self._uploads.get(upload_id)
+
+    @contextmanager
+    def session(self, upload_id):
+        """Hold an upload exclusively, e.g. while writing a chunk and acting on it; yields None if unknown"""
+        upload = self.get(upload_id)
+        if upload is None:
+            yield None
+            return
+        with upload['lock']:
+            # It may have been removed while waiting for the lock
+            yield upload if self.get(upload_id) is upload else None
+
+    def write(self, upload, start, stream, chunk_size):
+        """Append the bytes of stream that belong at offset start.
+
+        Must be called within session(). Returns True if this call completed the upload.
+        """
+        received = upload['received']
+        total_size = upload['total_size']
+        if start > received:
+            raise UploadError(f'Expected a chunk starting at byte {received}', 409, received)
+        if received == total_size:
+            return False
+
+        skip = received - start
+        hasher = upload['hasher']
+        # Unbuffered so a tracking job reading the file as it grows sees every chunk written
+        with open(upload['path'], 'ab', buffering=0) as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                if skip:
+                    dropped = min(skip, len(chunk))
+                    chunk = chunk[dropped:]
+                    skip -= dropped
+                if received + len(chunk) > total_size:
+                    raise UploadError('Chunk extends past the declared upload size', 400, received)
+                f.write(chunk)
+                hasher.update(chunk)
+                received += len(chunk)
+                upload['received'] = received
+                upload['updated_at'] = time.time()
+
+        if received < total_size:
+            return False
+        upload['content_hash'] = hasher.hexdigest()
+        return True
+
+    def remove(self, upload_id):
+        with self._lock:
+            return self._uploads.pop(upload_id, None)
+
+    def expire(self):
+        """Forget uploads untouched for idle_timeout seconds and return them for cleanup"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            expired = [upload_id for upload_id, upload in self._uploads.items()
+                       if upload['updated_at'] < cutoff]
+            return [self._uploads.pop(upload_id) for upload_id in expired]
@@ -40,9 +40,14 @@ mkdir -p temp_uploads temp_outputs
 echo "🚀 Starting ball tracking API service on port 5001..."
 echo "📡 API will be available at: http://localhost:5001"
 echo "🔍 Health check endpoint: http://localhost:5001/health"
+echo "✅ Readiness endpoint: http://localhost:5001/ready"
 echo ""
 echo "Press Ctrl+C to stop the service"
 echo "================================================"
 
-# Start the service
-python src/services/tracking_api.py
+# Start the service: gunicorn by default, the Flask development server with --dev
+if [ "$1" = "--dev" ]; then
+    python src/services/tracking_api.py
+else
+    exec gunicorn -c src/services/gunicorn.conf.py tracking_api:app
+fi